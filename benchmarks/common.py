@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""Synthetic data and stand ins shared by the benchmarks"""
+from argparse import Namespace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+from unittest import mock
+
+from asciimatics.screen import Canvas, Screen
+from asciimatics.widgets import Frame, Layout
+
+
+def canvas(height=40, width=120, unicode_aware=False):
+    """an asciimatics Canvas drawn on a mock Screen, nothing reaches a terminal"""
+    screen = mock.MagicMock(spec=Screen, colours=8, unicode_aware=unicode_aware)
+    return Canvas(screen, height, width, 0, 0)
+
+
+def parsed_args(**overrides):
+    """the TUI's arguments at their defaults, without reading ~/.respyterc.yml"""
+    args = Namespace(color_scheme="bright", pool_size=10, pool_idle_timeout=90,
+                     history_backend="jsonl", preview_cache_mb=16, load_processes=1,
+                     load_workers="", response_view="yaml")
+    for name, value in overrides.items():
+        setattr(args, name, value)
+    return args
+
+
+def framed(widget, height=40, width=120, unicode_aware=False):
+    """widget laid out alone in a Frame on a mock screen"""
+    frame = Frame(canvas(height, width, unicode_aware), height, width)
+    layout = Layout([1])
+    frame.add_layout(layout)
+    layout.add_widget(widget)
+    frame.fix()
+    frame.switch_focus(layout, 0, 0)
+    return frame
+
+
+def record(number, width=3):
+    """a JSON object like those APIs return"""
+    return {"id": number, "name": "item {}".format(number), "active": number % 3 == 0,
+            "tags": ["tag{}".format(tag) for tag in range(width)],
+            "owner": {"id": number * 7, "email": "user{}@example.com".format(number)}}
+
+
+def json_body(size):
+    """a JSON document of about size bytes"""
+    per_record = len(json.dumps(record(0)))
+    return json.dumps({"items": [record(number) for number in range(max(1, size // per_record))]})
+
+
+def history_entry(number):
+    """a history entry as RestView stores them"""
+    return {"method": ("GET", "POST", "PUT", "DELETE")[number % 4],
+            "url": "https://api{}.example.com/v1/items/{}".format(number % 7, number),
+            "data": record(number), "headers": {"Accept": "application/json"},
+            "timestamp": 1600000000 + number, "status": (200, 201, 404, 503)[number % 4],
+            "elapsed": (number % 1000) / 1000.0}
+
+
+class StubServer(object):
+    """A local HTTP server answering every request with the same JSON body"""
+    def __init__(self, body):
+        payload = body.encode("utf-8")
+
+        class Handler(BaseHTTPRequestHandler):
+            """answers with payload and keeps the connection open"""
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args): # pylint: disable=arguments-differ
+                pass
+
+            def _reply(self):
+                self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _reply
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self.url = "http://localhost:{}/items".format(self._server.server_address[1])
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def close(self):
+        """stops serving"""
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class Timed(object):
+    """
+    What a benchmark case times.
+
+    run is timed; prepare, if given, runs untimed before each run (each run then does a
+    single loop) and teardown once after the last.
+    """
+    def __init__(self, run, prepare=None, teardown=None):
+        self.run = run
+        self.prepare = prepare
+        self.teardown = teardown
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""HistoryView benchmarks: listing the history and previewing an entry"""
+import json
+from os import path
+import random
+import shutil
+import tempfile
+
+from benchmarks.common import Timed, canvas, history_entry, parsed_args
+from librespyte.history import HistoryView
+from librespyte.sqlhistory import SqliteHistoryStore
+from librespyte.store import HistoryModel, HistoryStore, parse_filter
+
+FILTERS = ("", "status:5xx host:api3.example.com")
+# Rows the list asks for to draw its first screen.
+SCREEN_ROWS = 20
+
+
+class History(object):
+    """A HistoryView over a throwaway store of synthetic entries"""
+    def __init__(self, entries, backend):
+        self.directory = tempfile.mkdtemp(prefix="respyte-bench-")
+        jsonl = path.join(self.directory, "history.jsonl")
+        with open(jsonl, "w") as history_file:
+            for number in range(entries):
+                history_file.write(json.dumps(history_entry(number)) + "\n")
+        if backend == "sqlite":
+            store = SqliteHistoryStore(path.join(self.directory, "history.sqlite3"), jsonl)
+        else:
+            store = HistoryStore(jsonl, legacy_filename=None)
+        self.model = HistoryModel(store)
+        self.view = HistoryView(canvas(), parsed_args(history_backend=backend), self.model)
+
+    def close(self):
+        """removes the store"""
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def _history(history, text):
+    view = history.view
+
+    def prepare():
+        # Nothing cached from the last run.
+        history.model.invalidate()
+        view._filters = parse_filter(text) # pylint: disable=protected-access
+
+    def run():
+        window = view._history() # pylint: disable=protected-access
+        return [window[row] for row in range(min(len(window), SCREEN_ROWS))]
+    return Timed(run, prepare, history.close)
+
+
+def _preview(history, cached):
+    view = history.view
+    window = view._history() # pylint: disable=protected-access
+    picks = random.Random(1)
+
+    def prepare():
+        if not cached:
+            view._previews.clear() # pylint: disable=protected-access
+            history.model.invalidate()
+        view.history_list.value = window[picks.randrange(len(window))][1]
+
+    def run():
+        view._update_preview() # pylint: disable=protected-access
+    return Timed(run, prepare, history.close)
+
+
+def cases(quick):
+    """(name, params, setup) of each case"""
+    for entries in (1000, 10000) if quick else (1000, 10000, 100000):
+        for backend in ("jsonl", "sqlite"):
+            params = {"entries": entries, "backend": backend}
+            for text in FILTERS:
+                yield ("history.history", dict(params, filter=text or "none"),
+                       lambda params=params, text=text: _history(
+                           History(params["entries"], params["backend"]), text))
+            for cached in (False, True):
+                yield ("history.update_preview", dict(params, cached=cached),
+                       lambda params=params, cached=cached: _preview(
+                           History(params["entries"], params["backend"]), cached))
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""Pager benchmarks: setting a value, laying all of it out and painting a frame"""
+import json
+
+from asciimatics.event import KeyboardEvent
+import yaml
+
+from benchmarks.common import Timed, framed, json_body
+from librespyte.pager import Pager
+
+KB = 1024
+MB = 1024 * KB
+
+
+def bodies(quick):
+    """small, large and single line bodies, by name"""
+    large = MB if quick else 8 * MB
+    parsed = json.loads(json_body(large))
+    return {
+        "small": yaml.dump(json.loads(json_body(4 * KB))),
+        "large": yaml.dump(parsed),
+        "single-line": json.dumps(parsed, separators=(",", ":")),
+    }
+
+
+def _pager(text=None):
+    """a wrapping Pager in a Frame on a mock screen, holding text"""
+    pager = Pager(35, as_string=True, line_wrap=True, name="response")
+    framed(pager)
+    if text is not None:
+        pager.value = text
+    return pager
+
+
+def _value(text):
+    pager = _pager()
+
+    def run():
+        pager.value = text
+    return Timed(run)
+
+
+def _reflowed(text):
+    pager = _pager()
+
+    def prepare():
+        # A fresh value, so nothing has been laid out yet.
+        pager.value = text
+
+    def run():
+        return pager._reflowed_text # pylint: disable=protected-access
+    return Timed(run, prepare)
+
+
+def _update(text, position):
+    pager = _pager(text)
+
+    def prepare():
+        pager.value = text
+        if position == "bottom":
+            pager.process_event(KeyboardEvent(ord("G")))
+
+    def run():
+        pager.update(0)
+
+    if position == "first":
+        return Timed(run, prepare)
+    prepare()
+    return Timed(run)
+
+
+def cases(quick):
+    """(name, params, setup) of each case"""
+    texts = bodies(quick)
+    for body, text in texts.items():
+        params = {"body": body, "chars": len(text)}
+        yield "pager.value", params, lambda text=text: _value(text)
+        yield "pager.reflowed_text", params, lambda text=text: _reflowed(text)
+        for position in ("first", "top", "bottom"):
+            yield ("pager.update", dict(params, frame=position),
+                   lambda text=text, position=position: _update(text, position))
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""RestView benchmarks: the whole send, from F3 to the formatted body in the Pager"""
+from os import path
+import shutil
+import tempfile
+import time
+
+from benchmarks.common import StubServer, Timed, canvas, json_body, parsed_args
+from librespyte.render import VIEWS
+from librespyte.rest import RestView
+from librespyte.store import HistoryModel, HistoryStore
+
+KB = 1024
+# Seconds between polls of the executor, as the Frame's update loop would.
+POLL_INTERVAL = 0.0005
+
+
+def _send(size, view):
+    server = StubServer(json_body(size))
+    directory = tempfile.mkdtemp(prefix="respyte-bench-")
+    history = HistoryModel(HistoryStore(path.join(directory, "history.jsonl"),
+                                        legacy_filename=None))
+    rest = RestView(canvas(), parsed_args(response_view=view), history)
+    rest.method.value = "POST"
+    rest.url.value = server.url
+    rest.req_headers.value = "Accept: application/json"
+    rest.request.value = "name: bench\nvalues: [1, 2, 3]"
+
+    def run():
+        rest._send() # pylint: disable=protected-access
+        while True:
+            rest._apply_updates(rest._executor.updates()) # pylint: disable=protected-access
+            for job in rest._executor.poll(): # pylint: disable=protected-access
+                rest._receive(job) # pylint: disable=protected-access
+                if job.error is not None:
+                    raise job.error
+                return
+            time.sleep(POLL_INTERVAL)
+
+    def teardown():
+        rest._sessions.close() # pylint: disable=protected-access
+        server.close()
+        shutil.rmtree(directory, ignore_errors=True)
+    return Timed(run, teardown=teardown)
+
+
+def cases(quick):
+    """(name, params, setup) of each case"""
+    for size in (KB, 100 * KB) if quick else (KB, 100 * KB, 1024 * KB):
+        for view in VIEWS:
+            yield ("rest.send", {"bytes": size, "view": view},
+                   lambda size=size, view=view: _send(size, view))
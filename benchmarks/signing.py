@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""Signing benchmarks: encoding and hashing a body in one pass against doing each separately"""
+import hashlib
+import json
+
+import requests
+
+from benchmarks.common import Timed, record
+from librespyte.signing import encode
+
+KB = 1024
+
+
+def body_params(size):
+    """body params of about size bytes once form encoded"""
+    per_record = len(json.dumps(record(0)))
+    return {"item{}".format(number): json.dumps(record(number))
+            for number in range(max(1, size // per_record))}
+
+
+def _one_pass(data):
+    def run():
+        return encode(data)
+    return Timed(run)
+
+
+def _separately(data):
+    def run():
+        # What a hook given the body params did, on top of requests encoding them to send.
+        hashlib.sha256(json.dumps(data, sort_keys=True).encode("utf-8")).hexdigest()
+        return requests.Request("POST", "http://localhost/", data=data).prepare().body
+    return Timed(run)
+
+
+def cases(quick):
+    """(name, params, setup) of each case"""
+    for size in (KB, 100 * KB) if quick else (KB, 100 * KB, 1024 * KB):
+        data = body_params(size)
+        yield "signing.one_pass", {"bytes": size}, lambda data=data: _one_pass(data)
+        yield "signing.separately", {"bytes": size}, lambda data=data: _separately(data)
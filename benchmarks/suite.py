@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Times respyte's hot paths on synthetic data.
+
+Run from the repository root:
+
+    python -m benchmarks.suite [--quick] [--filter pager] [--json results.json]
+                               [--compare baseline.json [--fail-above 1.25]]
+
+Prints a table and, with --json, writes the results with the version, Python and
+machine they came from.  --compare puts each case next to the same case in an
+earlier --json file, so a change can be checked for regressions.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+from benchmarks import history, pager, send, signing, wrap
+
+SUITES = (pager, history, send, signing, wrap)
+SCHEMA = 1
+# Fast cases are looped until one run takes at least this many seconds.
+MIN_RUN = 0.01
+
+
+def version():
+    """the respyte version being measured"""
+    try:
+        from librespyte._version import get_versions # pylint: disable=import-outside-toplevel
+        return get_versions()["version"]
+    except Exception: # pylint: disable=broad-except
+        return "unknown"
+
+
+def key(result):
+    """identifies a case across result files"""
+    return result["name"], json.dumps(result["params"], sort_keys=True)
+
+
+def loops(timed):
+    """how many calls of timed.run make one run of at least MIN_RUN seconds"""
+    if timed.prepare is not None:
+        return 1
+    number = 1
+    while number < 10 ** 6:
+        started = time.perf_counter()
+        for _ in range(number):
+            timed.run()
+        if time.perf_counter() - started >= MIN_RUN:
+            break
+        number *= 10
+    return number
+
+
+def measure(timed, repeat):
+    """seconds per call of timed.run, over repeat runs after a warm up"""
+    number = loops(timed)
+    samples = []
+    try:
+        for _ in range(repeat):
+            if timed.prepare is not None:
+                timed.prepare()
+            started = time.perf_counter()
+            for _ in range(number):
+                timed.run()
+            samples.append((time.perf_counter() - started) / number)
+    finally:
+        if timed.teardown is not None:
+            timed.teardown()
+    return {"min": min(samples), "median": statistics.median(samples),
+            "mean": statistics.mean(samples),
+            "stdev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+            "runs": repeat, "loops": number}
+
+
+def run(args):
+    """runs the selected cases, yielding the result of each as it finishes"""
+    for suite in SUITES:
+        for name, params, setup in suite.cases(args.quick):
+            if args.filter and not any(part in name for part in args.filter):
+                continue
+            timed = setup()
+            if timed.prepare is None:
+                # Warm up whatever is built on first use.
+                timed.run()
+            yield {"name": name, "params": params, "seconds": measure(timed, args.repeat)}
+
+
+def describe(params):
+    """params as a short string for the table"""
+    return " ".join("{}={}".format(name, value) for name, value in params.items())
+
+
+def milliseconds(seconds):
+    """seconds in a readable unit for the table"""
+    if seconds < 1e-3:
+        return "{:.1f}us".format(seconds * 1e6)
+    if seconds < 1:
+        return "{:.2f}ms".format(seconds * 1e3)
+    return "{:.2f}s".format(seconds)
+
+
+def main():
+    """runs the suite, prints a table and writes or compares results"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--quick", action="store_true",
+                        help="smaller bodies and histories, for a fast check")
+    parser.add_argument("--filter", nargs="+", default=[],
+                        help="only cases whose name contains one of these")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per case")
+    parser.add_argument("--json", help="file to write the results to")
+    parser.add_argument("--compare", help="results file written by an earlier --json")
+    parser.add_argument("--fail-above", type=float,
+                        help="exit 1 if a case's median is more than this times the baseline's")
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = {key(result): result for result in json.load(baseline_file)["results"]}
+
+    started = datetime.datetime.now(datetime.timezone.utc)
+    results = []
+    slower = []
+    print("{:<24} {:<56} {:>10} {:>10} {:>8}".format(
+        "case", "params", "median", "min", "vs base" if baseline else ""))
+    for result in run(args):
+        results.append(result)
+        seconds = result["seconds"]
+        ratio = ""
+        before = baseline.get(key(result))
+        if before is not None:
+            change = seconds["median"] / before["seconds"]["median"]
+            ratio = "{:.2f}x".format(change)
+            if args.fail_above and change > args.fail_above:
+                slower.append(result)
+        print("{:<24} {:<56} {:>10} {:>10} {:>8}".format(
+            result["name"], describe(result["params"]), milliseconds(seconds["median"]),
+            milliseconds(seconds["min"]), ratio), flush=True)
+
+    if args.json:
+        with open(args.json, "w") as results_file:
+            json.dump({"schema": SCHEMA, "respyte": version(), "started": started.isoformat(),
+                       "python": platform.python_version(),
+                       "implementation": platform.python_implementation(),
+                       "platform": platform.platform(), "cpus": os.cpu_count(),
+                       "quick": args.quick, "repeat": args.repeat, "results": results},
+                      results_file, indent=2)
+    if slower:
+        print("{} case(s) slower than {}x the baseline".format(len(slower), args.fail_above))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Times Pager line wrapping on single line (minified JSON) bodies.
+
+Run from the repository root:
+
+    python -m benchmarks.wrap [--sizes 1 10 100] [--width 118]
+
+Each corpus is wrapped for the first screen only and then in full, the
+per MB column should stay flat as the body grows.  The suite also times
+the first frame a Pager paints while the body streams in, which should
+take about as long as the first screen whatever the size.
+"""
+import argparse
+import json
+import time
+
+from benchmarks.common import Timed, framed
+from librespyte.pager import Pager
+from librespyte.wrap import wrap_breaks
+
+CORPORA = {
+    "ascii": "name",
+    "latin": "café",
+    "cjk": "名前",
+}
+
+
+def minified(size, word):
+    """a single line JSON array of about size characters"""
+    record = json.dumps({"id": 0, word: word * 8, "tags": [word, "x" * 40]},
+                        ensure_ascii=False, separators=(",", ":"))
+    return "[" + ",".join([record] * (size // (len(record) + 1) + 1))[:size - 2] + "]"
+
+
+def timed(func):
+    """seconds taken by func()"""
+    started = time.perf_counter()
+    func()
+    return time.perf_counter() - started
+
+
+def _streaming(text, unicode_aware):
+    """the first frame of a Pager text has just been appended to, the cursor at its start"""
+    pager = Pager(35, as_string=True, line_wrap=True, name="response")
+    framed(pager, unicode_aware=unicode_aware)
+
+    def prepare():
+        pager.value = ""
+        pager.append(text)
+
+    def run():
+        pager.update(0)
+    return Timed(run, prepare)
+
+
+def cases(quick):
+    """(name, params, setup) of each case, for benchmarks.suite"""
+    for name, word in CORPORA.items():
+        text = minified((1 if quick else 10) * 1024 * 1024, word)
+        for unicode_aware in (False, True):
+            params = {"corpus": name, "chars": len(text), "unicode": unicode_aware}
+            yield ("wrap.first_screen", params,
+                   lambda text=text, unicode_aware=unicode_aware: Timed(
+                       lambda: wrap_breaks(text, 118, unicode_aware)[40]))
+            yield ("wrap.full", params,
+                   lambda text=text, unicode_aware=unicode_aware: Timed(
+                       lambda: len(wrap_breaks(text, 118, unicode_aware))))
+            yield ("wrap.pager_streaming", params,
+                   lambda text=text, unicode_aware=unicode_aware: _streaming(text,
+                                                                             unicode_aware))
+
+
+def main():
+    """runs the benchmark and prints a table"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 100],
+                        help="body sizes in MB")
+    parser.add_argument("--width", type=int, default=118, help="columns to wrap at")
+    parser.add_argument("--height", type=int, default=40, help="rows in the first screen")
+    args = parser.parse_args()
+
+    print("{:<6} {:>7} {:>8} {:>12} {:>10} {:>10}".format(
+        "corpus", "size MB", "unicode", "first screen", "full", "full/MB"))
+    for name, word in CORPORA.items():
+        for size in args.sizes:
+            text = minified(size * 1024 * 1024, word)
+            for unicode_aware in (False, True):
+                first = timed(lambda: wrap_breaks(text, args.width, unicode_aware)[args.height])
+                full = timed(lambda: len(wrap_breaks(text, args.width, unicode_aware)))
+                print("{:<6} {:>7} {:>8} {:>10.2f}ms {:>9.2f}s {:>8.3f}s".format(
+                    name, size, "yes" if unicode_aware else "no", first * 1000, full,
+                    full / size))
+
+
+if __name__ == "__main__":
+    main()
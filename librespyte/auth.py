@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""The Authorization hook, a header naming a module.function that generates the value"""
+import threading
+import time
+from librespyte.signing import encode
+from librespyte.store import host_of
+
+# Seconds a hook's value is reused for when the hook doesn't say, 0 calls it for every send.
+DEFAULT_TTL = 0
+# Seconds before a cached value expires that it is replaced in the background.
+DEFAULT_REFRESH_WINDOW = 30
+# Seconds to wait before trying again after a background refresh failed.
+REFRESH_RETRY = 1
+_hooks = {}
+_hooks_lock = threading.Lock()
+
+
+def hook(library):
+    """the function 'library' names, imported the first time it is asked for"""
+    with _hooks_lock:
+        if library not in _hooks:
+            # The last dot splits the function off, the module may be a package's.
+            module, name = library.rsplit(".", 1)
+            try:
+                imported = __import__(module, fromlist=[name])
+            except (ImportError, ValueError) as err:
+                # Remembered too, headers with dots in them aren't all hooks.
+                _hooks[library] = ImportError(str(err))
+            else:
+                _hooks[library] = getattr(imported, name)
+        found = _hooks[library]
+    if isinstance(found, ImportError):
+        raise ImportError(str(found))
+    return found
+
+
+def custom_auth(library, *args):
+    """Imports and runs 'library'"""
+    return hook(library)(*args)
+
+
+def expiring(value):
+    """
+    (Authorization value, seconds it is good for or None) from what a hook returned.
+
+    A hook may return the value alone, a (value, seconds) pair, or an OAuth token response
+    like {"access_token": ..., "token_type": "Bearer", "expires_in": 3600}.
+    """
+    if isinstance(value, (tuple, list)) and len(value) == 2:
+        return value[0], float(value[1])
+    if isinstance(value, dict):
+        token = value.get("access_token", value.get("token"))
+        token_type = value.get("token_type")
+        if token_type:
+            token = "{} {}".format("Bearer" if token_type.lower() == "bearer" else token_type,
+                                   token)
+        expires_in = value.get("expires_in")
+        return token, float(expires_in) if expires_in is not None else None
+    return value, None
+
+
+class _Fetch(object):
+    """A hook call other sends for the same hook and host wait on"""
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        self.cached = False
+
+
+class TokenCache(object):
+    """
+    Authorization values hooks have returned, by hook and host, until they expire.
+
+    Values are kept for as long as the hook said they are good for, or default_ttl
+    seconds if it didn't.  One cache is shared by every send, collection run and load test
+    in the process, and only one call of a hook is made at a time for a host, whoever else
+    needs the value waits for it.  Hooks whose values aren't cached are called by each send
+    without waiting, their values are made for one send.
+
+    Once a value is within refresh_window seconds of expiring (at most half of how long it
+    was good for) the next send starts one background call to replace it and carries on
+    with the current value, so sends don't stop to wait for a new one.
+    """
+    def __init__(self, default_ttl=DEFAULT_TTL, refresh_window=DEFAULT_REFRESH_WINDOW):
+        self.default_ttl = default_ttl
+        self.refresh_window = refresh_window
+        self.reused = 0
+        self.fetched = 0
+        self.fetch_seconds = 0.0
+        self.refreshed = 0
+        self.refresh_seconds = 0.0
+        self.refresh_failures = 0
+        self._tokens = {}
+        self._fetching = {}
+        self._refreshing = set()
+        self._uncached = set()
+        self._retry = {}
+        self._lock = threading.Lock()
+
+    def put(self, library, host, value, ttl=None):
+        """caches value for ttl seconds, or default_ttl if ttl is None, returns whether it did"""
+        ttl = self.default_ttl if ttl is None else ttl
+        if ttl <= 0:
+            return False
+        with self._lock:
+            self._tokens[(library, host)] = (value, time.monotonic() + ttl,
+                                             min(self.refresh_window, ttl / 2.0))
+        return True
+
+    def fetch(self, library, host, call):
+        """
+        The value cached for library on host, or what call() returns, cached.
+
+        call returns (value, seconds it is good for or None), as expiring() does.
+        """
+        key = (library, host)
+        with self._lock:
+            now = time.monotonic()
+            cached = self._tokens.get(key)
+            if cached is not None and cached[1] > now:
+                self.reused += 1
+                if (cached[1] - now <= cached[2] and key not in self._refreshing
+                        and self._retry.get(key, 0) <= now):
+                    self._refreshing.add(key)
+                    threading.Thread(target=self._refresh, args=(key, call),
+                                     daemon=True).start()
+                return cached[0]
+            if cached is not None:
+                # Expired, dropped rather than kept for a host that may not be sent to again.
+                del self._tokens[key]
+            pending = self._fetching.get(key)
+            leader = pending is None
+            if leader:
+                pending = _Fetch()
+                if key not in self._uncached:
+                    # Sends that need the value meanwhile wait for this call.
+                    self._fetching[key] = pending
+        if not leader:
+            pending.done.wait()
+            if pending.error is not None:
+                raise pending.error
+            if pending.cached:
+                with self._lock:
+                    self.reused += 1
+                return pending.value
+            return self.fetch(library, host, call)
+        started = time.monotonic()
+        try:
+            value, ttl = call()
+            pending.value = value
+            pending.cached = self.put(library, host, value, ttl)
+            return value
+        except Exception as err: # pylint: disable=broad-except
+            pending.error = err
+            raise
+        finally:
+            with self._lock:
+                self.fetched += 1
+                self.fetch_seconds += time.monotonic() - started
+                if self._fetching.get(key) is pending:
+                    del self._fetching[key]
+                if pending.error is None:
+                    if pending.cached:
+                        self._uncached.discard(key)
+                    else:
+                        self._uncached.add(key)
+            pending.done.set()
+
+    def _refresh(self, key, call):
+        """replaces the value for key before it expires, on a thread of its own"""
+        started = time.monotonic()
+        try:
+            value, ttl = call()
+            self.put(key[0], key[1], value, ttl)
+            failed = False
+        except Exception: # pylint: disable=broad-except
+            # The current value is used until it expires, try again a little later.
+            failed = True
+        with self._lock:
+            self._refreshing.discard(key)
+            if failed:
+                self.refresh_failures += 1
+                self._retry[key] = time.monotonic() + REFRESH_RETRY
+            else:
+                self.refreshed += 1
+                self.refresh_seconds += time.monotonic() - started
+                self._retry.pop(key, None)
+
+    def summary(self):
+        """one line of how the cache has done, None until a hook has been called"""
+        with self._lock:
+            if not self.fetched:
+                return None
+            line = "auth: {} reused, {} fetched ({:.1f} ms avg), {} refreshed ahead".format(
+                self.reused, self.fetched, self.fetch_seconds / self.fetched * 1000,
+                self.refreshed)
+            if self.refreshed:
+                line += " ({:.1f} ms avg)".format(self.refresh_seconds / self.refreshed * 1000)
+            if self.refresh_failures:
+                line += ", {} refreshes failed".format(self.refresh_failures)
+            return line
+
+    def clear(self):
+        """forgets every cached value"""
+        with self._lock:
+            self._tokens.clear()
+            self._retry.clear()
+
+
+TOKENS = TokenCache()
+
+
+def add_arguments(parser):
+    """adds the options of the Authorization hook cache to a command's parser"""
+    parser.add(
+        '--auth-ttl',
+        type=float,
+        default=DEFAULT_TTL,
+        help='seconds an Authorization hook\'s value is reused for on the same host, when the '
+             'hook doesn\'t return how long it is good for, defaults to {} (call it for every '
+             'send)'.format(DEFAULT_TTL)
+    )
+    parser.add(
+        '--auth-refresh',
+        type=float,
+        default=DEFAULT_REFRESH_WINDOW,
+        help='seconds before a cached Authorization value expires that it is replaced in the '
+             'background, at most half of how long it is good for, defaults to {}'.format(
+                 DEFAULT_REFRESH_WINDOW)
+    )
+
+
+def configure(args):
+    """sets up TOKENS from the options add_arguments() added"""
+    TOKENS.default_ttl = args.auth_ttl
+    TOKENS.refresh_window = args.auth_refresh
+
+
+def summary_lines(prefix="", gap=False):
+    """TOKENS.summary() as lines to show under a report, none until a hook has been called"""
+    line = TOKENS.summary()
+    if line is None:
+        return []
+    return ([""] if gap else []) + [prefix + line]
+
+
+def authorize(url, data, headers, cache=TOKENS):
+    """
+    Replaces an Authorization header naming a hook with what the hook returns.
+
+    A value the hook returned for the same host is reused while it is cached, see TokenCache.
+    """
+    if 'Authorization' in headers and len(headers['Authorization'].split('.')) > 1:
+        library = headers['Authorization']
+        # A refresh may call the hook after the header has been replaced.
+        original = dict(headers)
+        try:
+            headers['Authorization'] = cache.fetch(
+                library, host_of(url),
+                lambda: expiring(custom_auth(library, url, data, original)))
+        except ImportError:
+            pass
+    return headers
+
+
+def authorizer(method, url, data, headers, cache=TOKENS):
+    """
+    A function that authorizes each send of a request sent over and over, None without a hook.
+
+    The function is given the headers one sender sends, and sets their Authorization for
+    the next send.  A hook's value comes through cache.fetch() every time, so it is
+    refreshed ahead of expiring as any other send's is, a cached value costs a dict lookup.
+    A signer signs every send, so its date is the send's, with the digest of the body
+    taken once.
+    """
+    library = headers.get('Authorization')
+    if library is None or len(library.split('.')) < 2:
+        return None
+    try:
+        signer = hook(library)
+    except ImportError:
+        return None
+    if getattr(signer, "signs_digest", False):
+        digest = encode(data)[2]
+
+        def signed(sending):
+            sending['Authorization'] = signer(method, url, sending, digest)
+        return signed
+    host = host_of(url)
+    original = dict(headers)
+
+    def call():
+        return expiring(custom_auth(library, url, data, original))
+
+    def fetched(sending):
+        sending['Authorization'] = cache.fetch(library, host, call)
+    return fetched
+
+
+def sign(method, url, data, headers, cache=TOKENS):
+    """
+    Runs the Authorization hook of a request, returns the (data, headers) to send.
+
+    A hook marked with signing.signs_digest is given a digest of the body instead of the
+    body params.  The body is hashed as it is encoded, and the encoded body is what's sent,
+    so it is only encoded once.  Other hooks go through authorize().
+    """
+    library = headers.get('Authorization')
+    if library is None or len(library.split('.')) < 2:
+        return data, headers
+    try:
+        signer = hook(library)
+    except ImportError:
+        return data, headers
+    if not getattr(signer, "signs_digest", False):
+        return data, authorize(url, data, headers, cache)
+    body, content_type, digest = encode(data)
+    if content_type and not any(name.lower() == "content-type" for name in headers):
+        headers["Content-Type"] = content_type
+    headers['Authorization'] = signer(method, url, headers, digest)
+    return body, headers
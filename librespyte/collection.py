@@ -0,0 +1,507 @@
+#!/usr/bin/env python3
+"""Collections, saved groups of requests run together with values passed between them"""
+from os import listdir, makedirs, path, replace
+import json
+import queue
+import re
+import sys
+import threading
+import time
+import configargparse
+import yaml
+from librespyte import auth
+from librespyte.render import charset
+from librespyte.run import send
+from librespyte.session import DEFAULT_POOL_SIZE, SessionManager
+from librespyte.spec import RequestSpec
+from librespyte.store import CONFIG_DIRECTORY
+from librespyte.timing import PhaseTimer
+
+COLLECTIONS_DIRECTORY = path.join(CONFIG_DIRECTORY, "collections")
+DEFAULT_CONCURRENCY = DEFAULT_POOL_SIZE
+TIMELINE_WIDTH = 40
+# Seconds between checks for a cancelled run while steps are in flight.
+POLL_INTERVAL = 0.1
+NAME = re.compile(r"^[\w-]+$")
+# ${step.body.path.to.value}, ${step.headers.Header-Name} or ${step.status}
+_REFERENCE = re.compile(r"\$\{([\w-]+)((?:\.[^.}]+)+)\}")
+
+
+def references(value):
+    """names of the steps value refers to with ${step...}"""
+    if isinstance(value, dict):
+        return set().union(*(references(item) for item in value.values()))
+    if isinstance(value, list):
+        return set().union(*(references(item) for item in value))
+    if isinstance(value, str):
+        return {match.group(1) for match in _REFERENCE.finditer(value)}
+    return set()
+
+
+def resolve(value, results):
+    """
+    value with each ${step...} replaced by what it names in that step's StepResult.
+
+    A string that is nothing but one reference becomes the value itself, so numbers and
+    objects keep their type, otherwise the value is put into the string as text.
+    """
+    if isinstance(value, dict):
+        return {key: resolve(item, results) for key, item in value.items()}
+    if isinstance(value, list):
+        return [resolve(item, results) for item in value]
+    if not isinstance(value, str):
+        return value
+    whole = _REFERENCE.fullmatch(value)
+    if whole:
+        return _lookup(results, whole)
+    return _REFERENCE.sub(lambda match: _text(_lookup(results, match)), value)
+
+
+def _lookup(results, match):
+    """what one ${step...} reference names"""
+    name, parts = match.group(1), match.group(2).split(".")[1:]
+    try:
+        value = results[name].fields()
+        for part in parts:
+            value = value[int(part)] if isinstance(value, list) else value[part]
+        return value
+    except (LookupError, TypeError, ValueError):
+        raise LookupError("{} isn't in the response to {}".format(match.group(0), name))
+
+
+def _text(value):
+    """value as it is put into a string"""
+    return value if isinstance(value, str) else json.dumps(value)
+
+
+class Step(object):
+    """
+    One request of a collection and the name later steps refer to its response by.
+
+    after names steps it waits for as well as those its request refers to.
+    """
+    __slots__ = ["name", "spec", "after"]
+
+    def __init__(self, name, spec, after=None):
+        self.name = name
+        self.spec = spec
+        self.after = list(after or [])
+
+    @classmethod
+    def from_dict(cls, entry):
+        """a step from its saved form, a history entry with a name and maybe after"""
+        if not NAME.match(str(entry.get("name") or "")):
+            raise ValueError("Step names are letters, digits, _ and -, not {!r}".format(
+                entry.get("name")))
+        after = entry.get("after") or []
+        return cls(entry["name"], RequestSpec.from_dict(entry),
+                   [after] if isinstance(after, str) else after)
+
+    def as_dict(self):
+        """the step in the form it is saved in"""
+        entry = dict(name=self.name, **self.spec.as_dict())
+        if self.after:
+            entry["after"] = self.after
+        return entry
+
+    def needs(self):
+        """names of the steps that have to finish before this one is sent"""
+        return (references(self.spec.url) | references(self.spec.data) |
+                references(self.spec.headers) | set(self.after))
+
+
+class Collection(object):
+    """A named list of Steps, kept as YAML in COLLECTIONS_DIRECTORY"""
+    def __init__(self, name, steps=None):
+        self.name = name
+        self.steps = list(steps or [])
+
+    @classmethod
+    def from_dict(cls, name, data):
+        """a collection from its saved form, {"requests": [step, ...]}"""
+        if not isinstance(data, dict) or not isinstance(data.get("requests"), list):
+            raise ValueError("A collection needs a list of requests")
+        return cls(name, [Step.from_dict(entry) for entry in data["requests"]])
+
+    def as_dict(self):
+        """the collection in the form it is saved in"""
+        return {"requests": [step.as_dict() for step in self.steps]}
+
+    def put(self, step):
+        """adds step, in place of any step of the same name"""
+        for number, existing in enumerate(self.steps):
+            if existing.name == step.name:
+                self.steps[number] = step
+                return
+        self.steps.append(step)
+
+    def remove(self, name):
+        """drops the step called name, returns whether there was one"""
+        kept = [step for step in self.steps if step.name != name]
+        removed = len(kept) != len(self.steps)
+        self.steps = kept
+        return removed
+
+    def graph(self):
+        """
+        {step name: names of the steps it needs}.
+
+        ValueError if names repeat, a step needs one that doesn't exist or steps need each
+        other in a loop.
+        """
+        graph = {}
+        for step in self.steps:
+            if step.name in graph:
+                raise ValueError("There is more than one step called {}".format(step.name))
+            graph[step.name] = step.needs()
+        for name, needs in graph.items():
+            unknown = sorted(needs - set(graph))
+            if unknown:
+                raise ValueError("{} needs {}, which isn't in the collection".format(
+                    name, ", ".join(unknown)))
+        waiting = {name: set(needs) for name, needs in graph.items()}
+        while waiting:
+            free = [name for name, needs in waiting.items() if not needs]
+            if not free:
+                raise ValueError("{} need each other".format(", ".join(sorted(waiting))))
+            for name in free:
+                del waiting[name]
+            for needs in waiting.values():
+                needs.difference_update(free)
+        return graph
+
+
+def collection_names():
+    """names of the saved collections"""
+    if not path.isdir(COLLECTIONS_DIRECTORY):
+        return []
+    return sorted(filename[:-len(".yml")] for filename in listdir(COLLECTIONS_DIRECTORY)
+                  if filename.endswith(".yml"))
+
+
+def collection_file(name):
+    """where the collection called name is saved"""
+    return path.join(COLLECTIONS_DIRECTORY, name + ".yml")
+
+
+def load_collection(name):
+    """the saved collection called name, or the collection in the file name"""
+    filename = name if path.isfile(name) else collection_file(name)
+    if not path.isfile(filename):
+        raise FileNotFoundError("There is no collection called {}".format(name))
+    with open(filename) as saved:
+        data = yaml.safe_load(saved)
+    return Collection.from_dict(path.splitext(path.basename(name))[0], data)
+
+
+def save_collection(collection):
+    """writes collection to COLLECTIONS_DIRECTORY, replacing what was saved under its name"""
+    makedirs(COLLECTIONS_DIRECTORY, exist_ok=True)
+    filename = collection_file(collection.name)
+    temp_name = filename + ".tmp"
+    with open(temp_name, "w") as temp_file:
+        yaml.safe_dump(collection.as_dict(), temp_file, sort_keys=False, allow_unicode=True)
+    replace(temp_name, filename)
+
+
+class StepResult(object):
+    """How one step of a run went, start and end are seconds from the start of the run"""
+    def __init__(self, name, start=None, end=None, sent=None, error=None, skipped=None):
+        self.name = name
+        self.start = start
+        self.end = end
+        self.sent = sent
+        self.error = error
+        self.skipped = skipped
+        self._fields = None
+
+    @property
+    def failed(self):
+        """whether the step wasn't sent, its send raised or it got a 4xx or 5xx"""
+        return self.sent is None or self.sent.failed
+
+    @property
+    def status(self):
+        """the status code, or why there isn't one"""
+        if self.skipped is not None:
+            return "skipped"
+        if self.sent is None or self.sent.error is not None:
+            return "error"
+        return str(self.sent.history["status"])
+
+    @property
+    def problem(self):
+        """what went wrong, None if the step succeeded"""
+        if self.skipped is not None:
+            return self.skipped
+        if self.error is not None:
+            return self.error
+        if self.sent is not None and self.sent.error is not None:
+            return "{}: {}".format(type(self.sent.error).__name__, self.sent.error)
+        return None
+
+    def fields(self):
+        """the status, headers and body (parsed if it is JSON) later steps can refer to"""
+        if self._fields is None:
+            response = self.sent.response
+            try:
+                body = json.loads(self.sent.body)
+            except ValueError:
+                body = self.sent.body.decode(charset(response.encoding), errors="replace")
+            self._fields = {"status": response.status_code, "headers": response.headers,
+                            "body": body}
+        return self._fields
+
+
+class CollectionRun(object):
+    """
+    Runs the steps of a collection, each as soon as the steps it needs have finished.
+
+    Steps with nothing left to wait for are sent at once, up to concurrency at a time, on
+    the one SessionManager so they share its keep-alive connections.  A step that fails
+    skips every step that needs it.
+    """
+    def __init__(self, collection, sessions, concurrency=DEFAULT_CONCURRENCY):
+        self.collection = collection
+        # Raises on a broken collection before anything is sent.
+        self.graph = collection.graph()
+        self.concurrency = concurrency
+        self.started = None
+        self.finished = None
+        self._sessions = sessions
+        self._results = {}
+        self._running = {}
+        self._lock = threading.Lock()
+
+    def run(self, cancelled):
+        """sends the steps until all are done or cancelled is set, returns the results"""
+        steps = {step.name: step for step in self.collection.steps}
+        waiting = {name: set(needs) for name, needs in self.graph.items()}
+        dependents = {name: [] for name in self.graph}
+        for name, needs in self.graph.items():
+            for need in needs:
+                dependents[need].append(name)
+        ready = [step.name for step in self.collection.steps if not waiting[step.name]]
+        finished = queue.Queue()
+        self.started = time.monotonic()
+        while (ready or self._running) and not cancelled.is_set():
+            while ready and len(self._running) < self.concurrency:
+                name = ready.pop(0)
+                with self._lock:
+                    self._running[name] = self.elapsed
+                threading.Thread(target=self._step, args=(steps[name], finished),
+                                 daemon=True).start()
+            try:
+                result = finished.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                continue
+            self._keep(result)
+            for dependent in dependents[result.name]:
+                waiting[dependent].discard(result.name)
+                if result.failed:
+                    self._skip(dependent, dependents, "needs {}, which failed".format(result.name))
+                elif not waiting[dependent] and dependent not in self._results:
+                    ready.append(dependent)
+        for name in self.graph:
+            if name not in self._results:
+                self._keep(StepResult(name, skipped="cancelled"))
+        self.finished = time.monotonic()
+        return self.results()
+
+    def _step(self, step, finished):
+        """resolves and sends one step, on a thread of its own"""
+        start = self.elapsed
+        try:
+            spec = RequestSpec(step.spec.method, resolve(step.spec.url, self._results),
+                               resolve(step.spec.data, self._results),
+                               {name: _text(value) for name, value in
+                                resolve(step.spec.headers, self._results).items()})
+        except LookupError as err:
+            finished.put(StepResult(step.name, start, self.elapsed, error=str(err.args[0])))
+            return
+        with PhaseTimer() as timer:
+            sent = send(self._sessions, spec, timer)
+        finished.put(StepResult(step.name, start, self.elapsed, sent))
+
+    def _keep(self, result):
+        with self._lock:
+            self._running.pop(result.name, None)
+            self._results[result.name] = result
+
+    def _skip(self, name, dependents, reason):
+        """marks name and everything that needs it as skipped"""
+        if name in self._results:
+            return
+        self._keep(StepResult(name, skipped=reason))
+        for dependent in dependents[name]:
+            self._skip(dependent, dependents, "needs {}, which was skipped".format(name))
+
+    @property
+    def elapsed(self):
+        """seconds since the run started, until it finished"""
+        if self.started is None:
+            return 0.0
+        return (self.finished if self.finished is not None else time.monotonic()) - self.started
+
+    def results(self):
+        """{step name: StepResult} of the steps done so far"""
+        with self._lock:
+            return dict(self._results)
+
+    def running(self):
+        """{step name: when it started} of the steps in flight"""
+        with self._lock:
+            return dict(self._running)
+
+    @property
+    def failed(self):
+        """whether any step has failed or been skipped"""
+        return any(result.failed for result in self.results().values())
+
+    def critical_path(self):
+        """
+        Names of the chain of steps that decided how long the run took, first to last.
+
+        It ends at the step that finished last and goes back through, at each step, the
+        step it needed that finished last, as that is what it was waiting for.
+        """
+        results = self.results()
+        done = [result for result in results.values() if result.end is not None]
+        if not done:
+            return []
+        last = max(done, key=lambda result: result.end)
+        chain = [last.name]
+        while True:
+            needed = [results[name] for name in self.graph[last.name]
+                      if name in results and results[name].end is not None]
+            if not needed:
+                return chain[::-1]
+            last = max(needed, key=lambda result: result.end)
+            chain.append(last.name)
+
+
+def timeline(run, width=TIMELINE_WIDTH):
+    """
+    Lines of a text timeline of a CollectionRun, finished or not.
+
+    Each step gets a bar from when it was sent to when it finished, on one scale, and the
+    steps on the critical path are starred.
+    """
+    results = run.results()
+    running = run.running()
+    total = run.elapsed
+    critical = run.critical_path()
+    sent = [result for result in results.values() if result.end is not None]
+    lines = [
+        "wall time  {:.1f} ms{}, {:.1f} ms if sent one after another".format(
+            total * 1000, "" if run.finished is not None else " so far",
+            sum(result.end - result.start for result in sent) * 1000),
+        "critical   {}".format(" > ".join(critical) or "-"),
+        "",
+    ]
+    names = max([len(name) for name in run.graph] + [4])
+    scale = width / total if total > 0 else 0
+    problems = []
+    for step in run.collection.steps:
+        result = results.get(step.name)
+        if result is None and step.name in running:
+            start, end, status = running[step.name], total, "..."
+        elif result is None:
+            lines.append("  {:<{}}  {}".format(step.name, names, "waiting"))
+            continue
+        elif result.end is None:
+            lines.append("  {:<{}}  {}".format(step.name, names, result.status))
+            problems.append(result)
+            continue
+        else:
+            start, end, status = result.start, result.end, result.status
+            if result.problem is not None:
+                problems.append(result)
+        lines.append("{} {:<{}}  {:<7} {:>9.1f} {:>9.1f} ms |{}{}".format(
+            "*" if step.name in critical else " ", step.name, names, status, start * 1000,
+            (end - start) * 1000, " " * int(start * scale),
+            "#" * max(1, int(round((end - start) * scale)))))
+    if problems:
+        lines.append("")
+        for result in problems:
+            lines.append("{}: {}".format(result.name, result.problem))
+    return lines
+
+
+def describe(collection):
+    """lines listing the steps of a collection and what each needs"""
+    names = max([len(step.name) for step in collection.steps] + [4])
+    lines = []
+    for step in collection.steps:
+        needs = sorted(step.needs())
+        lines.append("{:<{}}  {!r}{}".format(step.name, names, step.spec,
+                                             "  after " + ", ".join(needs) if needs else ""))
+    return lines
+
+
+def parse(argv):
+    """adds and parses the collection command's arguments"""
+    parser = configargparse.ArgParser(
+        prog="respyte collection",
+        description="run a saved collection of requests and print a timeline of the run",
+        config_file_parser_class=configargparse.YAMLConfigFileParser,
+        default_config_files=[path.join(path.expanduser("~"), ".respyterc.yml")],
+        ignore_unknown_config_file_keys=True)
+    parser.add(
+        'collection',
+        nargs='?',
+        help='the name of a saved collection, or a YAML or JSON file of one'
+    )
+    parser.add(
+        '-c', '--concurrency',
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help='steps to have in flight at once, defaults to {}'.format(DEFAULT_CONCURRENCY)
+    )
+    auth.add_arguments(parser)
+    parser.add(
+        '-l', '--list',
+        action='store_true',
+        help='list the saved collections, or the steps of the collection given'
+    )
+    args = parser.parse_args(argv)
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+    if args.collection is None and not args.list:
+        parser.error("name a collection to run, or --list them")
+    return args
+
+
+def main(argv):
+    """respyte collection name [--concurrency n], exits 1 if any step failed or was skipped"""
+    args = parse(argv)
+    auth.configure(args)
+    if args.collection is None:
+        for name in collection_names():
+            print(name)
+        return 0
+    try:
+        collection = load_collection(args.collection)
+        if args.list:
+            print("\n".join(describe(collection)))
+            return 0
+        sessions = SessionManager(max(DEFAULT_POOL_SIZE, args.concurrency), idle_timeout=0)
+        run = CollectionRun(collection, sessions, args.concurrency)
+    except (OSError, LookupError, ValueError, yaml.YAMLError) as err:
+        print("respyte collection: {}".format(err), file=sys.stderr)
+        return 2
+    cancelled = threading.Event()
+    try:
+        run.run(cancelled)
+    except KeyboardInterrupt:
+        cancelled.set()
+    finally:
+        sessions.close()
+    print("\n".join(timeline(run)))
+    for line in auth.summary_lines():
+        print(line)
+    return 1 if cancelled.is_set() or run.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
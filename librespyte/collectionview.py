@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""Collections of requests, built up from the Main view and run together"""
+from asciimatics.event import KeyboardEvent
+from asciimatics.exceptions import NextScene
+from asciimatics.screen import Screen
+from asciimatics.widgets import Button, Divider, Frame, Label, Layout, Text, TextBox
+from librespyte.auth import summary_lines
+from librespyte.collection import DEFAULT_CONCURRENCY, NAME, Collection, CollectionRun, \
+    Step, collection_names, describe, load_collection, save_collection, timeline
+from librespyte.executor import RequestExecutor
+
+DEFAULT_COLLECTION = "default"
+# Frames between redraws of the timeline while a collection is running.
+REPORT_FRAMES = 5
+
+
+def _count(value):
+    """whether value is a positive whole number"""
+    return value.isdigit() and int(value) > 0
+
+
+def _name(value):
+    """whether value can name a collection or a step"""
+    return NAME.match(value) is not None
+
+
+def _run(job, run):
+    """Runs the collection, on the executor's worker thread"""
+    job.stage = "running"
+    return run.run(job.cancelled)
+
+
+class CollectionView(Frame):
+    """
+    Adds the request composed in the Main view to a collection and runs collections.
+    """
+    def __init__(self, screen, parsed_args, rest):
+        super(CollectionView, self).__init__(screen,
+                                             screen.height,
+                                             screen.width,
+                                             on_load=self._reload,
+                                             hover_focus=True,
+                                             can_scroll=False,
+                                             title="Respyte collections")
+
+        self._rest = rest
+        self._spec = None
+        self._run = None
+        self._executor = RequestExecutor()
+        self.set_theme(parsed_args.color_scheme)
+        settings_layout = Layout([1])
+        self.add_layout(settings_layout)
+        self.target = Text(label="Request: ", name="target", readonly=True)
+        self.collection = Text(label="Collection: ", name="collection", validator=_name,
+                               on_change=self._show_collection)
+        self.step = Text(label="Step name: ", name="step", validator=_name)
+        self.concurrency = Text(label="Concurrency: ", name="concurrency", validator=_count)
+        settings_layout.add_widget(self.target)
+        settings_layout.add_widget(self.collection)
+        settings_layout.add_widget(self.step)
+        settings_layout.add_widget(self.concurrency)
+        settings_layout.add_widget(Label(
+            "Add saves the request under Step name, a request can use ${step.body.id}, "
+            "${step.headers.Location} or ${step.status} of an earlier step and is sent once "
+            "that step is done", height=2))
+        settings_layout.add_widget(Divider())
+        results_layout = Layout([1], fill_frame=True)
+        self.add_layout(results_layout)
+        self.results = TextBox(screen.height - 13,
+                               label="Results",
+                               name="results",
+                               as_string=True,
+                               readonly=True,
+                               tab_stop=False)
+        results_layout.add_widget(self.results)
+        self.step.value = ""
+        self.concurrency.value = str(DEFAULT_CONCURRENCY)
+        # Lists the collection, so the results box has to exist first.
+        self.collection.value = DEFAULT_COLLECTION
+        button_layout = Layout([1, 1, 1, 1, 1, 1])
+        self.add_layout(button_layout)
+        for column in range(6):
+            button_layout.add_widget(Divider(), column)
+        button_layout.add_widget(Button("[Add <F5>]", self._add, add_box=False), 0)
+        button_layout.add_widget(Button("[Remove <F6>]", self._remove, add_box=False), 1)
+        button_layout.add_widget(Button("[Run <F3>]", self._start, add_box=False), 2)
+        button_layout.add_widget(Button("[Stop <F4>]", self._stop, add_box=False), 3)
+        button_layout.add_widget(Button("[Back <ESC>]", self._back, add_box=False), 4)
+        self.fix()
+
+    def _reload(self):
+        """Pick up the request as it is composed now"""
+        try:
+            self._spec = self._rest.compose()
+            self.target.value = repr(self._spec)
+        except Exception as err: # pylint: disable=broad-except
+            self._spec = None
+            self.target.value = "can't add it: {}".format(err)
+        if not self._executor.busy:
+            self._show_collection()
+
+    def _load(self):
+        """the collection named in the Collection field, empty if it hasn't been saved"""
+        name = self.collection.value
+        if name not in collection_names():
+            return Collection(name)
+        return load_collection(name)
+
+    def _show_collection(self):
+        """List the steps of the named collection"""
+        if self._executor.busy or not _name(self.collection.value):
+            return
+        try:
+            collection = self._load()
+            lines = describe(collection) or ["No requests yet, compose one and Add it"]
+            try:
+                collection.graph()
+            except ValueError as err:
+                lines.extend(["", str(err)])
+        except Exception as err: # pylint: disable=broad-except
+            lines = [str(err)]
+        self.results.value = "\n".join(lines)
+
+    def _add(self):
+        """Save the composed request in the collection under the step name"""
+        if self._spec is None or not (_name(self.collection.value) and _name(self.step.value)):
+            return
+        self._edit(lambda collection: collection.put(Step(self.step.value, self._spec)))
+
+    def _remove(self):
+        """Drop the step named in Step name from the collection"""
+        if _name(self.collection.value) and _name(self.step.value):
+            self._edit(lambda collection: collection.remove(self.step.value))
+
+    def _edit(self, change):
+        try:
+            collection = self._load()
+            change(collection)
+            save_collection(collection)
+        except Exception as err: # pylint: disable=broad-except
+            self.results.value = str(err)
+            return
+        self._show_collection()
+
+    def _start(self):
+        """Run the collection, stopping any run in progress"""
+        if not (_name(self.collection.value) and _count(self.concurrency.value)):
+            return
+        self._executor.cancel()
+        try:
+            self._run = CollectionRun(self._load(), self._rest.sessions,
+                                      int(self.concurrency.value))
+        except Exception as err: # pylint: disable=broad-except
+            self._run = None
+            self.results.value = str(err)
+            return
+        self._executor.submit(_run, self._run)
+        self._show_timeline()
+
+    def _stop(self):
+        """Stop the running collection, steps in flight are abandoned"""
+        if self._executor.busy:
+            self._executor.cancel()
+            self._show_timeline()
+
+    def _show_timeline(self):
+        if self._run is not None:
+            lines = timeline(self._run)
+            self.results.value = "\n".join(lines + summary_lines(gap=True))
+
+    @staticmethod
+    def _back():
+        raise NextScene("Main")
+
+    def _update(self, frame_no):
+        for job in self._executor.poll():
+            if job.error is not None:
+                self.results.value = str(job.error)
+            else:
+                self._show_timeline()
+        if self._executor.busy and frame_no % REPORT_FRAMES == 0:
+            self._show_timeline()
+        status = self._executor.status(frame_no // 2)
+        self.title = "Respyte collections{}".format(" " + status if status else "")
+        super(CollectionView, self)._update(frame_no)
+
+    @property
+    def frame_update_count(self):
+        # Keep redrawing while a collection is running so the timeline stays live.
+        if self._executor.busy:
+            return 1
+        return super(CollectionView, self).frame_update_count
+
+    def process_event(self, event):
+        if isinstance(event, KeyboardEvent):
+            if event.key_code == Screen.KEY_ESCAPE:
+                self._back()
+            elif event.key_code == Screen.KEY_F3:
+                self._start()
+                return None
+            elif event.key_code == Screen.KEY_F4:
+                self._stop()
+                return None
+            elif event.key_code == Screen.KEY_F5:
+                self._add()
+                return None
+            elif event.key_code == Screen.KEY_F6:
+                self._remove()
+                return None
+        return super(CollectionView, self).process_event(event)
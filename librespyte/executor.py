@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""Runs blocking sends off the asciimatics event loop"""
+import queue
+import threading
+import time
+
+SPINNER = "|/-\\"
+
+
+class Job(object):
+    """A single unit of work handed to the RequestExecutor"""
+    def __init__(self, func, args):
+        self.func = func
+        self.args = args
+        self.started = time.monotonic()
+        self.cancelled = threading.Event()
+        self.result = None
+        self.error = None
+        self.updates = queue.Queue()
+        self.received = 0
+        self.first_byte = None
+        self.last_byte = None
+        self.stage = "in flight"
+
+    @property
+    def elapsed(self):
+        """seconds since the job was submitted"""
+        return time.monotonic() - self.started
+
+    def cancel(self):
+        """flags the job, the worker checks this between blocking steps"""
+        self.cancelled.set()
+
+    def post(self, kind, payload):
+        """hands partial results to the UI thread while the job is still running"""
+        self.updates.put((kind, payload))
+
+    def count(self, received):
+        """records body bytes as they arrive, for the transfer rate"""
+        self.last_byte = time.monotonic()
+        if self.first_byte is None:
+            self.first_byte = self.last_byte
+        self.received += received
+
+    @property
+    def rate(self):
+        """body bytes per second between the first and the latest chunk"""
+        if self.first_byte is None:
+            return 0
+        return self.received / max(self.last_byte - self.first_byte, 1e-3)
+
+
+class RequestExecutor(object):
+    """
+    Runs one request at a time on a daemon worker thread.
+
+    The worker never touches widgets, finished jobs are queued and handed back
+    to the UI thread through poll(), which the Frame calls from its update loop.
+    """
+    def __init__(self):
+        self._finished = queue.Queue()
+        self._job = None
+
+    @property
+    def job(self):
+        """the job currently in flight, or None"""
+        return self._job
+
+    @property
+    def busy(self):
+        """whether a job is in flight"""
+        return self._job is not None
+
+    def submit(self, func, *args):
+        """
+        Runs func(job, *args) on a worker thread, cancelling whatever is in flight.
+
+        func receives the Job so that it can check job.cancelled between steps.
+        """
+        self.cancel()
+        job = Job(func, args)
+        self._job = job
+        worker = threading.Thread(target=self._run, args=(job,), daemon=True)
+        worker.start()
+        return job
+
+    def cancel(self):
+        """abandons the job in flight, its result will be discarded"""
+        if self._job is not None:
+            self._job.cancel()
+            self._job = None
+
+    def _run(self, job):
+        try:
+            job.result = job.func(job, *job.args)
+        except Exception as err: # pylint: disable=broad-except
+            job.error = err
+        self._finished.put(job)
+
+    @staticmethod
+    def drain(job):
+        """partial results posted by job that haven't been collected yet"""
+        posted = []
+        while True:
+            try:
+                posted.append(job.updates.get_nowait())
+            except queue.Empty:
+                return posted
+
+    def updates(self):
+        """partial results posted by the job in flight, call from the UI thread"""
+        return self.drain(self._job) if self._job is not None else []
+
+    def poll(self):
+        """returns finished jobs that were not cancelled, call from the UI thread"""
+        done = []
+        while True:
+            try:
+                job = self._finished.get_nowait()
+            except queue.Empty:
+                return done
+            if job is self._job:
+                self._job = None
+            if not job.cancelled.is_set():
+                done.append(job)
+
+    def status(self, frame_no):
+        """one line description of the job in flight for the Frame title"""
+        if self._job is None:
+            return ""
+        transfer = ""
+        if self._job.first_byte is not None:
+            transfer = " {} {}/s".format(human_size(self._job.received),
+                                         human_size(self._job.rate))
+        return "{} {} {:.1f}s{} <F4 cancel>".format(
+            SPINNER[frame_no % len(SPINNER)], self._job.stage, self._job.elapsed, transfer)
+
+
+def human_size(size):
+    """formats a byte count for the status line"""
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return "{:.0f} {}".format(size, unit) if unit == "B" else "{:.1f} {}".format(size, unit)
+        size /= 1024
+    return "{:.1f} GB".format(size)
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""HDR style latency histograms, fixed size whatever the number of samples"""
+from array import array
+
+# Sub buckets per power of two, values are kept to within 1 / 2 ** (SUB_BUCKET_BITS - 1).
+SUB_BUCKET_BITS = 8
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+_HALF = SUB_BUCKETS >> 1
+# Values are counted in whole microseconds, up to an hour.
+UNIT = 1e-6
+HIGHEST = 3600 * 10 ** 6
+
+
+def _index(value):
+    """the bucket of a value in microseconds"""
+    if value < SUB_BUCKETS:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS
+    return shift * _HALF + (value >> shift)
+
+
+def _bounds(index):
+    """the lowest value in the bucket and the lowest value in the next one"""
+    if index < SUB_BUCKETS:
+        return index, index + 1
+    shift = index // _HALF - 1
+    lowest = (index - shift * _HALF) << shift
+    return lowest, lowest + (1 << shift)
+
+
+class Histogram(object):
+    """
+    Counts of latencies in buckets whose width grows with the value.
+
+    Recording is a couple of integer operations, percentiles are accurate to better than
+    one percent of the value and two histograms merge by adding their counts, so workers
+    can each keep one and a report can combine them.
+    """
+    __slots__ = ["counts", "count", "total", "lowest", "highest"]
+
+    def __init__(self):
+        self.counts = array("Q", bytes(8 * (_index(HIGHEST) + 1)))
+        self.count = 0
+        self.total = 0
+        self.lowest = None
+        self.highest = 0
+
+    def record(self, seconds, count=1):
+        """adds count samples of seconds"""
+        value = min(HIGHEST, max(0, int(seconds / UNIT)))
+        self.counts[_index(value)] += count
+        self.count += count
+        self.total += value * count
+        self.lowest = value if self.lowest is None else min(self.lowest, value)
+        self.highest = max(self.highest, value)
+
+    def merge(self, other):
+        """adds the samples of other to this histogram"""
+        if not other.count:
+            return self
+        for index, count in enumerate(other.counts):
+            if count:
+                self.counts[index] += count
+        self.count += other.count
+        self.total += other.total
+        self.lowest = other.lowest if self.lowest is None else min(self.lowest, other.lowest)
+        self.highest = max(self.highest, other.highest)
+        return self
+
+    def to_dict(self):
+        """the histogram as plain types, only buckets with samples are listed"""
+        return {"counts": [[index, count] for index, count in enumerate(self.counts) if count],
+                "total": self.total, "lowest": self.lowest, "highest": self.highest}
+
+    @classmethod
+    def from_dict(cls, data):
+        """the histogram to_dict described"""
+        histogram = cls()
+        for index, count in data["counts"]:
+            histogram.counts[index] = count
+            histogram.count += count
+        histogram.total = data["total"]
+        histogram.lowest = data["lowest"]
+        histogram.highest = data["highest"]
+        return histogram
+
+    def copy(self):
+        """a histogram with the same samples"""
+        return Histogram().merge(self)
+
+    @property
+    def minimum(self):
+        """the fastest sample in seconds"""
+        return (self.lowest or 0) * UNIT
+
+    @property
+    def maximum(self):
+        """the slowest sample in seconds"""
+        return self.highest * UNIT
+
+    @property
+    def mean(self):
+        """the average sample in seconds"""
+        return self.total * UNIT / self.count if self.count else 0.0
+
+    def percentile(self, percent):
+        """the seconds percent of the samples were at or under"""
+        if not self.count:
+            return 0.0
+        wanted = max(1, -(-self.count * percent // 100))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= wanted:
+                return min(self.highest, _bounds(index)[1] - 1) * UNIT
+        return self.maximum
+
+    def buckets(self):
+        """(lowest seconds, next bucket's lowest seconds, count) of the buckets with samples"""
+        for index, count in enumerate(self.counts):
+            if count:
+                lowest, upper = _bounds(index)
+                yield lowest * UNIT, upper * UNIT, count
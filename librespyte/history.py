@@ -1,33 +1,44 @@
 #!/usr/bin/env python3
 """Main view of respyte"""
-from os import makedirs, path
+from os import path
 import json
-from yaml import safe_load, dump
-from asciimatics.widgets import Button, Divider, ListBox, Frame, Layout
+from yaml import dump
+from asciimatics.widgets import Button, Divider, Frame, Layout, Text
 from asciimatics.exceptions import NextScene
+from librespyte.historylist import HistoryList, HistoryWindow
 from librespyte.pager import Pager
+from librespyte.preview import PreviewCache
+from librespyte.store import CONFIG_DIRECTORY, parse_filter
 
-CONFIG_DIRECTORY = path.expanduser(path.join("~", ".config", "respyte"))
-HISTORY_FILE = path.join(CONFIG_DIRECTORY, "history.json")
 SCRATCH_FILE = path.join(CONFIG_DIRECTORY, "scratch.json")
+# Rows either side of the cursor whose previews are rendered ahead of time.
+PREFETCH_ROWS = 5
 
 class HistoryView(Frame):
     """This is the rest composition menu"""
-    def __init__(self, screen, parsed_args):
+    def __init__(self, screen, parsed_args, history):
         super(HistoryView, self).__init__(screen,
                                           screen.height,
                                           screen.width,
-                                          on_load=self._update_preview,
+                                          on_load=self._reload,
                                           hover_focus=True,
                                           can_scroll=False,
                                           title="Respyte")
 
+        self._history_store = history
+        self._filters = {}
+        self._previews = PreviewCache(self._render_preview,
+                                      int(parsed_args.preview_cache_mb * 1024 * 1024))
+        self._generation = history.generation
         theme = parsed_args.color_scheme
         self.set_theme(theme)
         # Create the form for displaying the list of contacts.
         history_layout = Layout([1])
         self.add_layout(history_layout)
         self.data['history'] = 0
+        self.filter_bar = Text(label="Filter: ",
+                               name="filter",
+                               on_change=self._filter)
         self.preview_box = Pager(
             screen.height // 2,
             label="Preview body",
@@ -36,14 +47,15 @@ class HistoryView(Frame):
             as_string=True,
             tab_stop=False,
         )
-        self.history_list = ListBox(
-            (screen.height//2) - 4,
+        self.history_list = HistoryList(
+            (screen.height//2) - 5,
             self._history(), label="History",
             on_change=self._update_preview,
             on_select=self._update_preview,
             name="history"
         )
         self._update_preview()
+        history_layout.add_widget(self.filter_bar, 0)
         history_layout.add_widget(self.history_list, 0)
         preview_layout = Layout([1])
         self.add_layout(preview_layout)
@@ -59,33 +71,52 @@ class HistoryView(Frame):
         self.fix()
 
     def _history(self):
-        """Show history"""
-        if not path.isfile(HISTORY_FILE):
-            makedirs(CONFIG_DIRECTORY, exist_ok=True)
-            with open(HISTORY_FILE, 'w') as history_file:
-                history_file.write(json.dumps(
-                    {'history': []}
-                ))
-        options = []
-        with open(HISTORY_FILE, 'r') as history_file:
-            lines = json.loads(history_file.read())['history']
-            index = 0
-            for line in lines:
-                options.append((json.dumps(line), index))
-                index += 1
-        return options
+        """Show history matching the filter bar, rows are only fetched once visible"""
+        return HistoryWindow(self._history_store, self._filters)
+
+    def _reload(self):
+        """Pick up entries sent since the view was last shown"""
+        self._history_store.refresh()
+        if self._generation != self._history_store.generation:
+            self._generation = self._history_store.generation
+            self._previews.clear()
+        if self.history_list.options.version != self._history_store.version:
+            self.history_list.options = self._history()
+        self._update_preview()
+
+    def _filter(self):
+        """Re-run the history query when the filter bar changes"""
+        try:
+            self._filters = parse_filter(self.filter_bar.value)
+        except ValueError:
+            # Half typed filter, keep showing the last valid results.
+            return
+        self.history_list.options = self._history()
+        self._update_preview()
+
+    def _render_preview(self, entry_id):
+        return dump(self._history_store[entry_id])
 
     def _update_preview(self):
         try:
-            options = self._history()
-            self.history_list.options = self._history()
-            self.screen.refresh()
-            self.preview_box.value = dump(safe_load(str(options[self.history_list.value][0])))
+            self.preview_box.value = self._previews.get(self.history_list.value)
+            self._prefetch_neighbours()
         except TypeError:
             self.preview_box.value = ""
         except IndexError:
             self.preview_box.value = "No preview available"
 
+    def _prefetch_neighbours(self):
+        """Render the rows around the cursor in the background"""
+        options = self.history_list.options
+        line = self.history_list.line
+        nearby = []
+        for distance in range(1, PREFETCH_ROWS + 1):
+            for neighbour in (line + distance, line - distance):
+                if 0 <= neighbour < len(options):
+                    nearby.append(options[neighbour][1])
+        self._previews.prefetch(nearby)
+
     @staticmethod
     def _cancel():
         raise NextScene("Main")
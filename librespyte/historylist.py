@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""This module implements a list box that only loads the visible part of the history"""
+from collections import OrderedDict
+import time
+from asciimatics.event import KeyboardEvent, MouseEvent
+from asciimatics.screen import Screen
+from asciimatics.widgets.widget import Widget
+from asciimatics.widgets.utilities import _enforce_width
+
+
+def summary_label(summary):
+    """one line description of a history entry"""
+    stamp = summary.get("timestamp")
+    return "{:<7} {:<19} {:>3} {}".format(
+        summary.get("method") or "",
+        time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(stamp)) if stamp else "",
+        summary.get("status") or "",
+        summary.get("url") or "")
+
+
+class HistoryWindow(object):
+    """
+    A read only sequence of (label, entry id) over a HistoryModel matching a filter.
+
+    Rows are fetched from the store a page at a time and only the most
+    recently used pages are kept, so memory use does not grow with the history.
+    """
+    def __init__(self, store, filters=None, page_size=100, max_pages=8):
+        self._store = store
+        self.version = store.version
+        self._filters = filters or {}
+        self._page_size = page_size
+        self._max_pages = max_pages
+        self._pages = OrderedDict()
+        self._count = None
+
+    def __len__(self):
+        if self._count is None:
+            self._count = self._store.count(self._filters)
+        return self._count
+
+    def __getitem__(self, position):
+        if not 0 <= position < len(self):
+            raise IndexError(position)
+        number = position // self._page_size
+        page = self._pages.get(number)
+        if page is None:
+            page = [(summary_label(summary), entry_id) for entry_id, summary in
+                    self._store.summaries(self._filters, number * self._page_size,
+                                          self._page_size)]
+            self._pages[number] = page
+            while len(self._pages) > self._max_pages:
+                self._pages.popitem(last=False)
+        else:
+            self._pages.move_to_end(number)
+        return page[position - number * self._page_size]
+
+    def position_of(self, entry_id):
+        """position of entry_id if it is in a loaded page, otherwise None"""
+        for number, page in self._pages.items():
+            for i, (_, value) in enumerate(page):
+                if value == entry_id:
+                    return number * self._page_size + i
+        return None
+
+
+class HistoryList(Widget):
+    """
+    A HistoryList is a list box over a HistoryWindow.
+
+    Unlike ListBox it never holds all of its options, it only asks the window
+    for the rows it is about to draw.
+    """
+
+    __slots__ = ["_options", "_line", "_start_line", "_required_height", "_on_change",
+                 "_on_select"]
+
+    def __init__(self, height, options, label=None, name=None, on_change=None, on_select=None,
+                 **kwargs):
+        """
+        :param height: The required number of input lines for this list.
+        :param options: The HistoryWindow to show.
+        :param label: An optional label for the widget.
+        :param name: The name for the widget.
+        :param on_change: Optional function to call when selection changes.
+        :param on_select: Optional function to call when the user actually selects an entry from
+            this list - e.g. by double-clicking or pressing Enter.
+
+        Also see the common keyword arguments in :py:obj:`.Widget`.
+        """
+        super(HistoryList, self).__init__(name, **kwargs)
+        self._label = label
+        self._options = options
+        self._line = 0
+        self._start_line = 0
+        self._required_height = height
+        self._on_change = on_change
+        self._on_select = on_select
+        self._value = self._options[0][1] if len(self._options) > 0 else None
+
+    def update(self, frame_no):
+        self._draw_label()
+
+        height = self._h
+        width = self._w - self._offset
+
+        # Clear out the existing box content
+        (colour, attr, background) = self._frame.palette["field"]
+        for i in range(height):
+            self._frame.canvas.print_at(
+                " " * self.width,
+                self._x + self._offset,
+                self._y + i,
+                colour, attr, background)
+
+        # Keep the selection on screen.
+        self._start_line = max(0, max(self._line - height + 1,
+                                      min(self._start_line, self._line)))
+
+        # Render visible portion of the list, this is the only place rows are fetched.
+        for i in range(self._start_line, min(len(self._options), self._start_line + height)):
+            text = self._options[i][0]
+            colour, attr, background = self._pick_colours("field", i == self._line)
+            if len(text) > width:
+                text = text[:width - 3] + "..."
+            paint_text = _enforce_width(text, width, self._frame.canvas.unicode_aware)
+            paint_text += " " * (width - self.string_len(str(paint_text)))
+            self._frame.canvas.paint(
+                str(paint_text),
+                self._x + self._offset,
+                self._y + i - self._start_line,
+                colour, attr, background)
+
+    def reset(self):
+        pass
+
+    def _move_to(self, line):
+        """select the row at line, clamped to the list"""
+        if len(self._options) > 0:
+            self._line = min(max(0, line), len(self._options) - 1)
+            self.value = self._options[self._line][1]
+
+    def process_event(self, event):
+        if isinstance(event, KeyboardEvent):
+            if event.key_code == Screen.KEY_UP:
+                self._move_to(self._line - 1)
+            elif event.key_code == Screen.KEY_DOWN:
+                self._move_to(self._line + 1)
+            elif event.key_code == Screen.KEY_PAGE_UP:
+                self._move_to(self._line - self._h)
+            elif event.key_code == Screen.KEY_PAGE_DOWN:
+                self._move_to(self._line + self._h)
+            elif event.key_code == Screen.KEY_HOME:
+                self._move_to(0)
+            elif event.key_code == Screen.KEY_END:
+                self._move_to(len(self._options) - 1)
+            elif event.key_code in [Screen.ctrl("m"), Screen.ctrl("j")]:
+                if self._on_select:
+                    self._on_select()
+            else:
+                return event
+        elif isinstance(event, MouseEvent):
+            if event.buttons != 0 and len(self._options) > 0 and \
+                    self.is_mouse_over(event, include_label=False):
+                new_line = event.y - self._y + self._start_line
+                if new_line < len(self._options):
+                    self._move_to(new_line)
+                    if event.buttons & MouseEvent.DOUBLE_CLICK != 0 and self._on_select:
+                        self._on_select()
+                return None
+            return event
+        else:
+            return event
+
+        # If we got here, we processed the event - swallow it.
+        return None
+
+    def required_height(self, offset, width):
+        return self._required_height
+
+    @property
+    def line(self):
+        """
+        The position of the selected row.
+        """
+        return self._line
+
+    @property
+    def options(self):
+        """
+        The HistoryWindow this list is showing.
+        """
+        return self._options
+
+    @options.setter
+    def options(self, new_value):
+        self._options = new_value
+        self._start_line = 0
+        self.value = self._value
+
+    @property
+    def value(self):
+        """
+        The entry id of the selected row.
+        """
+        return self._value
+
+    @value.setter
+    def value(self, new_value):
+        old_value = self._value
+        position = None
+        if 0 <= self._line < len(self._options) and self._options[self._line][1] == new_value:
+            position = self._line
+        elif new_value is not None:
+            position = self._options.position_of(new_value)
+        if position is None:
+            self._line = 0
+            self._value = self._options[0][1] if len(self._options) > 0 else None
+        else:
+            self._line = position
+            self._value = new_value
+        if old_value != self._value and self._on_change:
+            self._on_change()
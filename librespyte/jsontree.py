@@ -0,0 +1,293 @@
+# -*- coding: utf-8 -*-
+"""This module implements a collapsible tree view of a parsed JSON document"""
+from itertools import islice
+import json
+import re
+from asciimatics.event import KeyboardEvent, MouseEvent
+from asciimatics.screen import Screen
+from asciimatics.widgets.widget import Widget
+from asciimatics.widgets.utilities import _enforce_width
+
+# Children shown at a time when a node is expanded, the rest are paged through.
+PAGE_SIZE = 100
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+class _Node(object):
+    """A key and value of the document, its children are only made when it is expanded"""
+    __slots__ = ["key", "value", "parent", "depth", "expanded", "offset"]
+
+    def __init__(self, key, value, parent=None):
+        self.key = key
+        self.value = value
+        self.parent = parent
+        self.depth = parent.depth + 1 if parent is not None else 0
+        self.expanded = False
+        self.offset = 0
+
+    @property
+    def container(self):
+        """whether the node has children"""
+        return isinstance(self.value, (dict, list)) and len(self.value) > 0
+
+    def children(self):
+        """nodes for the current page of children"""
+        if isinstance(self.value, dict):
+            items = islice(self.value.items(), self.offset, self.offset + PAGE_SIZE)
+        else:
+            items = enumerate(self.value[self.offset:self.offset + PAGE_SIZE], self.offset)
+        return [_Node(key, value, self) for key, value in items]
+
+    @property
+    def path(self):
+        """where the node is in the document, e.g. $.items[3].name"""
+        if self.parent is None:
+            return "$"
+        if isinstance(self.key, int):
+            return "{}[{}]".format(self.parent.path, self.key)
+        if _IDENTIFIER.match(self.key):
+            return "{}.{}".format(self.parent.path, self.key)
+        return "{}[{}]".format(self.parent.path, json.dumps(self.key, ensure_ascii=False))
+
+    def label(self, width):
+        """one line description, scalars are cut short well before they'd be dumped in full"""
+        if self.parent is None:
+            name = "$"
+        elif isinstance(self.key, int):
+            name = "[{}]".format(self.key)
+        else:
+            name = self.key
+        value = self.value
+        if isinstance(value, dict):
+            summary = "{{...}} {} keys".format(len(value)) if value else "{}"
+        elif isinstance(value, list):
+            summary = "[...] {} items".format(len(value)) if value else "[]"
+        else:
+            if isinstance(value, str) and len(value) > width:
+                value = value[:width]
+            summary = json.dumps(value, ensure_ascii=False)
+        marker = ("- " if self.expanded else "+ ") if self.container else "  "
+        return "{}{}{}: {}".format("  " * self.depth, marker, name, summary)
+
+
+class _PageRow(object):
+    """A row that moves its parent on to the previous or next page of children"""
+    __slots__ = ["parent", "step", "depth"]
+
+    def __init__(self, parent, step):
+        self.parent = parent
+        self.step = step
+        self.depth = parent.depth + 1
+
+    def label(self, width):
+        """one line description of the page it shows"""
+        total = len(self.parent.value)
+        start = max(0, self.parent.offset + self.step)
+        if self.step < 0:
+            hidden = self.parent.offset
+        else:
+            hidden = total - self.parent.offset - PAGE_SIZE
+        return "{}  ... {} more, Enter shows {}-{} of {}".format(
+            "  " * self.depth, hidden, start + 1, min(total, start + PAGE_SIZE), total)
+
+
+class JsonTree(Widget):
+    """
+    A JsonTree shows a parsed JSON document as a tree of collapsible nodes.
+
+    Only expanded nodes are turned into rows, expanding or collapsing one only touches the
+    rows of its own children, and containers with many children show them a page at a time.
+    """
+
+    __slots__ = ["_rows", "_line", "_start_line", "_required_height", "_on_change"]
+
+    def __init__(self, height, document=None, label=None, name=None, on_change=None, **kwargs):
+        """
+        :param height: The required number of input lines for this tree.
+        :param document: The parsed JSON to show.
+        :param label: An optional label for the widget.
+        :param name: The name for the widget.
+        :param on_change: Optional function to call when selection changes.
+
+        Also see the common keyword arguments in :py:obj:`.Widget`.
+        """
+        super(JsonTree, self).__init__(name, **kwargs)
+        self._label = label
+        self._line = 0
+        self._start_line = 0
+        self._required_height = height
+        self._on_change = on_change
+        self._rows = []
+        self.document = document
+
+    def update(self, frame_no):
+        self._draw_label()
+
+        height = self._h
+        width = self._w - self._offset
+
+        # Clear out the existing box content
+        (colour, attr, background) = self._frame.palette["field"]
+        for i in range(height):
+            self._frame.canvas.print_at(
+                " " * self.width,
+                self._x + self._offset,
+                self._y + i,
+                colour, attr, background)
+
+        # Keep the selection on screen.
+        self._start_line = max(0, max(self._line - height + 1,
+                                      min(self._start_line, self._line)))
+
+        # Render visible portion of the tree, the only rows that get a label.
+        for i in range(self._start_line, min(len(self._rows), self._start_line + height)):
+            text = self._rows[i].label(width)
+            colour, attr, background = self._pick_colours("field", i == self._line)
+            if len(text) > width:
+                text = text[:width - 3] + "..."
+            paint_text = _enforce_width(text, width, self._frame.canvas.unicode_aware)
+            paint_text += " " * (width - self.string_len(str(paint_text)))
+            self._frame.canvas.paint(
+                str(paint_text),
+                self._x + self._offset,
+                self._y + i - self._start_line,
+                colour, attr, background)
+
+    def reset(self):
+        pass
+
+    def _expand(self, line):
+        """shows the children of the node at line"""
+        node = self._rows[line]
+        if not node.container or node.expanded:
+            return
+        node.expanded = True
+        rows = node.children()
+        if node.offset > 0:
+            rows.insert(0, _PageRow(node, -PAGE_SIZE))
+        if node.offset + PAGE_SIZE < len(node.value):
+            rows.append(_PageRow(node, PAGE_SIZE))
+        self._rows[line + 1:line + 1] = rows
+
+    def _collapse(self, line):
+        """hides everything below the node at line"""
+        node = self._rows[line]
+        if not isinstance(node, _Node) or not node.expanded:
+            return
+        node.expanded = False
+        end = line + 1
+        while end < len(self._rows) and self._rows[end].depth > node.depth:
+            end += 1
+        del self._rows[line + 1:end]
+
+    def _turn_page(self, line):
+        """moves the parent of the page row at line on to the page it shows"""
+        row = self._rows[line]
+        parent = self._parent_line(line)
+        self._collapse(parent)
+        row.parent.offset = max(0, row.parent.offset + row.step)
+        self._expand(parent)
+        # Land on the first child of the new page, not the page row above it.
+        self._move_to(parent + (2 if row.parent.offset > 0 else 1))
+
+    def _toggle(self, line):
+        """expands, collapses or pages from the row at line"""
+        row = self._rows[line]
+        if isinstance(row, _PageRow):
+            self._turn_page(line)
+        elif row.expanded:
+            self._collapse(line)
+        else:
+            self._expand(line)
+
+    def _parent_line(self, line):
+        """the line of the node above line one level up, or line itself at the top"""
+        depth = self._rows[line].depth
+        while line > 0 and self._rows[line].depth >= depth:
+            line -= 1
+        return line
+
+    def _move_to(self, line):
+        """select the row at line, clamped to the tree"""
+        if self._rows:
+            old_line = self._line
+            self._line = min(max(0, line), len(self._rows) - 1)
+            if old_line != self._line and self._on_change:
+                self._on_change()
+
+    def process_event(self, event):
+        if isinstance(event, KeyboardEvent):
+            if event.key_code in [Screen.KEY_UP, 107]:
+                self._move_to(self._line - 1)
+            elif event.key_code in [Screen.KEY_DOWN, 106]:
+                self._move_to(self._line + 1)
+            elif event.key_code == Screen.KEY_PAGE_UP:
+                self._move_to(self._line - self._h)
+            elif event.key_code == Screen.KEY_PAGE_DOWN:
+                self._move_to(self._line + self._h)
+            elif event.key_code in [Screen.KEY_HOME, 103]:
+                self._move_to(0)
+            elif event.key_code in [Screen.KEY_END, 71]:
+                self._move_to(len(self._rows) - 1)
+            elif event.key_code in [Screen.ctrl("m"), Screen.ctrl("j"), 32]:
+                if self._rows:
+                    self._toggle(self._line)
+            elif event.key_code in [Screen.KEY_RIGHT, 108]:
+                if self._rows and isinstance(self._rows[self._line], _Node):
+                    self._expand(self._line)
+            elif event.key_code in [Screen.KEY_LEFT, 104]:
+                if self._rows:
+                    row = self._rows[self._line]
+                    if isinstance(row, _Node) and row.expanded:
+                        self._collapse(self._line)
+                    else:
+                        self._move_to(self._parent_line(self._line))
+            else:
+                return event
+        elif isinstance(event, MouseEvent):
+            if event.buttons != 0 and self._rows and \
+                    self.is_mouse_over(event, include_label=False):
+                new_line = event.y - self._y + self._start_line
+                if new_line < len(self._rows):
+                    self._move_to(new_line)
+                    if event.buttons & MouseEvent.DOUBLE_CLICK != 0:
+                        self._toggle(new_line)
+                return None
+            return event
+        else:
+            return event
+
+        # If we got here, we processed the event - swallow it.
+        return None
+
+    def required_height(self, offset, width):
+        return self._required_height
+
+    @property
+    def document(self):
+        """
+        The parsed JSON being shown.
+        """
+        return self._rows[0].value if self._rows else None
+
+    @document.setter
+    def document(self, new_value):
+        self._rows = [_Node(None, new_value)]
+        self._line = 0
+        self._start_line = 0
+        self._expand(0)
+
+    @property
+    def value(self):
+        """
+        The path of the selected node, e.g. $.items[3].name.
+        """
+        if not self._rows:
+            return None
+        row = self._rows[self._line]
+        return row.path if isinstance(row, _Node) else row.parent.path
+
+    @value.setter
+    def value(self, new_value):
+        # The selection follows the cursor, paths can't be selected from outside.
+        pass
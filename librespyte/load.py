@@ -0,0 +1,577 @@
+#!/usr/bin/env python3
+"""Load tests of a RequestSpec, closed loop or at a scheduled arrival rate"""
+from collections import Counter
+import itertools
+import math
+import multiprocessing
+import queue
+import re
+import threading
+import time
+import urllib3
+from librespyte.auth import TOKENS, TokenCache, authorizer
+from librespyte.histogram import Histogram
+from librespyte.remote import Channel
+from librespyte.spec import RequestSpec
+
+DEFAULT_REQUESTS = 1000
+DEFAULT_CONCURRENCY = 10
+HISTOGRAM_ROWS = 12
+HISTOGRAM_WIDTH = 40
+PERCENTILES = (50, 90, 99)
+# Seconds between the stats each worker process sends to the coordinator.
+REPORT_INTERVAL = 0.25
+# Seconds a remote worker has to answer that it is ready to start.
+READY_TIMEOUT = 10
+_STAGE = re.compile(r"^(\d+(?:\.\d+)?)(?:-(\d+(?:\.\d+)?))?(?::(\d+(?:\.\d+)?)s?)?$")
+
+
+def parse_profile(text):
+    """
+    Parses a rate profile such as "100" or "10-200:30 200:60".
+
+    Each stage is a rate in requests per second, or a from-to rate ramped linearly, and
+    how many seconds it lasts, 0:10 pauses for ten seconds.  A constant last stage may leave
+    out its duration, it then lasts until the requested number of requests have been sent.
+
+    :returns: a list of (from rate, to rate, seconds or None), empty for no profile.
+    """
+    parts = text.replace(",", " ").split()
+    stages = []
+    for position, stage in enumerate(parts, 1):
+        match = _STAGE.match(stage)
+        if match is None:
+            raise ValueError("Can't read rate stage {!r}, expected e.g. 100, 100:30 or "
+                             "10-200:30".format(stage))
+        start = float(match.group(1))
+        end = float(match.group(2)) if match.group(2) else start
+        seconds = float(match.group(3)) if match.group(3) else None
+        if seconds is None and (end != start or position != len(parts)):
+            raise ValueError("Only a constant last stage may leave out its duration")
+        if start <= 0 and end <= 0 and seconds is None:
+            raise ValueError("Stage {!r} never sends anything".format(stage))
+        stages.append((start, end, seconds))
+    return stages
+
+
+def arrivals(stages, requests):
+    """
+    When each request is due, in seconds from the start of the test.
+
+    Stops after requests, or at the end of the last stage if that comes first.
+    """
+    offset = 0.0
+    sent = 0
+    for start, end, seconds in stages:
+        if seconds is None:
+            slope, due = 0.0, float("inf")
+        else:
+            # Requests due t seconds into a linear ramp: start * t + slope * t * t / 2.
+            slope = (end - start) / seconds
+            due = start * seconds + slope * seconds * seconds / 2
+        stage_sent = 0
+        while stage_sent < due and sent < requests:
+            if slope:
+                at = (math.sqrt(start * start + 2 * slope * stage_sent) - start) / slope
+            else:
+                at = stage_sent / start
+            yield offset + at
+            stage_sent += 1
+            sent += 1
+        offset += seconds or 0.0
+
+
+class LoadStats(object):
+    """
+    What a load test has seen so far.
+
+    latency is measured from when each request was due to be sent, so a slow response that
+    holds up the requests behind it shows in their latency too, rather than being hidden by
+    the sender slowing down.  service is measured from when each was actually sent.  In a
+    closed loop test they are the same.  Only responses are timed, sends that failed are
+    counted in errors alone so quick failures don't flatter the percentiles.
+    """
+    def __init__(self):
+        self.latency = Histogram()
+        self.service = Histogram()
+        self.statuses = Counter()
+        self.errors = Counter()
+        self.behind = 0.0
+        self.started = time.monotonic()
+        self.finished = None
+        self._lock = threading.Lock()
+
+    def record(self, due, sent, status=None, error=None):
+        """adds a response that was due and sent at those times, or the error that stopped it"""
+        done = time.monotonic()
+        with self._lock:
+            self.behind = max(self.behind, sent - due)
+            if error is not None:
+                self.errors[error] += 1
+            else:
+                self.latency.record(done - due)
+                self.service.record(done - sent)
+                self.statuses[status] += 1
+
+    @property
+    def done(self):
+        """requests sent so far, answered or not"""
+        return sum(self.statuses.values()) + sum(self.errors.values())
+
+    def snapshot(self):
+        """a copy of the stats as they are now"""
+        copy = LoadStats()
+        with self._lock:
+            copy.latency = self.latency.copy()
+            copy.service = self.service.copy()
+            copy.statuses = Counter(self.statuses)
+            copy.errors = Counter(self.errors)
+            copy.behind = self.behind
+        copy.started = self.started
+        copy.finished = self.finished if self.finished is not None else time.monotonic()
+        return copy
+
+    @property
+    def elapsed(self):
+        """seconds from the start to the end of the test, or to now while it is running"""
+        return (self.finished if self.finished is not None else time.monotonic()) - self.started
+
+    def merge(self, other):
+        """adds the responses other has seen to these stats"""
+        with self._lock:
+            self.latency.merge(other.latency)
+            self.service.merge(other.service)
+            self.statuses.update(other.statuses)
+            self.errors.update(other.errors)
+            self.behind = max(self.behind, other.behind)
+        return self
+
+    def to_dict(self):
+        """the responses seen as plain types, for sending to a coordinator"""
+        with self._lock:
+            return {"latency": self.latency.to_dict(), "service": self.service.to_dict(),
+                    "statuses": list(self.statuses.items()), "errors": dict(self.errors),
+                    "behind": self.behind, "finished": self.finished}
+
+    @classmethod
+    def from_dict(cls, data):
+        """the stats to_dict described, timed from now"""
+        stats = cls()
+        stats.latency = Histogram.from_dict(data["latency"])
+        stats.service = Histogram.from_dict(data["service"])
+        stats.statuses = Counter(dict((status, count) for status, count in data["statuses"]))
+        stats.errors = Counter(data["errors"])
+        stats.behind = data["behind"]
+        stats.finished = data["finished"]
+        return stats
+
+
+class CombinedStats(object):
+    """
+    The latest LoadStats of each of several workers, merged when a report asks for them.
+
+    Workers send everything they have seen so far each time, so a lost or late update
+    only delays the report rather than skewing it.
+    """
+    def __init__(self, started=None):
+        self.started = started if started is not None else time.monotonic()
+        self.finished = None
+        self._parts = {}
+        self._lock = threading.Lock()
+
+    def update(self, worker, stats):
+        """replaces what worker has seen with stats"""
+        with self._lock:
+            self._parts[worker] = stats
+
+    def finish(self):
+        """marks the test finished when the last worker did, workers share the clock"""
+        with self._lock:
+            finished = [part.finished for part in self._parts.values()
+                        if part.finished is not None]
+        self.finished = max(finished) if finished else time.monotonic()
+
+    def snapshot(self):
+        """the merged stats of every worker as they are now"""
+        merged = LoadStats()
+        with self._lock:
+            parts = list(self._parts.values())
+        for part in parts:
+            merged.merge(part)
+        merged.started = self.started
+        merged.finished = self.finished if self.finished is not None else time.monotonic()
+        return merged
+
+    @property
+    def elapsed(self):
+        """seconds from the start to the end of the test, or to now while it is running"""
+        return (self.finished if self.finished is not None else time.monotonic()) - self.started
+
+
+def _share(total, index, count):
+    """how much of total the index-th of count workers takes on"""
+    return total // count + (1 if index < total % count else 0)
+
+
+def histogram(latencies, rows=HISTOGRAM_ROWS, width=HISTOGRAM_WIDTH):
+    """
+    Lines of a text histogram of a Histogram.
+
+    The rows grow geometrically from the fastest to the slowest response so a long
+    tail doesn't squash the fast ones into a single row.
+    """
+    if not latencies.count:
+        return []
+    low, high = max(latencies.minimum, 1e-6), max(latencies.maximum, 1e-6)
+    ratio = (high / low) ** (1.0 / rows) if high > low else 1.0
+    bounds = [low * ratio ** (row + 1) for row in range(rows)] if ratio > 1 else [high]
+    counts = [0] * len(bounds)
+    row = 0
+    for lowest, _, count in latencies.buckets():
+        while row < len(bounds) - 1 and lowest >= bounds[row]:
+            row += 1
+        counts[row] += count
+    most = max(counts)
+    lines = []
+    lower = latencies.minimum
+    for bound, count in zip(bounds, counts):
+        lines.append("{:>9.1f} - {:>9.1f} ms |{:<{}} {}".format(
+            lower * 1000, bound * 1000, "#" * int(round(count * width / most)), width, count))
+        lower = bound
+    return lines
+
+
+def _percentiles(latencies):
+    """one line of the percentiles and maximum of a Histogram"""
+    return "{}  max {:.1f} ms".format("  ".join(
+        "p{} {:.1f} ms".format(percent, latencies.percentile(percent) * 1000)
+        for percent in PERCENTILES), latencies.maximum * 1000)
+
+
+def report(stats, planned=None, scheduled=False):
+    """lines describing the throughput, errors, status codes and latencies so far"""
+    stats = stats.snapshot()
+    done = stats.done
+    failed = sum(stats.errors.values()) + sum(count for status, count in stats.statuses.items()
+                                              if status >= 400)
+    lines = [
+        "requests   {}{}, {} failed ({:.1f}%)".format(
+            done, " of {}".format(planned) if planned else "", failed,
+            100.0 * failed / done if done else 0.0),
+        "elapsed    {:.2f} s, {:.1f} req/s".format(
+            stats.elapsed, done / stats.elapsed if stats.elapsed else 0.0),
+        "status     {}".format("  ".join(
+            "{}: {}".format(status, count)
+            for status, count in sorted(stats.statuses.items())) or "-"),
+    ]
+    if stats.errors:
+        lines.append("errors     {}".format("  ".join(
+            "{}: {}".format(error, count) for error, count in stats.errors.most_common())))
+    if stats.latency.count:
+        lines.append("latency    {}".format(_percentiles(stats.latency)))
+        if scheduled:
+            lines.append("service    {}".format(_percentiles(stats.service)))
+            lines.append("behind     up to {:.1f} ms{}".format(
+                stats.behind * 1000,
+                ", add concurrency to keep up" if stats.behind > stats.service.maximum else ""))
+        lines.append("")
+        lines.extend(histogram(stats.latency))
+    return lines
+
+
+class LoadTest(object):
+    """
+    Sends a request a number of times from a number of threads at once.
+
+    Without a profile each thread sends its next request as soon as the last one's body
+    has been read.  With a rate profile (see parse_profile) requests fall due on a schedule
+    whatever the responses do, each thread takes the next due request when it is free and
+    its latency counts from when it was due.  When every thread is stuck on a slow
+    response the wait shows in the latency instead of quietly lowering the rate.
+
+    The request is encoded once up front and its Authorization hook run for each send
+    through tokens (see auth.authorizer), so cached values are refreshed ahead of expiring
+    during a long test.  The threads share a pool with a keep-alive connection per thread
+    and go through urllib3 directly, skipping the per send overhead of a requests.Session.
+
+    With more than one process the requests and connections are shared out between worker
+    processes, each with its own pool, so sending isn't held to one core by the GIL.  Each
+    process takes every n-th request of the schedule from a common start, and sends the
+    coordinator its stats every REPORT_INTERVAL to be merged into one report.  Given
+    workers (see librespyte.remote) the test is shared out between them the same way.  No
+    more processes or workers are used than there are connections, as each needs one.
+    Processes and workers are sent the hook's name rather than its value, and each runs it
+    through a TokenCache of its own, set up as tokens is.
+    """
+    def __init__(self, spec, requests=DEFAULT_REQUESTS, concurrency=DEFAULT_CONCURRENCY,
+                 profile=None, processes=1, share=(0, 1), workers=None, tokens=None):
+        self.spec = spec
+        self.tokens = tokens if tokens is not None else TOKENS
+        self.requests = requests
+        self.concurrency = max(1, min(concurrency, requests))
+        self.profile = profile or []
+        self.share = tuple(share)
+        self.processes = max(1, min(processes, _share(self.concurrency, *self.share)))
+        self.workers = (workers or [])[:_share(self.concurrency, *self.share)]
+        self.stats = LoadStats()
+        self._due = None
+        self._lock = threading.Lock()
+
+    @property
+    def scheduled(self):
+        """whether requests are sent on a schedule rather than in a closed loop"""
+        return bool(self.profile)
+
+    @property
+    def planned(self):
+        """how many requests the test will send"""
+        if not self.scheduled:
+            return self.requests
+        return sum(1 for _ in arrivals(self.profile, self.requests))
+
+    def run(self, cancelled=None):
+        """sends every request, returns the stats once they are done or cancelled"""
+        return self.send(self.spec, cancelled)
+
+    def send(self, spec, cancelled=None):
+        """sends every request of this test's share of spec"""
+        cancelled = cancelled if cancelled is not None else threading.Event()
+        if self.workers:
+            return self._run_remote(spec, cancelled)
+        if self.processes > 1:
+            return self._run_processes(spec, cancelled)
+        return self.run_share(spec, cancelled)
+
+    def run_share(self, spec, cancelled, started=None):
+        """
+        Sends this worker's share of the requests of spec from its threads.
+
+        :param started: when the schedule starts, if it is shared with other workers.
+        """
+        index, count = self.share
+        headers, body = spec.encode()
+        authorize = authorizer(spec.method, spec.url, spec.data, spec.headers, self.tokens)
+        concurrency = _share(self.concurrency, index, count)
+        pool = urllib3.PoolManager(maxsize=concurrency, block=True, cert_reqs="CERT_NONE")
+        self.stats = LoadStats()
+        if started is not None:
+            self.stats.started = started
+        if self.scheduled:
+            started = self.stats.started
+            self._due = (started + offset for offset in itertools.islice(
+                arrivals(self.profile, self.requests), index, None, count))
+        else:
+            self._due = itertools.repeat(None, _share(self.requests, index, count))
+        workers = [threading.Thread(target=self._send,
+                                    args=(pool, spec.method, spec.url, headers, body, authorize,
+                                          cancelled),
+                                    daemon=True)
+                   for _ in range(concurrency)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.stats.finished = time.monotonic()
+        pool.clear()
+        return self.stats
+
+    def _run_processes(self, spec, cancelled):
+        """shares the requests out between worker processes and merges their stats"""
+        # Not forked, the TUI has threads of its own running.
+        context = multiprocessing.get_context("spawn")
+        messages = context.Queue()
+        start = context.Value("d", 0.0)
+        go = context.Event()
+        stop = context.Event()
+        # Each process takes every n-th of this test's share.
+        index, count = self.share
+        shares = [(index + count * process, count * self.processes)
+                  for process in range(self.processes)]
+        workers = [context.Process(target=_work,
+                                   args=(spec.as_dict(), self.requests, self.concurrency,
+                                         self.profile, share, _auth(self.tokens), start, go,
+                                         stop, messages),
+                                   daemon=True)
+                   for share in shares]
+        for worker in workers:
+            worker.start()
+        self.stats = CombinedStats()
+        waiting = {"ready": {share[0] for share in shares},
+                   "done": {share[0] for share in shares}}
+        error = None
+        try:
+            while waiting["done"] and error is None:
+                if cancelled.is_set():
+                    stop.set()
+                    go.set()
+                try:
+                    kind, index, payload = messages.get(timeout=REPORT_INTERVAL)
+                except queue.Empty:
+                    if not any(worker.is_alive() for worker in workers):
+                        error = "The load test worker processes exited"
+                    continue
+                if kind == "error":
+                    error = payload
+                    continue
+                waiting.get(kind, set()).discard(index)
+                if kind == "ready" and not waiting["ready"]:
+                    # Every process has started up, the schedule starts now for all of them.
+                    start.value = self.stats.started = time.monotonic()
+                    go.set()
+                elif kind in ("stats", "done"):
+                    self.stats.update(index, LoadStats.from_dict(payload))
+        finally:
+            stop.set()
+            go.set()
+            for worker in workers:
+                worker.join(1)
+            self.stats.finish()
+        if error is not None:
+            raise RuntimeError(error)
+        return self.stats
+
+    def _run_remote(self, spec, cancelled):
+        """shares the requests out between remote workers and merges their stats"""
+        index, count = self.share
+        channels = []
+        self.stats = CombinedStats()
+        errors = []
+        try:
+            for worker in self.workers:
+                channels.append(Channel.connect(worker))
+            for number, channel in enumerate(channels):
+                channel.send({"type": "run", "spec": spec.as_dict(), "requests": self.requests,
+                              "concurrency": self.concurrency, "profile": self.profile,
+                              "share": [index + count * number, count * len(channels)],
+                              "auth": _auth(self.tokens)})
+            if not self._wait_ready(channels, cancelled):
+                return self.stats
+            # Workers' clocks can't be compared, each starts the schedule when it is told to.
+            self.stats.started = time.monotonic()
+            for channel in channels:
+                channel.send({"type": "start"})
+            readers = [threading.Thread(target=self._follow, args=(worker, channel, errors),
+                                        daemon=True)
+                       for worker, channel in zip(self.workers, channels)]
+            for reader in readers:
+                reader.start()
+            stopping = False
+            for reader in readers:
+                while reader.is_alive():
+                    reader.join(REPORT_INTERVAL)
+                    if (cancelled.is_set() or errors) and not stopping:
+                        stopping = True
+                        for channel in channels:
+                            channel.send({"type": "stop"})
+        finally:
+            for channel in channels:
+                channel.close()
+            self.stats.finish()
+        if errors:
+            raise RuntimeError("; ".join(errors))
+        return self.stats
+
+    def _wait_ready(self, channels, cancelled):
+        """waits for every worker to answer ready, False if the test is cancelled first"""
+        answers = {}
+        readers = [threading.Thread(target=_receive, args=(channel, answers), daemon=True)
+                   for channel in channels]
+        for reader in readers:
+            reader.start()
+        deadline = time.monotonic() + READY_TIMEOUT
+        for worker, channel, reader in zip(self.workers, channels, readers):
+            while reader.is_alive():
+                if cancelled.is_set():
+                    return False
+                if time.monotonic() > deadline:
+                    raise RuntimeError("{}: not ready after {} seconds".format(
+                        worker, READY_TIMEOUT))
+                reader.join(REPORT_INTERVAL)
+            message = answers.get(channel)
+            if message is None or message["type"] != "ready":
+                raise RuntimeError("{}: {}".format(worker, _failure(message)))
+        return True
+
+    def _follow(self, worker, channel, errors):
+        """merges the stats a remote worker sends until it is done"""
+        while True:
+            message = channel.receive()
+            if message is None or message["type"] not in ("stats", "done"):
+                errors.append("{}: {}".format(worker, _failure(message)))
+                return
+            stats = LoadStats.from_dict(message["stats"])
+            stats.finished = time.monotonic() if message["type"] == "done" else None
+            self.stats.update(worker, stats)
+            if message["type"] == "done":
+                return
+
+    def _next_due(self):
+        """when the next request is due, None for right away, StopIteration once all are"""
+        with self._lock:
+            return next(self._due)
+
+    def _send(self, pool, method, url, headers, body, authorize, cancelled):
+        # This thread's own, authorize sets the Authorization of each send in them.
+        headers = dict(headers)
+        while not cancelled.is_set():
+            try:
+                due = self._next_due()
+            except StopIteration:
+                return
+            if due is not None and cancelled.wait(max(0.0, due - time.monotonic())):
+                return
+            sent = time.monotonic()
+            if authorize is not None:
+                try:
+                    authorize(headers)
+                except Exception as err: # pylint: disable=broad-except
+                    self.stats.record(sent if due is None else due, sent,
+                                      error=type(err).__name__)
+                    continue
+            try:
+                response = pool.urlopen(method, url, body=body, headers=headers,
+                                        retries=False, redirect=False)
+            except (urllib3.exceptions.HTTPError, OSError) as err:
+                self.stats.record(sent if due is None else due, sent, error=type(err).__name__)
+            else:
+                self.stats.record(sent if due is None else due, sent, response.status)
+
+
+def _receive(channel, answers):
+    """puts the next message from channel in answers, on a thread of its own"""
+    answers[channel] = channel.receive()
+
+
+def _auth(tokens):
+    """the settings of tokens, for a worker to set up a TokenCache of its own with"""
+    return [tokens.default_ttl, tokens.refresh_window]
+
+
+def _failure(message):
+    """what went wrong, from a worker's error message or lack of one"""
+    if message is None:
+        return "the worker hung up"
+    return message.get("message", "unexpected {} message".format(message.get("type")))
+
+
+def _work(spec, requests, concurrency, profile, share, auth, start, go, stop, messages):
+    """Sends one worker process's share of a LoadTest, runs in the worker process"""
+    index = share[0]
+    try:
+        test = LoadTest(RequestSpec.from_dict(spec), requests, concurrency, profile, share=share,
+                        tokens=TokenCache(*auth))
+        cancelled = threading.Event()
+        messages.put(("ready", index, None))
+        go.wait()
+        if not stop.is_set():
+            sender = threading.Thread(target=test.run_share,
+                                      args=(test.spec, cancelled, start.value), daemon=True)
+            sender.start()
+            while sender.is_alive():
+                sender.join(REPORT_INTERVAL)
+                if stop.is_set():
+                    cancelled.set()
+                messages.put(("stats", index, test.stats.to_dict()))
+        messages.put(("done", index, test.stats.to_dict()))
+    except Exception as err: # pylint: disable=broad-except
+        messages.put(("error", index, "{}: {}".format(type(err).__name__, err)))
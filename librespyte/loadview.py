@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""Load test of the request composed in the Main view"""
+from asciimatics.event import KeyboardEvent
+from asciimatics.exceptions import NextScene
+from asciimatics.screen import Screen
+from asciimatics.widgets import Button, Divider, Frame, Label, Layout, Text, TextBox
+from librespyte.auth import summary_lines
+from librespyte.executor import RequestExecutor
+from librespyte.load import DEFAULT_CONCURRENCY, DEFAULT_REQUESTS, LoadTest, parse_profile, \
+    report
+
+# Frames between redraws of the report while a test is running.
+REPORT_FRAMES = 5
+
+
+def _count(value):
+    """whether value is a positive whole number"""
+    return value.isdigit() and int(value) > 0
+
+
+def _profile(value):
+    """whether value is empty or a rate profile"""
+    try:
+        parse_profile(value)
+        return True
+    except ValueError:
+        return False
+
+
+def _load(job, test):
+    """Runs the load test, on the executor's worker thread"""
+    job.stage = "load testing"
+    return test.run(job.cancelled)
+
+
+class LoadTestView(Frame):
+    """
+    Sends the composed request N times at concurrency C, or at a rate, and reports how it went.
+    """
+    def __init__(self, screen, parsed_args, rest):
+        super(LoadTestView, self).__init__(screen,
+                                           screen.height,
+                                           screen.width,
+                                           on_load=self._reload,
+                                           hover_focus=True,
+                                           can_scroll=False,
+                                           title="Respyte load test")
+
+        self._rest = rest
+        self._spec = None
+        self._test = None
+        self._planned = None
+        self._executor = RequestExecutor()
+        self.set_theme(parsed_args.color_scheme)
+        settings_layout = Layout([1])
+        self.add_layout(settings_layout)
+        self.target = Text(label="Request: ", name="target", readonly=True)
+        self.requests = Text(label="Requests: ", name="requests", validator=_count)
+        self.concurrency = Text(label="Concurrency: ", name="concurrency", validator=_count)
+        self.rate = Text(label="Rate: ", name="rate", validator=_profile)
+        self.processes = Text(label="Processes: ", name="processes", validator=_count)
+        self.workers = Text(label="Workers: ", name="workers")
+        self.requests.value = str(DEFAULT_REQUESTS)
+        self.concurrency.value = str(DEFAULT_CONCURRENCY)
+        self.rate.value = ""
+        self.processes.value = str(parsed_args.load_processes)
+        self.workers.value = parsed_args.load_workers
+        settings_layout.add_widget(self.target)
+        settings_layout.add_widget(self.requests)
+        settings_layout.add_widget(self.concurrency)
+        settings_layout.add_widget(self.rate)
+        settings_layout.add_widget(self.processes)
+        settings_layout.add_widget(self.workers)
+        settings_layout.add_widget(Label(
+            "Rate is empty to send as fast as the connections allow, or requests per second "
+            "to keep to, e.g. 100 or ramped 10-200:30 200:60"))
+        settings_layout.add_widget(Divider())
+        results_layout = Layout([1], fill_frame=True)
+        self.add_layout(results_layout)
+        self.results = TextBox(screen.height - 13,
+                               label="Results",
+                               name="results",
+                               as_string=True,
+                               readonly=True,
+                               tab_stop=False)
+        results_layout.add_widget(self.results)
+        button_layout = Layout([1, 1, 1, 1, 1])
+        self.add_layout(button_layout)
+        for column in range(5):
+            button_layout.add_widget(Divider(), column)
+        button_layout.add_widget(Button("[Start <F3>]", self._start, add_box=False), 1)
+        button_layout.add_widget(Button("[Stop <F4>]", self._stop, add_box=False), 2)
+        button_layout.add_widget(Button("[Back <ESC>]", self._back, add_box=False), 3)
+        self.fix()
+
+    def _reload(self):
+        """Pick up the request as it is composed now"""
+        try:
+            self._spec = self._rest.compose()
+            self.target.value = repr(self._spec)
+        except Exception as err: # pylint: disable=broad-except
+            self._spec = None
+            self.target.value = "can't load test it: {}".format(err)
+
+    def _start(self):
+        """Start a load test, stopping any that is running"""
+        if self._spec is None or not (_count(self.requests.value) and
+                                      _count(self.concurrency.value) and
+                                      _profile(self.rate.value) and
+                                      _count(self.processes.value)):
+            return
+        self._test = LoadTest(self._spec, int(self.requests.value), int(self.concurrency.value),
+                              parse_profile(self.rate.value), int(self.processes.value),
+                              workers=[worker.strip() for worker in self.workers.value.split(",")
+                                       if worker.strip()])
+        self._planned = self._test.planned
+        self._executor.submit(_load, self._test)
+        self._show_report()
+
+    def _stop(self):
+        """Stop the running load test, what it has done so far is kept"""
+        if self._executor.busy:
+            self._executor.cancel()
+            self._show_report()
+
+    def _show_report(self):
+        if self._test is not None:
+            lines = report(self._test.stats, self._planned, self._test.scheduled)
+            self.results.value = "\n".join(lines + summary_lines(gap=True))
+
+    @staticmethod
+    def _back():
+        raise NextScene("Main")
+
+    def _update(self, frame_no):
+        for job in self._executor.poll():
+            if job.error is not None:
+                self.results.value = str(job.error)
+            else:
+                self._show_report()
+        if self._executor.busy and frame_no % REPORT_FRAMES == 0:
+            self._show_report()
+        status = self._executor.status(frame_no // 2)
+        self.title = "Respyte load test{}".format(" " + status if status else "")
+        super(LoadTestView, self)._update(frame_no)
+
+    @property
+    def frame_update_count(self):
+        # Keep redrawing while a test is running so the report stays live.
+        if self._executor.busy:
+            return 1
+        return super(LoadTestView, self).frame_update_count
+
+    def process_event(self, event):
+        if isinstance(event, KeyboardEvent):
+            if event.key_code == Screen.KEY_ESCAPE:
+                self._back()
+            elif event.key_code == Screen.KEY_F3:
+                self._start()
+                return None
+            elif event.key_code == Screen.KEY_F4:
+                self._stop()
+                return None
+        return super(LoadTestView, self).process_event(event)
@@ -1,10 +1,19 @@
 # -*- coding: utf-8 -*-
 """This module implements a multi line editing text box"""
+from array import array
+from bisect import bisect_right
+from itertools import accumulate, compress
+import re
 from asciimatics.event import KeyboardEvent
 from asciimatics.screen import Screen
 from asciimatics.strings import ColouredText
 from asciimatics.widgets.widget import Widget
 from asciimatics.widgets.utilities import _find_min_start, _enforce_width, logger
+from librespyte.search import PENDING, MatchIndex, compile_pattern
+from librespyte.spool import SPOOL_THRESHOLD, SpooledLines
+from librespyte.wrap import SINGLE_ROW, LineWrap, part_of, wrap_breaks
+# Lines measured at a time when working out display row offsets.
+ROW_BLOCK = 65536
 
 
 class Pager(Widget):
@@ -15,11 +24,12 @@ class Pager(Widget):
     """
 
     __slots__ = ["_label", "_line", "_column", "_start_line", "_start_column", "_required_height",
-                 "_as_string", "_line_wrap", "_on_change", "_reflowed_text_cache", "_parser",
-                 "_readonly"]
+                 "_as_string", "_line_wrap", "_on_change", "_parser", "_readonly",
+                 "_spool_threshold", "_size", "_limit", "_row_starts", "_wrap_cache", "_search",
+                 "_prompt", "_regex", "_pending", "_message"]
 
     def __init__(self, height, label=None, name=None, as_string=False, line_wrap=False, parser=None,
-                 on_change=None, **kwargs):
+                 on_change=None, spool_threshold=SPOOL_THRESHOLD, **kwargs):
         """
         :param height: The required number of input lines for this TextBox.
         :param label: An optional label for the widget.
@@ -30,6 +40,8 @@ class Pager(Widget):
         :param parser: Optional parser to colour text.
         :param on_change: Optional function to call when text changes.
         :param readonly: Whether the widget prevents user input to change values.  Default is False.
+        :param spool_threshold: String values longer than this are kept in a memory mapped temp
+            file instead of a list of lines, None keeps everything in memory.
 
         Also see the common keyword arguments in :py:obj:`.Widget`.
         """
@@ -44,14 +56,37 @@ class Pager(Widget):
         self._line_wrap = line_wrap
         self._parser = parser
         self._on_change = on_change
-        self._reflowed_text_cache = None
         self._readonly = True
+        self._limit = 1
+        self._row_starts = array('q', [0])
+        self._wrap_cache = {}
+        self._spool_threshold = spool_threshold
+        self._size = 0
+        self._search = None
+        self._prompt = None
+        self._regex = False
+        self._pending = None
+        self._message = None
+
+    @property
+    def spooled(self):
+        """
+        Whether the value is held on disk rather than in memory.
+        """
+        return isinstance(self._value, SpooledLines)
 
     def update(self, frame_no):
         self._draw_label()
 
-        # Calculate new visible limits if needed.
-        height = self._h
+        self._follow_search()
+
+        # Calculate new visible limits if needed, the last row is taken by any search prompt.
+        status = self._status()
+        height = self._h - 1 if status is not None else self._h
+        limit = max(1, self._w - self._offset)
+        if limit != self._limit:
+            self._limit = limit
+            self._forget_layout(0)
         if not self._line_wrap:
             self._start_column = min(self._start_column, self._column)
             self._start_column += _find_min_start(
@@ -63,38 +98,55 @@ class Pager(Widget):
         # Clear out the existing box content
         (colour, attr, background) = self._pick_colours("edit_text")
         self._frame.canvas.clear_buffer(
-            colour, attr, background, self._x + self._offset, self._y, self.width, height)
+            colour, attr, background, self._x + self._offset, self._y, self.width, self._h)
 
         # Convert value offset to display offsets
         # NOTE: _start_column is always in display coordinates.
-        display_text = self._reflowed_text
         display_start_column = self._start_column
-        display_line, display_column = 0, 0
-        for i, (_, line, col) in enumerate(display_text):
-            if line < self._line or (line == self._line and col <= self._column):
-                display_line = i
-                display_column = self._column - col
+        breaks = self._breaks(self._line)
+        part = part_of(breaks, self._column)
+        display_line = self._row_of(self._line) + part
+        display_column = self._column - breaks[part]
 
         # Restrict to visible/valid content.
         self._start_line = max(0, max(display_line - height + 1,
                                       min(self._start_line, display_line)))
 
-        # Render visible portion of the text.
-        for line, (text, _, _) in enumerate(display_text):
-            if self._start_line <= line < self._start_line + height:
+        # Render visible portion of the text, starting from the source line at the top.
+        line, part = self._line_at_row(self._start_line)
+        row = 0
+        painted = []
+        while row < height and line < len(self._value):
+            line_breaks = self._breaks(line)
+            while row < height:
+                try:
+                    text = self._row_text(line, line_breaks, part)
+                except IndexError:
+                    break
                 paint_text = _enforce_width(
                     text[display_start_column:], self.width, self._frame.canvas.unicode_aware)
                 self._frame.canvas.paint(
                     str(paint_text),
                     self._x + self._offset,
-                    self._y + line - self._start_line,
+                    self._y + row,
                     colour, attr, background,
                     colour_map=paint_text.colour_map if hasattr(paint_text, "colour_map") else None)
+                painted.append((line, line_breaks[part] + display_start_column, str(paint_text)))
+                row += 1
+                part += 1
+            line += 1
+            part = 0
+        self._highlight(painted)
+        if status is not None:
+            self._frame.canvas.paint(
+                str(_enforce_width(status, self.width, self._frame.canvas.unicode_aware)),
+                self._x + self._offset, self._y + height, colour, attr | Screen.A_REVERSE,
+                background)
 
         # Since we switch off the standard cursor, we need to emulate our own
         # if we have the input focus.
         if self._has_focus:
-            line = str(display_text[display_line][0])
+            line = str(self._row_text(self._line, breaks, part_of(breaks, self._column)))
             logger.debug("Cursor: %d,%d", display_start_column, display_column)
             text_width = self.string_len(line[display_start_column:display_column])
             self._draw_cursor(
@@ -103,13 +155,156 @@ class Pager(Widget):
                 self._x + self._offset + text_width,
                 self._y + display_line - self._start_line)
 
+    def _status(self):
+        """the search prompt or message for the last row, or None"""
+        if self._prompt is not None:
+            return "{}{}{}".format("[regex] " if self._regex else "", *self._prompt)
+        if self._pending is not None:
+            return "Searching for {}".format(self._search.pattern.pattern)
+        return self._message
+
+    def _highlight(self, painted):
+        """
+        Paints over the matches of the current search in the rows just painted.
+
+        :param painted: (value line, value column, text) of each row that was painted.
+        """
+        if self._search is None or not painted:
+            return
+        colour, attr, background = self._pick_colours("field", selected=True)
+        for line, column, length in self._search.visible(painted[0][0], painted[-1][0]):
+            for row, (row_line, row_column, text) in enumerate(painted):
+                start = max(0, column - row_column)
+                end = min(len(text), column + length - row_column)
+                if row_line != line or start >= end:
+                    continue
+                self._frame.canvas.paint(
+                    text[start:end],
+                    self._x + self._offset + self.string_len(text[:start]),
+                    self._y + row,
+                    colour, attr, background)
+
+    def _breaks(self, index):
+        """
+        The value columns at which each display row of line index starts.
+
+        Lines that only wrap as they are read are remembered, the rest are cheap to work out.
+        """
+        if not self._line_wrap:
+            return SINGLE_ROW
+        breaks = self._wrap_cache.get(index)
+        if breaks is None:
+            breaks = wrap_breaks(str(self._value[index]), self._limit,
+                                 self._frame.canvas.unicode_aware)
+            if isinstance(breaks, LineWrap):
+                self._wrap_cache[index] = breaks
+        return breaks
+
+    def _row_text(self, index, breaks, part):
+        """the text of one display row of line index, IndexError past its last row"""
+        start = breaks[part]
+        line = self._value[index]
+        try:
+            return line[start:breaks[part + 1]]
+        except IndexError:
+            return line[start:] if start else line
+
+    def _extend_rows(self, index, row=None):
+        """
+        Makes sure the display row offsets are known up to the start of line index.
+
+        Lines are measured a block at a time.  When their lengths alone give the number of
+        rows they are never read, otherwise only those long enough to maybe wrap are looked
+        at individually, spooled ones by their encoded length.  Given a display row, stops
+        at the first line that only wraps as it is read and is on or after row, rather than
+        wrapping all of it, and returns whether row is on that line.
+        """
+        row_starts = self._row_starts
+        limit = self._limit
+        threshold = limit
+        arithmetic = not self._frame.canvas.unicode_aware
+        if not arithmetic:
+            threshold = (threshold + 1) // 2
+        if self.spooled:
+            # ASCII wraps the same with or without unicode awareness.
+            arithmetic = self._value.ascii
+        index = min(index, len(self._value))
+        while len(row_starts) <= index:
+            first = len(row_starts) - 1
+            last = min(index, first + ROW_BLOCK)
+            if self.spooled:
+                lengths = self._value.byte_lengths(first, last)
+            else:
+                lengths = map(len, self._value[first:last])
+            if arithmetic:
+                # See wrap_breaks(), a full last row is followed by an empty one.
+                rows = map((1).__add__, map(limit.__rfloordiv__, lengths))
+                row_starts.extend(accumulate(rows, initial=row_starts[-1]))
+                del row_starts[first + 1]
+                continue
+            wrapped = list(compress(range(last - first), map(threshold.__le__, lengths)))
+            if not wrapped:
+                row_starts.extend(range(row_starts[-1] + 1, row_starts[-1] + last - first + 1))
+                continue
+            rows = [1] * (last - first)
+            # Rows taken by the lines measured so far beyond the one each line takes.
+            extra = 0
+            on_row = None
+            for i in wrapped:
+                breaks = self._breaks(first + i)
+                start = row_starts[-1] + i + extra
+                if row is not None and isinstance(breaks, LineWrap):
+                    # Past row nothing more is needed, on it only as much as reaches row.
+                    on_row = start <= row and breaks.has_row(row - start)
+                    if start > row or on_row:
+                        del rows[i:]
+                        break
+                    on_row = None
+                rows[i] = len(breaks)
+                extra += rows[i] - 1
+            row_starts.extend(accumulate(rows, initial=row_starts[-1]))
+            # accumulate() repeats the running total we started from.
+            del row_starts[first + 1]
+            if on_row is not None:
+                return on_row
+        return False
+
+    def _row_of(self, index):
+        """the display row at which line index starts"""
+        if not self._line_wrap:
+            return index
+        self._extend_rows(index)
+        return self._row_starts[index]
+
+    def _line_at_row(self, row):
+        """
+        The (value line, display row within that line) shown at display row.
+
+        Offsets are only worked out as far as row, then found by binary search.  A long line
+        that row falls on is only wrapped as far as row.
+        """
+        if not self._line_wrap:
+            return min(row, len(self._value) - 1), 0
+        row_starts = self._row_starts
+        while row_starts[-1] <= row and len(row_starts) <= len(self._value):
+            if self._extend_rows(len(row_starts) - 1 + ROW_BLOCK, row):
+                return len(row_starts) - 1, row - row_starts[-1]
+        index = min(bisect_right(row_starts, row) - 1, len(self._value) - 1)
+        return index, row - row_starts[index]
+
+    def _forget_layout(self, index):
+        """drops wrapping and row offsets from value line index onwards"""
+        del self._row_starts[index + 1:]
+        for cached in [i for i in self._wrap_cache if i >= index]:
+            del self._wrap_cache[cached]
+
     def reset(self):
         # Reset to original data and move to end of the text.
         self._start_line = 0
         self._start_column = 0
         self._line = len(self._value) - 1
         self._column = 0 if self._is_disabled else len(self._value[self._line])
-        self._reflowed_text_cache = None
+        self._forget_layout(0)
 
     def _change_line(self, delta):
         """
@@ -124,9 +319,78 @@ class Pager(Widget):
         if self._column >= len(self._value[self._line]):
             self._column = len(self._value[self._line])
 
+    def _start_search(self, text, backwards):
+        """starts indexing the matches of text and moves to the first one once it is found"""
+        try:
+            pattern = compile_pattern(text, self._regex)
+        except re.error as err:
+            self._message = "Bad pattern: {}".format(err)
+            return
+        self._stop_search()
+        self._search = MatchIndex(self._value, pattern, self._line, backwards,
+                                  literal=not self._regex)
+        self._pending = backwards
+
+    def _stop_search(self):
+        if self._search is not None:
+            self._search.stop()
+        self._search = None
+        self._pending = None
+
+    def _follow_search(self):
+        """moves to the match being waited for, once the index knows where it is"""
+        if self._pending is None:
+            return
+        found = self._search.find(self._line, self._column, self._pending)
+        if found is PENDING:
+            return
+        self._pending = None
+        if found is None:
+            self._message = "Pattern not found"
+        else:
+            self._line, self._column, _ = found
+
+    def _prompt_event(self, event):
+        """
+        Edits the search prompt, everything typed goes to it until Enter or Escape.
+
+        :param event: The KeyboardEvent to process.
+        """
+        direction, text = self._prompt
+        if event.key_code in [Screen.ctrl("m"), Screen.ctrl("j")]:
+            self._prompt = None
+            if text:
+                self._start_search(text, direction == "?")
+            elif self._search is not None:
+                # An empty pattern repeats the last search, in the new direction.
+                self._pending = direction == "?"
+        elif event.key_code == Screen.KEY_ESCAPE:
+            self._prompt = None
+        elif event.key_code == Screen.ctrl("r"):
+            self._regex = not self._regex
+        elif event.key_code == Screen.KEY_BACK:
+            if text:
+                self._prompt[1] = text[:-1]
+            else:
+                self._prompt = None
+        elif event.key_code >= 32:
+            self._prompt[1] += chr(event.key_code)
+        return None
+
     def process_event(self, event):
+        if isinstance(event, KeyboardEvent) and self._prompt is not None:
+            return self._prompt_event(event)
         if isinstance(event, KeyboardEvent):
-            if event.key_code in [Screen.KEY_PAGE_UP, 117]:
+            self._message = None
+            if event.key_code in [47, 63]:
+                self._prompt = [chr(event.key_code), ""]
+            elif event.key_code in [110, 78]:
+                if self._search is None:
+                    self._message = "No previous search"
+                else:
+                    # n repeats the search in its own direction, N the other way.
+                    self._pending = self._search.backwards != (event.key_code == 78)
+            elif event.key_code in [Screen.KEY_PAGE_UP, 117]:
                 self._change_line(-self._h)
             elif event.key_code in [Screen.KEY_PAGE_DOWN, 100]:
                 self._change_line(self._h)
@@ -158,42 +422,87 @@ class Pager(Widget):
 
         This is an array of tuples of the form (text, value line, value column offset) where
         the line and column offsets are indeces into the value (not displayed glyph coordinates).
+        Drawing never needs this, it wraps the whole value so only use it on small values.
         """
-        if self._reflowed_text_cache is None:
-            if self._line_wrap:
-                self._reflowed_text_cache = []
-                limit = self._w - self._offset
-                for i, line in enumerate(self._value):
-                    column = 0
-                    while self.string_len(str(line)) >= limit:
-                        sub_string = _enforce_width(
-                            line, limit, self._frame.canvas.unicode_aware)
-                        self._reflowed_text_cache.append((sub_string, i, column))
-                        line = line[len(sub_string):]
-                        column += len(sub_string)
-                    self._reflowed_text_cache.append((line, i, column))
-            else:
-                self._reflowed_text_cache = [(x, i, 0) for i, x in enumerate(self._value)]
+        reflowed = []
+        for i in range(len(self._value)):
+            breaks = self._breaks(i)
+            for part in range(len(breaks)):
+                reflowed.append((self._row_text(i, breaks, part), i, breaks[part]))
+        return reflowed
 
-        return self._reflowed_text_cache
+    def append(self, text):
+        """
+        Adds text to the end of the value without re-splitting what is already there.
+
+        The cursor stays where it is, so the user can read the start of a body
+        that is still streaming in.
+
+        :param text: The text to add, may contain newlines.
+        """
+        if not text:
+            return
+        if self.spooled:
+            first_changed = len(self._value) - 1
+            self._value.append(text)
+            self._size += len(text)
+            self._forget_layout(first_changed)
+            if self._search is not None:
+                self._search.extend(first_changed)
+            return
+        if self._parser:
+            # Colours carry over from line to line, so let the setter redo them all.
+            raw = "\n".join(getattr(line, "raw_text", line) for line in self._value or [""])
+            self.value = raw + text if self._as_string else (raw + text).split("\n")
+            return
+        if self._value is None:
+            self._value = [""]
+        first_changed = len(self._value) - 1
+        parts = text.split("\n")
+        self._value[-1] += parts[0]
+        self._value.extend(parts[1:])
+        self._size += len(text)
+        if self._spool_threshold is not None and self._size > self._spool_threshold:
+            # Grown too big to keep in memory, move it all to disk.
+            self._value = SpooledLines("\n".join(self._value))
+        # Only the old last line and the new ones need wrapping or searching again, the
+        # search has to follow a value that has just been spooled.
+        self._forget_layout(first_changed)
+        if self._search is not None:
+            self._search.extend(first_changed, self._value)
+        if self._on_change:
+            self._on_change()
 
     @property
     def value(self):
         """
         The current value for this TextBox.
+
+        A spooled value is returned as its SpooledLines rather than joined into
+        one (possibly huge) string, the setter accepts it back as is.
         """
         if self._value is None:
             self._value = [""]
+        if self.spooled:
+            return self._value
         return "\n".join([str(x) for x in self._value]) if self._as_string else self._value
 
     @value.setter
     def value(self, new_value):
         # Convert to the internal format
         old_value = self._value
-        if new_value is None:
+        if isinstance(new_value, SpooledLines):
+            self._size = new_value.size
+        elif new_value is None:
             new_value = [""]
+            self._size = 0
         elif self._as_string:
-            new_value = new_value.split("\n")
+            self._size = len(new_value)
+            if (self._spool_threshold is not None and self._size > self._spool_threshold and
+                    not self._parser):
+                new_value = SpooledLines(new_value)
+            else:
+                new_value = new_value.split("\n")
         self._value = new_value
 
         if self._parser:
@@ -207,6 +516,7 @@ class Pager(Widget):
                 new_value.append(value)
                 last_colour = value.last_colour
             self._value = new_value
+        self._stop_search()
         self.reset()
 
         # Only trigger the notification after we've changed the value.
@@ -226,5 +536,7 @@ class Pager(Widget):
 
     @property
     def frame_update_count(self):
-        # Force refresh for cursor if needed.
+        # Keep redrawing while a search fills in, then force refresh for cursor if needed.
+        if self._pending is not None or (self._search is not None and self._search.running):
+            return 1
         return 5 if self._has_focus and not self._frame.reduce_cpu else 0
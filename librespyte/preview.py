@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""Cache of rendered history previews"""
+from collections import OrderedDict
+import sys
+import threading
+
+DEFAULT_CACHE_MB = 16
+
+
+class PreviewCache(object):
+    """
+    LRU cache of rendered preview text keyed by entry id.
+
+    Entries are evicted oldest first once the cached text goes over max_bytes.
+    prefetch() renders entries on a daemon thread so that they are ready by
+    the time the cursor gets to them.
+    """
+    def __init__(self, render, max_bytes=DEFAULT_CACHE_MB * 1024 * 1024):
+        self._render = render
+        self.max_bytes = max_bytes
+        self._texts = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._wanted = []
+        self._wake = threading.Condition(self._lock)
+        self._worker = None
+        self._generation = 0
+
+    @property
+    def size(self):
+        """approximate bytes held by the cache"""
+        return self._size
+
+    def _lookup(self, entry_id):
+        text = self._texts.get(entry_id)
+        if text is not None:
+            self._texts.move_to_end(entry_id)
+        return text
+
+    def _store(self, entry_id, text):
+        cost = sys.getsizeof(text)
+        if cost > self.max_bytes or entry_id in self._texts:
+            return
+        self._texts[entry_id] = text
+        self._size += cost
+        while self._size > self.max_bytes:
+            _, evicted = self._texts.popitem(last=False)
+            self._size -= sys.getsizeof(evicted)
+
+    def get(self, entry_id):
+        """the rendered preview, rendering it now if it isn't cached"""
+        with self._lock:
+            text = self._lookup(entry_id)
+        if text is None:
+            text = self._render(entry_id)
+            with self._lock:
+                self._store(entry_id, text)
+        return text
+
+    def prefetch(self, entry_ids):
+        """queues entry_ids for rendering in the background, replacing older requests"""
+        with self._lock:
+            self._wanted = [entry_id for entry_id in entry_ids if entry_id not in self._texts]
+            if not self._wanted:
+                return
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._prefetch_loop, daemon=True)
+                self._worker.start()
+            self._wake.notify()
+
+    def _prefetch_loop(self):
+        while True:
+            with self._lock:
+                while not self._wanted:
+                    self._wake.wait()
+                entry_id = self._wanted.pop(0)
+                if entry_id in self._texts:
+                    continue
+                generation = self._generation
+            try:
+                text = self._render(entry_id)
+            except Exception: # pylint: disable=broad-except
+                # The entry may have gone away, the foreground get() will report it.
+                continue
+            with self._lock:
+                if generation == self._generation:
+                    self._store(entry_id, text)
+
+    def clear(self):
+        """forgets everything, e.g. once entry ids have been renumbered"""
+        with self._lock:
+            self._texts.clear()
+            self._wanted = []
+            self._size = 0
+            self._generation += 1
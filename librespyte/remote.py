@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""The protocol between a load test coordinator and its workers, newline delimited JSON"""
+import json
+import socket
+import threading
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 7979
+CONNECT_TIMEOUT = 5
+
+
+def parse_address(text, host=DEFAULT_HOST):
+    """(host, port) from "host:port", "port" or "host", defaulting whatever is left out"""
+    text = text.strip()
+    if text.isdigit():
+        return host, int(text)
+    name, _, port = text.rpartition(":")
+    if not name or not port.isdigit():
+        return text or host, DEFAULT_PORT
+    return name.strip("[]"), int(port)
+
+
+class Channel(object):
+    """
+    Sends and receives JSON messages over a socket, one per line.
+
+    The coordinator sends a worker {"type": "run", ...} with the RequestSpec and its share
+    of the test.  The worker answers {"type": "ready"}, waits for {"type": "start"}, then
+    sends {"type": "stats", "stats": ...} every REPORT_INTERVAL and {"type": "done",
+    "stats": ...} at the end.  {"type": "stop"} cuts a test short and either side may send
+    {"type": "error", "message": ...} instead.  Messages can be sent from one thread while
+    another receives.
+    """
+    def __init__(self, sock):
+        self._socket = sock
+        self._reader = sock.makefile("rb")
+        self._lock = threading.Lock()
+
+    @classmethod
+    def connect(cls, address):
+        """a channel to the worker listening at address"""
+        try:
+            sock = socket.create_connection(parse_address(address), CONNECT_TIMEOUT)
+        except OSError as err:
+            raise OSError("Can't reach load test worker {}: {}".format(address, err))
+        sock.settimeout(None)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return cls(sock)
+
+    def send(self, message):
+        """sends message, False if the other side has gone"""
+        data = json.dumps(message).encode("utf-8") + b"\n"
+        try:
+            with self._lock:
+                self._socket.sendall(data)
+            return True
+        except OSError:
+            return False
+
+    def receive(self):
+        """the next message, None once the other side has gone"""
+        try:
+            line = self._reader.readline()
+        except OSError:
+            return None
+        if not line:
+            return None
+        try:
+            return json.loads(line)
+        except ValueError:
+            return {"type": "error", "message": "unreadable message {!r}".format(line[:80])}
+
+    def close(self):
+        """hangs up"""
+        try:
+            self._socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._reader.close()
+        self._socket.close()
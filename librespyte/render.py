@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""Views of a response body for the Pager"""
+import codecs
+import json
+import threading
+import yaml
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+VIEWS = ("yaml", "json", "raw")
+DEFAULT_VIEW = "yaml"
+# The C emitter when PyYAML was built with libyaml, the output is the same.
+DUMPER = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+_UNPARSED = object()
+_NOT_JSON = object()
+
+
+def charset(encoding):
+    """the codec to decode a body in, utf-8 when encoding is missing or unknown"""
+    if encoding:
+        try:
+            return codecs.lookup(encoding).name
+        except LookupError:
+            pass
+    return "utf-8"
+
+
+def _dumps(parsed):
+    """indented JSON text, with orjson when it is installed"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(parsed, option=orjson.OPT_INDENT_2).decode("utf-8")
+        except orjson.JSONEncodeError:
+            # e.g. integers over 64 bits.
+            pass
+    return json.dumps(parsed, indent=2, ensure_ascii=False)
+
+
+class RenderedBody(object):
+    """
+    The body of one response, rendered into each view the first time it is asked for.
+
+    The body is parsed at most once however many views use it.  A body that is not JSON
+    is shown raw in every view.
+    """
+    views = VIEWS
+
+    def __init__(self, body, encoding=None):
+        self._body = bytes(body)
+        self._encoding = charset(encoding)
+        self._parsed = _UNPARSED
+        self._texts = {}
+        self._lock = threading.Lock()
+
+    def cached(self, view):
+        """the text of view if it has been rendered, otherwise None"""
+        return self._texts.get(view)
+
+    def render(self, view):
+        """the text of view, rendering it now if it hasn't been yet"""
+        text = self._texts.get(view)
+        if text is None:
+            text = self._texts.setdefault(view, self._render(view))
+        return text
+
+    @property
+    def parsed(self):
+        """the body parsed as JSON, ValueError if it isn't"""
+        parsed = self._parse()
+        if parsed is _NOT_JSON:
+            raise ValueError("The response is not JSON")
+        return parsed
+
+    @property
+    def is_json(self):
+        """whether the body parses as JSON, this parses it if no view has yet"""
+        return self._parse() is not _NOT_JSON
+
+    @property
+    def parsed_yet(self):
+        """whether is_json and parsed can answer without parsing the body"""
+        return self._parsed is not _UNPARSED
+
+    def _parse(self):
+        """the parsed body, the UI thread and a worker may both ask for it"""
+        with self._lock:
+            if self._parsed is _UNPARSED:
+                try:
+                    # Not orjson, it turns integers over 64 bits into floats.
+                    self._parsed = json.loads(self._source())
+                except (ValueError, UnicodeDecodeError):
+                    self._parsed = _NOT_JSON
+            return self._parsed
+
+    def _source(self):
+        """the bytes of the body"""
+        return self._body
+
+    def _render(self, view):
+        parsed = _NOT_JSON if view == "raw" else self._parse()
+        if parsed is _NOT_JSON:
+            return self._body.decode(self._encoding, errors="replace")
+        if view == "json":
+            return _dumps(parsed)
+        return yaml.dump(parsed, Dumper=DUMPER, allow_unicode=True)
+
+
+class SpooledBody(RenderedBody):
+    """
+    The body of a response too big to reformat, kept in a temp file as it arrived.
+
+    It is only shown raw, the Pager has it already, but can still be parsed as JSON for
+    the tree.  The file is read the first time that is asked for.
+    """
+    views = ("raw",)
+
+    def __init__(self, spool, encoding=None):
+        super(SpooledBody, self).__init__(b"", encoding)
+        self._spool = spool
+
+    def _source(self):
+        self._spool.seek(0)
+        return self._spool.read()
+
+    def _render(self, view):
+        return self._source().decode(self._encoding, errors="replace")
@@ -1,22 +1,31 @@
 #!/usr/bin/env python3
 """Main view of respyte"""
 from os import path, remove
+import codecs
 import json
 import re
+import tempfile
+import time
 import yaml
-import requests
 import urllib3
 from asciimatics.event import KeyboardEvent, MouseEvent
 from asciimatics.screen import Screen
 from asciimatics.widgets import Button, Divider, DropdownList, Frame, Layout, Text, \
     TextBox, VerticalDivider, PopUpDialog
 from asciimatics.exceptions import  StopApplication, NextScene
+from librespyte.auth import sign, summary_lines
+from librespyte.executor import RequestExecutor
 from librespyte.pager import Pager
+from librespyte.render import VIEWS, RenderedBody, SpooledBody, charset
+from librespyte.session import SessionManager
+from librespyte.spec import RequestSpec
+from librespyte.spool import SPOOL_THRESHOLD
+from librespyte.store import CONFIG_DIRECTORY
+from librespyte.timing import PhaseTimer, waterfall
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
-CONFIG_DIRECTORY = path.expanduser(path.join("~", ".config", "respyte"))
-HISTORY_FILE = path.join(CONFIG_DIRECTORY, "history.json")
 SCRATCH_FILE = path.join(CONFIG_DIRECTORY, "scratch.json")
+CHUNK_SIZE = 64 * 1024
 HELP = """
 Welcome to Respyte help:
 Use tab to navigate between inputs.
@@ -24,10 +33,29 @@ The First input is the HTTP method, listed as a dropdown
 The second is a url text field, if the url does not validate, it will appear in an error highlight
 The next two input fields are Headers, and Body Params, both of which are parsed as YAML, so you may input YAML or json in those inputs.
 The next field is the Response body it is a scrollabled view interactable like a less pager (j/k/u/d/G/g).
+F6 switches the Response body between YAML, pretty JSON and the raw body, the current view is in the title. Bodies too big to reformat are only shown raw.
+F7 opens a JSON response as a tree, Enter/Right expand a node, Left collapses it, big arrays are shown a page at a time.
+Search the Response body with / (forwards) or ? (backwards), Ctrl-R in the search prompt switches to regex, n/N move to the next/previous match.
+F8 load tests the request, it is sent a number of times from a number of connections at once and the
+throughput, failures, status codes and a latency histogram are shown as it runs. Give it a Rate
+(e.g. 100, or ramped 10-200:30 200:60) to send on a schedule instead, latency then counts from
+when each request was due so a slow server can't hide behind a sender that slowed down with it.
+Processes shares the connections out between that many worker processes, to use more than one core.
+Workers lists `respyte worker --listen` agents (host:port, comma separated) to send from instead.
+F9 opens collections, Add saves the composed request in one under a step name and Run sends all of
+its requests, each as soon as the steps it uses values from (e.g. ${login.body.token}) are done.
+The timeline shows when each was sent, how long it took and stars the critical path.
 
 The Bottom Row buttons are `Send it` `History` and `Quit`
 Send it: Send the HTTP request to the endpoint utilizing the given HTTP method with the headers and body parameters
-History: View the History of your requests
+While a request is in flight the title shows how long it has been running and how much of the
+body has arrived, the body is shown as it streams in and formatted once complete. Press F4 to cancel it.
+Response Headers start with how long the DNS lookup, connecting, the TLS handshake, sending, waiting
+for the first byte, downloading and formatting took, these are kept in the history too.
+Under them is how the Authorization hook's cache has done: values reused, fetched while a send
+waited, and refreshed in the background before they expired, with how long the calls took.
+History: View the History of your requests, the filter bar narrows it down with terms like
+    method:POST status:5xx host:example.com url:https://example.com/api since:2h latency:500
 Quit: Exit Respyte
 
 You will Also note that they have corresponding keys attached to them, you may press those keys at any point in time to execute that command.
@@ -46,7 +74,7 @@ def validate(test_url):
 
 class RestView(Frame):
     """This is the rest composition menu"""
-    def __init__(self, screen, parsed_args):
+    def __init__(self, screen, parsed_args, history):
         super(RestView, self).__init__(screen,
                                        screen.height,
                                        screen.width,
@@ -56,6 +84,13 @@ class RestView(Frame):
                                        title="Respyte")
 
         self.set_theme(parsed_args.color_scheme)
+        self._executor = RequestExecutor()
+        self._history_store = history
+        self._sessions = SessionManager(parsed_args.pool_size, parsed_args.pool_idle_timeout)
+        self._view = parsed_args.response_view
+        self._body = None
+        self._shown = "raw"
+        self._headers = ""
         url_layout = Layout([10, 1, 100])
         self.add_layout(url_layout)
         self.method = DropdownList(
@@ -131,10 +166,40 @@ class RestView(Frame):
         self._populate()
         self.fix()
 
+    @property
+    def body(self):
+        """the RenderedBody of the last response, a SpooledBody if it was too big, or None"""
+        return self._body
+
+    @property
+    def sessions(self):
+        """the SessionManager sends go out on, collection runs share its connections"""
+        return self._sessions
+
     def _history(self):
         """Show history"""
         raise NextScene("History")
 
+    def _load_test(self):
+        """Load test the composed request"""
+        raise NextScene("Load")
+
+    def _collections(self):
+        """Add the composed request to a collection, or run one"""
+        raise NextScene("Collections")
+
+    def _tree(self):
+        """Show the last response as a tree, parsing it off the UI thread first if need be"""
+        if self._body is not None and not self._body.parsed_yet:
+            # Anything in flight finishes first, the tree can be asked for again then.
+            if not self._executor.busy:
+                self._executor.submit(_parse, self._body)
+            return
+        if self._body is None or not self._body.is_json:
+            self.scene.add_effect(PopUpDialog(self.screen, "No JSON response to show", ["Ok"]))
+            return
+        raise NextScene("Tree")
+
     def _open_help(self):
         self._scene.add_effect(
             PopUpDialog(
@@ -149,77 +214,129 @@ class RestView(Frame):
     def _populate(self):
         """populate information"""
         self.save()
-        if path.isfile(SCRATCH_FILE) and path.isfile(HISTORY_FILE):
+        if path.isfile(SCRATCH_FILE):
             with open(SCRATCH_FILE, 'r') as scratch_file:
                 selection = json.loads(scratch_file.read())["history"]
             remove(SCRATCH_FILE)
-            with open(HISTORY_FILE, 'r') as history_file:
-                json_obj = json.loads(history_file.read())['history'][selection]
-                self.request.value = yaml.dump(json_obj['data'])
-                self.req_headers.value = yaml.dump(json_obj['headers'])
-                self.url.value = json_obj['url']
-                self.method.value = json_obj['method']
+            json_obj = self._history_store[selection]
+            self.request.value = yaml.dump(json_obj['data'])
+            self.req_headers.value = yaml.dump(json_obj['headers'])
+            self.url.value = json_obj['url']
+            self.method.value = json_obj['method']
         self.screen.refresh()
         self.fix()
 
-    @staticmethod
-    def _quit():
-        history = []
-        with open(HISTORY_FILE, 'r') as history_file:
-            for line in history_file.readlines():
-                if line.strip():
-                    history.append(line)
-        history = list(set(history))
-        with open(HISTORY_FILE, 'w') as history_file:
-            for line in history:
-                history_file.write('\n')
-                history_file.write(line)
+    def _cancel(self):
+        """Abandon the request in flight"""
+        self._executor.cancel()
+
+    def _quit(self):
+        self._executor.cancel()
+        self._sessions.close()
+        self._history_store.compact()
 
         raise StopApplication("User pressed quit")
 
+    def compose(self):
+        """the request in the inputs as a RequestSpec, raises if they don't parse as YAML"""
+        self.save()
+        data = yaml.safe_load(self.data['req_params']) if self.data['req_params'] else {}
+        headers = yaml.safe_load(self.data['req_headers']) if self.data['req_headers'] else {}
+        method = self.data['method'] if self.data['method'] else 'GET'
+        return RequestSpec(method, self.data['url'], data, headers)
+
     def _send(self):
         try:
-            self.save()
-            data = yaml.safe_load(self.data['req_params']) if self.data['req_params'] else {}
-            self.request.value = yaml.dump(data, indent=2, sort_keys=True)
-            headers = yaml.safe_load(self.data['req_headers']) if self.data['req_headers'] else {}
-            if 'Authorization' in headers and len(headers['Authorization'].split('.')) > 1:
-                try:
-                    headers['Authorization'] = custom_auth(headers['Authorization'],
-                                                           self.data['url'],
-                                                           data,
-                                                           headers,
-                                                           )
-                except ImportError:
-                    pass
-            # self.req_headers.value = json.dumps(headers, indent=2, sort_keys=True)
-            # req = requests.get(self.data['url'], data=data)
-            method = self.data['method'] if self.data['method'] else 'GET'
-            history = {"method": method, "url": self.data['url'],
-                       "data": data, "headers": headers}
+            spec = self.compose()
+            self.request.value = yaml.dump(spec.data, indent=2, sort_keys=True)
             self.response.value = ""
-            self.screen.refresh()
-            req = requests.request(method,
-                                   self.data['url'],
-                                   data=data,
-                                   headers=headers,
-                                   verify=False
-                                   )
-            self.resp_headers.value = yaml.dump(dict(req.headers), allow_unicode=True)
-            try:
-                self.response.value = yaml.dump(req.json(), allow_unicode=True)
-                with open(HISTORY_FILE, 'r') as history_file:
-                    current_history = json.loads(history_file.read())
-                current_history['history'].append(history)
-                with open(HISTORY_FILE, "w") as history_file:
-                    json.dump(current_history, history_file)
-
-            except json.JSONDecodeError:
-                self.response.value = req.text
-            self.screen.refresh()
+            self._body = None
+            self._shown = "raw"
+            self._executor.submit(_perform, self._sessions, spec.method, spec.url, spec.data,
+                                  spec.headers, self._view)
         except Exception as err: # pylint: disable=broad-except
             self.scene.add_effect(PopUpDialog(self.screen, str(err), ["Ok"]))
 
+    def _receive(self, job):
+        """Apply a finished send to the widgets, runs on the UI thread"""
+        if job.error is not None:
+            self.scene.add_effect(PopUpDialog(self.screen, str(job.error), ["Ok"]))
+            return
+        if job.func is _render:
+            self._show_view()
+            return
+        if job.func is _parse:
+            self._tree()
+            return
+        self._apply_updates(self._executor.drain(job))
+        history, self._body, is_json = job.result
+        self._show_headers(history["timings"])
+        # The Pager holds the raw body as it streamed in.
+        self._shown = "raw"
+        self._show_view()
+        if is_json:
+            try:
+                self._history_store.append(history)
+            except Exception as err: # pylint: disable=broad-except
+                self.scene.add_effect(PopUpDialog(self.screen, str(err), ["Ok"]))
+
+    def _switch_view(self):
+        """Show the next view of the response body"""
+        if self._body is not None and len(self._body.views) == 1:
+            self.scene.add_effect(PopUpDialog(
+                self.screen, "The response is too big to reformat, it is shown raw", ["Ok"]))
+            return
+        self._view = VIEWS[(VIEWS.index(self._view) + 1) % len(VIEWS)]
+        self._show_view()
+
+    def _show_view(self):
+        """Put the chosen view of the last response in the Pager, rendering it off the UI thread"""
+        if self._body is None or self._shown == self._view or self._view not in self._body.views:
+            return
+        text = self._body.cached(self._view)
+        if text is None:
+            # Anything in flight finishes first and shows the view once it's done.
+            if not self._executor.busy:
+                self._executor.submit(_render, self._body, self._view)
+            return
+        self.response.value = text
+        self._shown = self._view
+
+    def _show_headers(self, timings):
+        """Show the response headers under a waterfall of how long each phase took"""
+        self.resp_headers.value = "\n".join(
+            ["# " + line for line in waterfall(timings)] +
+            summary_lines(prefix="# ") + [self._headers])
+
+    def _apply_updates(self, updates):
+        """Show headers and body chunks streamed by the job in flight"""
+        for kind, payload in updates:
+            if kind == "headers":
+                timings, self._headers = payload
+                self._show_headers(timings)
+                self.response.value = ""
+            elif kind == "body":
+                self.response.append(payload)
+
+    def _update(self, frame_no):
+        self._apply_updates(self._executor.updates())
+        for job in self._executor.poll():
+            self._receive(job)
+        status = self._executor.status(frame_no // 2)
+        # A response too big to reformat is only ever shown raw, whatever view was chosen.
+        view = self._shown if self._body is not None and len(self._body.views) == 1 \
+            else self._view
+        self.title = "Respyte [{}]{}".format(view, " " + status if status else "")
+        super(RestView, self)._update(frame_no)
+
+    @property
+    def frame_update_count(self):
+        # Keep redrawing while a request is in flight so the indicator animates
+        # and the finished job is picked up promptly.
+        if self._executor.busy:
+            return 1
+        return super(RestView, self).frame_update_count
+
     def process_event(self, event):
         # Rebase any mouse events into Frame coordinates now.
         old_event = event
@@ -271,6 +388,11 @@ class RestView(Frame):
                     Screen.KEY_F1: self._open_help,
                     Screen.KEY_F2: self._history,
                     Screen.KEY_F3: self._send,
+                    Screen.KEY_F4: self._cancel,
+                    Screen.KEY_F6: self._switch_view,
+                    Screen.KEY_F7: self._tree,
+                    Screen.KEY_F8: self._load_test,
+                    Screen.KEY_F9: self._collections,
                 }
                 if event.key_code in function_key_map.keys():
                     function_key_map[event.key_code]()
@@ -310,8 +432,73 @@ class RestView(Frame):
         # event.
         return None if claimed_focus or self._is_modal or event is None else old_event
 
-def custom_auth(library, *args):
-    """Imports and runs 'library'"""
-    split_lib = library.split(".")
-    imported = __import__(split_lib[0], fromlist=[split_lib[1]])
-    return getattr(imported, split_lib[1])(*args)
+def _perform(job, sessions, method, url, data, headers, view):
+    """Sends the request and renders view of the response, runs on the executor's worker thread"""
+    body, headers = sign(method, url, data, headers)
+    history = {"method": method, "url": url,
+               "data": data, "headers": headers, "timestamp": time.time()}
+    with PhaseTimer() as timer:
+        return _receive_body(job, timer, history, sessions.request(method,
+                                                                   url,
+                                                                   data=body,
+                                                                   headers=headers,
+                                                                   stream=True,
+                                                                   ), view)
+
+def _receive_body(job, timer, history, sent, view):
+    """Streams and renders the body of a sent request, marking its phases on timer"""
+    req, reused = sent
+    if job.cancelled.is_set():
+        return None
+    history["status"] = req.status_code
+    job.post("headers", (timer.phases(), "# connection: {}\n{}".format(
+        "reused" if reused else "new", yaml.dump(dict(req.headers), allow_unicode=True))))
+    # Stream the raw body into the Pager as it arrives, it is formatted once complete.
+    encoding = charset(req.encoding)
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    body = bytearray()
+    spool = None
+    for chunk in req.iter_content(CHUNK_SIZE):
+        if job.cancelled.is_set():
+            req.close()
+            return None
+        if spool is not None:
+            spool.write(chunk)
+        else:
+            body += chunk
+            if len(body) > SPOOL_THRESHOLD:
+                # Too big to reformat, the Pager keeps the raw text on disk and the body
+                # goes to a temp file of its own, for the tree.
+                spool = tempfile.TemporaryFile()
+                spool.write(body)
+                body = None
+        job.count(len(chunk))
+        job.post("body", decoder.decode(chunk))
+    job.post("body", decoder.decode(b"", final=True))
+    job.stage = "formatting"
+    timer.mark("downloaded")
+    history["elapsed"] = timer.marks["downloaded"] - timer.started
+    json_type = "json" in req.headers.get("Content-Type", "")
+    if spool is not None:
+        rendered = SpooledBody(spool, encoding)
+    else:
+        rendered = RenderedBody(body, encoding)
+    if spool is not None or view == "raw":
+        # Too big to format, or already on screen and not worth parsing to tell if it's JSON.
+        is_json = json_type
+    else:
+        rendered.render(view)
+        is_json = rendered.is_json
+    timer.mark("formatted")
+    history["timings"] = timer.phases()
+    return history, rendered, is_json
+
+def _parse(job, body):
+    """Parses a response for the tree, runs on the executor's worker thread"""
+    job.stage = "parsing"
+    return body.is_json
+
+def _render(job, body, view):
+    """Renders another view of a response, runs on the executor's worker thread"""
+    job.stage = "formatting"
+    body.render(view)
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""respyte run, sends a saved request and prints the response without starting the TUI"""
+from os import path
+import itertools
+import queue
+import sys
+import threading
+import time
+import configargparse
+import urllib3
+import yaml
+from librespyte import auth
+from librespyte.load import LoadStats, report
+from librespyte.render import DEFAULT_VIEW, VIEWS, RenderedBody
+from librespyte.session import DEFAULT_POOL_SIZE, SessionManager
+from librespyte.spec import RequestSpec
+from librespyte.store import BACKENDS, open_history, parse_filter
+from librespyte.timing import PhaseTimer, waterfall
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+
+def parse(argv):
+    """adds and parses the run command's arguments"""
+    parser = configargparse.ArgParser(
+        prog="respyte run",
+        description="send a request from history or a file and print the response",
+        config_file_parser_class=configargparse.YAMLConfigFileParser,
+        default_config_files=[path.join(path.expanduser("~"), ".respyterc.yml")],
+        ignore_unknown_config_file_keys=True)
+    parser.add(
+        'request',
+        nargs='?',
+        help='a YAML or JSON file with the method, url, data and headers of a history entry '
+             '(- reads it from stdin), or the position of an entry in history, 0 is the oldest '
+             'and -1, the default, the latest'
+    )
+    parser.add(
+        '-s', '--search',
+        default="",
+        help='only count history entries matching this filter, as typed in the History filter '
+             'bar, e.g. "method:POST host:api.example.com"'
+    )
+    parser.add(
+        '-n', '--repeat',
+        type=int,
+        default=1,
+        help='times to send the request, each gets a line and the bodies are left out, '
+             'defaults to 1'
+    )
+    parser.add(
+        '-p', '--parallel',
+        type=int,
+        default=1,
+        help='sends to have in flight at once when repeating, defaults to 1'
+    )
+    parser.add(
+        '-i', '--include',
+        action='store_true',
+        help='print the response headers too'
+    )
+    parser.add(
+        '-q', '--quiet',
+        action='store_true',
+        help='leave the body out'
+    )
+    parser.add(
+        '--response-view',
+        choices=VIEWS,
+        default=DEFAULT_VIEW,
+        help='how the body is printed, defaults to {}'.format(DEFAULT_VIEW)
+    )
+    auth.add_arguments(parser)
+    parser.add(
+        '--history-backend',
+        choices=BACKENDS,
+        default="jsonl",
+        help='where history is kept, defaults to jsonl'
+    )
+    args = parser.parse_args(argv)
+    if args.repeat < 1 or args.parallel < 1:
+        parser.error("--repeat and --parallel must be at least 1")
+    return args
+
+
+def load(args):
+    """the RequestSpec args.request names"""
+    if args.request == "-":
+        return _read(sys.stdin)
+    if args.request is not None and path.isfile(args.request):
+        with open(args.request) as request_file:
+            return _read(request_file)
+    try:
+        position = int(args.request) if args.request is not None else -1
+    except ValueError:
+        raise ValueError("{} is neither a request file nor a position in history".format(
+            args.request))
+    return RequestSpec.from_dict(find(open_history(args.history_backend),
+                                      parse_filter(args.search), position))
+
+
+def _read(request_file):
+    """the RequestSpec of a request file"""
+    entry = yaml.safe_load(request_file)
+    if not isinstance(entry, dict) or not entry.get("url"):
+        raise ValueError("A request file needs at least a url")
+    return RequestSpec.from_dict(entry)
+
+
+def find(history, filters, position):
+    """the entry at position among those matching filters, negative positions count from the end"""
+    count = history.count(filters)
+    offset = position if position >= 0 else count + position
+    if not 0 <= offset < count:
+        raise IndexError("There is no history entry {}, {} match".format(position, count))
+    entry_id, _ = history.summaries(filters, offset, 1)[0]
+    return history[entry_id]
+
+
+class Sent(object):
+    """What came back from one send of a request"""
+    def __init__(self, history, response=None, reused=False, body=b"", error=None):
+        self.history = history
+        self.response = response
+        self.reused = reused
+        self.body = body
+        self.error = error
+
+    @property
+    def failed(self):
+        """whether the send raised or was answered with a 4xx or 5xx"""
+        return self.error is not None or self.history["status"] >= 400
+
+
+def send(sessions, spec, timer):
+    """sends spec through the Authorization hook and reads the whole body, marking timer"""
+    history = dict(spec.as_dict(), timestamp=time.time())
+    try:
+        spec = spec.authorized()
+        history["headers"] = spec.headers
+        response, reused = sessions.request(spec.method, spec.url, data=spec.data,
+                                            headers=spec.headers, stream=True)
+        body = response.content
+    except Exception as err: # pylint: disable=broad-except
+        return Sent(history, error=err)
+    timer.mark("downloaded")
+    history["status"] = response.status_code
+    history["elapsed"] = timer.marks["downloaded"] - timer.started
+    return Sent(history, response, reused, body)
+
+
+def _size(count):
+    """a byte count for people"""
+    for unit in ("B", "KB", "MB"):
+        if count < 1024:
+            return "{:.0f} {}".format(count, unit) if unit == "B" else \
+                "{:.1f} {}".format(count, unit)
+        count /= 1024.0
+    return "{:.1f} GB".format(count)
+
+
+def once(sessions, spec, args):
+    """sends spec once and prints the response in full"""
+    with PhaseTimer() as timer:
+        sent = send(sessions, spec, timer)
+        if sent.error is not None:
+            print("{!r}: {}: {}".format(spec, type(sent.error).__name__, sent.error),
+                  file=sys.stderr)
+            return sent
+        text = None
+        if not args.quiet:
+            text = RenderedBody(sent.body, sent.response.encoding).render(args.response_view)
+            timer.mark("formatted")
+    response = sent.response
+    print(repr(spec))
+    print("{} {}, {} in {:.1f} ms on a {} connection".format(
+        response.status_code, response.reason, _size(len(sent.body)),
+        sent.history["elapsed"] * 1000, "reused" if sent.reused else "new"))
+    for line in waterfall(timer.phases()):
+        print("# " + line)
+    for line in auth.summary_lines(prefix="# "):
+        print(line)
+    if args.include:
+        print()
+        print(yaml.dump(dict(response.headers), allow_unicode=True), end="")
+    if text is not None:
+        print()
+        print(text)
+    return sent
+
+
+def repeat(sessions, spec, args):
+    """sends spec args.repeat times, args.parallel at once, printing a line for each and a report"""
+    stats = LoadStats()
+    numbers = itertools.count(1)
+    lock = threading.Lock()
+    results = queue.Queue()
+
+    def sender():
+        while True:
+            with lock:
+                number = next(numbers)
+            if number > args.repeat:
+                return
+            with PhaseTimer() as timer:
+                sent = send(sessions, spec, timer)
+            if sent.error is not None:
+                stats.record(timer.started, timer.started,
+                             error=type(sent.error).__name__)
+            else:
+                stats.record(timer.started, timer.started, sent.history["status"])
+            results.put((number, sent))
+
+    senders = [threading.Thread(target=sender, daemon=True)
+               for _ in range(min(args.parallel, args.repeat))]
+    for thread in senders:
+        thread.start()
+    print(repr(spec))
+    failed = []
+    for _ in range(args.repeat):
+        number, sent = results.get()
+        if sent.failed:
+            failed.append(sent)
+        if sent.error is not None:
+            print("{:>6}  {}: {}".format(number, type(sent.error).__name__, sent.error))
+            continue
+        print("{:>6}  {} {:>9.1f} ms {:>10}  {}".format(
+            number, sent.history["status"], sent.history["elapsed"] * 1000,
+            _size(len(sent.body)), "reused" if sent.reused else "new"))
+    stats.finished = time.monotonic()
+    print()
+    for line in report(stats, args.repeat):
+        print(line)
+    for line in auth.summary_lines(gap=True):
+        print(line)
+    return failed
+
+
+def main(argv):
+    """respyte run [request] [--search filter] [--repeat n] [--parallel n], exits 1 if any failed"""
+    args = parse(argv)
+    auth.configure(args)
+    try:
+        spec = load(args)
+    except (OSError, LookupError, ValueError, yaml.YAMLError) as err:
+        print("respyte run: {}".format(err), file=sys.stderr)
+        return 2
+    sessions = SessionManager(max(DEFAULT_POOL_SIZE, args.parallel), idle_timeout=0)
+    try:
+        if args.repeat == 1:
+            return 1 if once(sessions, spec, args).failed else 0
+        return 1 if repeat(sessions, spec, args) else 0
+    except KeyboardInterrupt:
+        return 130
+    finally:
+        sessions.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
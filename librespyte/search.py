@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""Background search of the Pager's lines"""
+from array import array
+from bisect import bisect_left, bisect_right
+import re
+import threading
+
+# Lines searched, and their matches indexed, at a time.
+BLOCK_LINES = 1024
+# Returned by MatchIndex.find() when the answer depends on lines not searched yet.
+PENDING = object()
+
+
+def compile_pattern(text, regex=False):
+    """the pattern for a search, re.error if text isn't a valid regex"""
+    return re.compile(text if regex else re.escape(text))
+
+
+def _key(line, column):
+    """a match position as one sortable number"""
+    return line << 32 | column
+
+
+def _position(key):
+    """(line, column) of a key"""
+    return key >> 32, key & 0xffffffff
+
+
+class MatchIndex(object):
+    """
+    Offsets of every match of a pattern in a sequence of lines, built on a daemon thread.
+
+    Lines are searched a block at a time, starting with the block at the cursor and
+    moving in the search direction, so the nearest matches are found first.  Each
+    searched block keeps its matches as sorted positions, which find() and visible()
+    look up with a binary search while the rest of the lines are still being searched.
+
+    A literal pattern first rules out blocks without a match by searching them joined
+    into one string.  A regex is only ever run on one line at a time, anchors and
+    lookarounds would see the neighbouring lines otherwise.
+    """
+    def __init__(self, lines, pattern, line=0, backwards=False, literal=False):
+        self.pattern = pattern
+        self.backwards = backwards
+        self._literal = literal
+        self._lines = lines
+        self._start = line // BLOCK_LINES
+        self._blocks = {}
+        self._step = 0
+        self._epoch = 0
+        self._stopped = False
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._worker = threading.Thread(target=self._search_loop, daemon=True)
+        self._worker.start()
+
+    @property
+    def running(self):
+        """whether there are lines left to search"""
+        with self._lock:
+            return not self._stopped and self._next_block() is not None
+
+    @property
+    def count(self):
+        """matches found so far"""
+        with self._lock:
+            return sum(len(keys) for keys, _ in self._blocks.values())
+
+    def _block_count(self):
+        return max(1, -(-len(self._lines) // BLOCK_LINES))
+
+    def _next_block(self):
+        """the nearest block still to search, in search order, or None"""
+        blocks = self._block_count()
+        while self._step < blocks:
+            block = (self._start + (-self._step if self.backwards else self._step)) % blocks
+            if block not in self._blocks:
+                return block
+            self._step += 1
+        return None
+
+    def _search_loop(self):
+        while True:
+            with self._lock:
+                block = self._next_block()
+                while block is None and not self._stopped:
+                    self._wake.wait()
+                    block = self._next_block()
+                if self._stopped:
+                    return
+                epoch = self._epoch
+            matches = self._search(block)
+            with self._lock:
+                # Lines may have changed while we were searching them.
+                if epoch == self._epoch:
+                    self._blocks[block] = matches
+
+    def _search(self, block):
+        """sorted (keys, lengths) of the matches in block"""
+        keys = array('q')
+        lengths = array('l')
+        first = block * BLOCK_LINES
+        lines = self._lines[first:first + BLOCK_LINES]
+        # Most blocks of a big body have no match at all, rule them out in one go.
+        if self._literal and not self.pattern.search("\n".join(str(line) for line in lines)):
+            return keys, lengths
+        for number, line in enumerate(lines, first):
+            for match in self.pattern.finditer(str(line)):
+                if match.end() > match.start():
+                    keys.append(_key(number, match.start()))
+                    lengths.append(match.end() - match.start())
+        return keys, lengths
+
+    def extend(self, line, lines=None):
+        """
+        Forgets matches from line onwards, e.g. after text is added, and searches again.
+
+        Call it once the lines have changed.  lines replaces the lines being searched, for
+        when the value has moved, e.g. been spooled.
+        """
+        with self._lock:
+            if lines is not None:
+                self._lines = lines
+            for block in [block for block in self._blocks if block >= line // BLOCK_LINES]:
+                del self._blocks[block]
+            self._step = 0
+            self._epoch += 1
+            self._wake.notify()
+
+    def stop(self):
+        """ends the search, the index can't be used afterwards"""
+        with self._lock:
+            self._stopped = True
+            self._wake.notify()
+
+    def find(self, line, column, backwards=False, inclusive=False):
+        """
+        The (line, column, length) of the nearest match after, or before, line and column.
+
+        The search wraps around the ends of the lines.  Returns None if there is no
+        match at all and PENDING if the nearest match may be in lines not searched yet.
+        """
+        key = _key(line, column)
+        with self._lock:
+            blocks = self._block_count()
+            start = line // BLOCK_LINES
+            for step in range(blocks + 1):
+                block = (start + (-step if backwards else step)) % blocks
+                found = self._blocks.get(block)
+                if found is None:
+                    return PENDING
+                keys, lengths = found
+                if step == 0:
+                    if backwards:
+                        index = (bisect_right if inclusive else bisect_left)(keys, key) - 1
+                    else:
+                        index = (bisect_left if inclusive else bisect_right)(keys, key)
+                else:
+                    index = len(keys) - 1 if backwards else 0
+                if 0 <= index < len(keys):
+                    return _position(keys[index]) + (lengths[index],)
+        return None
+
+    def visible(self, first, last):
+        """(line, column, length) of the matches found in lines first to last"""
+        matches = []
+        with self._lock:
+            for block in range(first // BLOCK_LINES, last // BLOCK_LINES + 1):
+                keys, lengths = self._blocks.get(block, ((), ()))
+                for index in range(bisect_left(keys, _key(first, 0)),
+                                   bisect_left(keys, _key(last + 1, 0))):
+                    matches.append(_position(keys[index]) + (lengths[index],))
+        return matches
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""Keep-alive HTTP sessions shared across sends"""
+import threading
+import time
+from urllib.parse import urlsplit
+import requests
+from librespyte.timing import TimedAdapter
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_IDLE_TIMEOUT = 90
+
+
+class SessionManager(object):
+    """
+    Hands out one pooled requests.Session per host.
+
+    Sessions (and the keep-alive connections in their pools) live until the
+    host has been idle for idle_timeout seconds or close() is called.
+    """
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+        self.pool_size = pool_size
+        self.idle_timeout = idle_timeout
+        self._sessions = {}
+        self._last_used = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _host_key(url):
+        parts = urlsplit(url)
+        return parts.scheme.lower(), parts.netloc.lower()
+
+    def _new_session(self):
+        session = requests.Session()
+        session.verify = False
+        adapter = TimedAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def session_for(self, url):
+        """returns the session for url's host, creating it if needed"""
+        key = self._host_key(url)
+        with self._lock:
+            self._evict_idle()
+            session = self._sessions.get(key)
+            if session is None:
+                session = self._sessions[key] = self._new_session()
+            self._last_used[key] = time.monotonic()
+            return session
+
+    def _evict_idle(self):
+        """closes sessions whose host has not been used within idle_timeout"""
+        if not self.idle_timeout:
+            return
+        cutoff = time.monotonic() - self.idle_timeout
+        for key in [key for key, used in self._last_used.items() if used < cutoff]:
+            self._sessions.pop(key).close()
+            del self._last_used[key]
+
+    def request(self, method, url, **kwargs):
+        """
+        Sends a request on the host's pooled session.
+
+        :returns: (response, reused) where reused says whether the request went
+            out on an already open keep-alive connection.
+        """
+        session = self.session_for(url)
+        adapter = session.get_adapter(url)
+        opened = _connections_opened(adapter)
+        response = session.request(method, url, **kwargs)
+        return response, _connections_opened(adapter) == opened
+
+    def close(self):
+        """closes every pooled connection"""
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+            self._last_used.clear()
+
+
+def _connections_opened(adapter):
+    """total connections ever opened by the adapter's host pools"""
+    pools = adapter.poolmanager.pools
+    return sum(pools[key].num_connections for key in pools.keys())
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""Request signing from a digest of the body, made in the same pass that encodes it"""
+import base64
+import datetime
+import hashlib
+import hmac as hmac_
+import os
+from urllib.parse import parse_qsl, quote, quote_plus, urlencode, urlsplit
+from requests.utils import to_key_val_list
+
+FORM = "application/x-www-form-urlencoded"
+SIGV4 = "AWS4-HMAC-SHA256"
+DEFAULT_PORTS = {"http": 80, "https": 443}
+# Bytes of the body hashed at a time as it is encoded.
+CHUNK_SIZE = 64 * 1024
+_SAFE = frozenset(b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_.-~")
+# quote_plus as a table for str.translate, which runs in C rather than a byte at a time.
+_QUOTE = {byte: chr(byte) if byte in _SAFE else "+" if byte == 32 else "%{:02X}".format(byte)
+          for byte in range(256)}
+
+
+class BodyDigest(object):
+    """The SHA-256 of a request body as it goes on the wire, and its length in bytes"""
+    __slots__ = ["hexdigest", "length"]
+
+    def __init__(self, hexdigest, length):
+        self.hexdigest = hexdigest
+        self.length = length
+
+    def __repr__(self):
+        return "sha256:{} ({} bytes)".format(self.hexdigest, self.length)
+
+
+def signs_digest(func):
+    """
+    Marks an Authorization hook as a signer.
+
+    Signers are called with (method, url, headers, digest), a BodyDigest, in place of the
+    body params.  They may add headers to headers, and return the Authorization value.
+    """
+    func.signs_digest = True
+    return func
+
+
+def _quote(raw):
+    """quote_plus(raw) for bytes"""
+    return raw.decode("latin-1").translate(_QUOTE)
+
+
+def _pieces(data):
+    """the body requests would send for data, a piece at a time"""
+    if isinstance(data, (str, bytes)):
+        yield data
+        return
+    first = True
+    for key, values in to_key_val_list(data):
+        if isinstance(values, (str, bytes)) or not hasattr(values, "__iter__"):
+            values = [values]
+        key = key.encode("utf-8") if isinstance(key, str) else key
+        quoted = _quote(key) if isinstance(key, bytes) else quote_plus(str(key))
+        for value in values:
+            if value is None:
+                continue
+            if isinstance(value, str):
+                piece = "{}={}".format(quoted, _quote(value.encode("utf-8")))
+            elif isinstance(value, bytes):
+                piece = "{}={}".format(quoted, _quote(value))
+            elif isinstance(value, (int, float)):
+                piece = "{}={}".format(quoted, quote_plus(str(value)))
+            else:
+                # Anything else is left to urlencode, as requests does.
+                piece = urlencode([(key, value)], doseq=True)
+            yield piece if first else "&" + piece
+            first = False
+
+
+def encode(data):
+    """
+    (body, content type, BodyDigest) of data, hashed as it is encoded.
+
+    The body is what requests would have sent for data, a form encoded str for body params
+    or data itself for a str or bytes, and None if there is no body.  The content type is
+    None when requests wouldn't have set one.
+    """
+    digest = hashlib.sha256()
+    length = 0
+    pieces = []
+    chunk = []
+    chunked = 0
+    for piece in _pieces(data or {}):
+        chunk.append(piece)
+        chunked += len(piece)
+        if chunked >= CHUNK_SIZE:
+            length += _hash(digest, chunk, pieces)
+            chunk, chunked = [], 0
+    length += _hash(digest, chunk, pieces)
+    if not data:
+        return None, None, BodyDigest(digest.hexdigest(), 0)
+    if isinstance(data, bytes):
+        return b"".join(pieces), None, BodyDigest(digest.hexdigest(), length)
+    return "".join(pieces), None if isinstance(data, str) else FORM, \
+        BodyDigest(digest.hexdigest(), length)
+
+
+def _hash(digest, chunk, pieces):
+    """adds chunk, a list of pieces of the body, to digest and pieces, returns its length"""
+    if not chunk:
+        return 0
+    joined = b"".join(chunk) if isinstance(chunk[0], bytes) else "".join(chunk)
+    # http.client sends str bodies as latin-1.
+    encoded = joined.encode("latin-1") if isinstance(joined, str) else joined
+    digest.update(encoded)
+    pieces.append(joined)
+    return len(encoded)
+
+
+def _host(url):
+    """the Host header requests sends for url"""
+    parts = urlsplit(url)
+    host = parts.hostname or ""
+    if ":" in host:
+        host = "[{}]".format(host)
+    if parts.port and parts.port != DEFAULT_PORTS.get(parts.scheme.lower()):
+        host += ":{}".format(parts.port)
+    return host
+
+
+def _hmac(key, message):
+    return hmac_.new(key, message.encode("utf-8"), hashlib.sha256).digest()
+
+
+def _secret(name):
+    """the environment variable name, KeyError naming it if it isn't set"""
+    try:
+        return os.environ[name]
+    except KeyError:
+        raise KeyError("Set {} to sign requests".format(name))
+
+
+def sigv4_authorization(method, url, headers, payload_hash, access_key, secret_key, region,
+                        service):
+    """
+    The AWS Signature Version 4 Authorization value of a request.
+
+    headers has to have X-Amz-Date in it already.  Host, Content-Type and the X-Amz-
+    headers are signed.
+    """
+    parts = urlsplit(url)
+    signed = {"host": _host(url)}
+    for name, value in headers.items():
+        if name.lower() == "content-type" or name.lower().startswith("x-amz-"):
+            signed[name.lower()] = " ".join(str(value).split())
+    names = sorted(signed)
+    query = "&".join("{}={}".format(quote(key, safe="-_.~"), quote(value, safe="-_.~"))
+                     for key, value in sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    canonical = "\n".join([
+        method.upper(), quote(parts.path or "/", safe="/-_.~"), query,
+        "".join("{}:{}\n".format(name, signed[name]) for name in names),
+        ";".join(names), payload_hash])
+    amz_date = signed["x-amz-date"]
+    scope = "{}/{}/{}/aws4_request".format(amz_date[:8], region, service)
+    to_sign = "\n".join([SIGV4, amz_date, scope,
+                         hashlib.sha256(canonical.encode("utf-8")).hexdigest()])
+    key = ("AWS4" + secret_key).encode("utf-8")
+    for step in (amz_date[:8], region, service, "aws4_request"):
+        key = _hmac(key, step)
+    signature = hmac_.new(key, to_sign.encode("utf-8"), hashlib.sha256).hexdigest()
+    return "{} Credential={}/{}, SignedHeaders={}, Signature={}".format(
+        SIGV4, access_key, scope, ";".join(names), signature)
+
+
+@signs_digest
+def sigv4(method, url, headers, digest):
+    """
+    Signs the request with AWS Signature Version 4, `Authorization: librespyte.signing.sigv4`.
+
+    The keys come from AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY and AWS_SESSION_TOKEN,
+    the region from AWS_REGION (or AWS_DEFAULT_REGION) and the service from
+    RESPYTE_SIGV4_SERVICE, which defaults to execute-api.
+    """
+    headers["X-Amz-Date"] = datetime.datetime.now(datetime.timezone.utc).strftime(
+        "%Y%m%dT%H%M%SZ")
+    headers["X-Amz-Content-Sha256"] = digest.hexdigest
+    if os.environ.get("AWS_SESSION_TOKEN"):
+        headers["X-Amz-Security-Token"] = os.environ["AWS_SESSION_TOKEN"]
+    region = os.environ.get("AWS_REGION") or _secret("AWS_DEFAULT_REGION")
+    return sigv4_authorization(method, url, headers, digest.hexdigest,
+                               _secret("AWS_ACCESS_KEY_ID"), _secret("AWS_SECRET_ACCESS_KEY"),
+                               region, os.environ.get("RESPYTE_SIGV4_SERVICE", "execute-api"))
+
+
+@signs_digest
+def hmac(method, url, headers, digest):
+    """
+    Signs the request with HMAC-SHA256, `Authorization: librespyte.signing.hmac`.
+
+    The method, path and query, X-Date and the body's SHA-256 (also sent as
+    X-Content-SHA256) are signed, one per line, with RESPYTE_HMAC_SECRET, and the value is
+    `HMAC-SHA256 keyId=<RESPYTE_HMAC_KEY_ID>, signature=<base64>`.
+    """
+    parts = urlsplit(url)
+    headers["X-Date"] = datetime.datetime.now(datetime.timezone.utc).strftime(
+        "%Y-%m-%dT%H:%M:%SZ")
+    headers["X-Content-SHA256"] = digest.hexdigest
+    target = (parts.path or "/") + ("?" + parts.query if parts.query else "")
+    signature = hmac_.new(_secret("RESPYTE_HMAC_SECRET").encode("utf-8"),
+                          "\n".join([method.upper(), target, headers["X-Date"],
+                                     digest.hexdigest]).encode("utf-8"),
+                          hashlib.sha256).digest()
+    return "HMAC-SHA256 keyId={}, signature={}".format(
+        os.environ.get("RESPYTE_HMAC_KEY_ID", ""), base64.b64encode(signature).decode("ascii"))
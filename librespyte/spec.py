@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""A request as it is composed in the Main view and kept in history"""
+import requests
+from librespyte.auth import sign
+
+
+class RequestSpec(object):
+    """
+    The method, url, body params and headers of a request.
+
+    These are the keys history entries are stored with, so a spec can be built from
+    any of them and turned back into one.
+    """
+    __slots__ = ["method", "url", "data", "headers"]
+
+    def __init__(self, method, url, data=None, headers=None):
+        self.method = method or "GET"
+        self.url = url
+        self.data = data if data is not None else {}
+        self.headers = headers if headers is not None else {}
+
+    @classmethod
+    def from_dict(cls, entry):
+        """the spec of a history entry"""
+        return cls(entry.get("method"), entry["url"], entry.get("data"), entry.get("headers"))
+
+    def as_dict(self):
+        """the spec in the shape history entries are stored in"""
+        return {"method": self.method, "url": self.url,
+                "data": self.data, "headers": self.headers}
+
+    def authorized(self):
+        """
+        A copy with the Authorization hook, if there is one, run.
+
+        If the hook signs a digest of the body, the copy's data is the body as encoded.
+        """
+        data, headers = sign(self.method, self.url, self.data, dict(self.headers))
+        return RequestSpec(self.method, self.url, data, headers)
+
+    def encode(self):
+        """
+        The headers and body as requests would put them on the wire.
+
+        :returns: (headers, body) with the body params encoded, the body is None if
+            there are none.
+        """
+        headers = requests.utils.default_headers()
+        headers.update(self.headers)
+        prepared = requests.Request(self.method, self.url, data=self.data or None,
+                                    headers=headers).prepare()
+        return dict(prepared.headers), prepared.body
+
+    def __repr__(self):
+        return "{} {}".format(self.method, self.url)
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""Disk backed line storage for very large Pager values"""
+from array import array
+from collections import OrderedDict
+from itertools import accumulate
+import mmap
+from operator import sub
+import tempfile
+import threading
+
+# Values larger than this many characters are spooled to disk by the Pager.
+SPOOL_THRESHOLD = 8 * 1024 * 1024
+# Large appends are split so the newline scan never copies more than this at once.
+APPEND_SLICE = 1024 * 1024
+
+
+class SpooledLines(object):
+    """
+    A read only sequence of text lines kept in a memory mapped temp file.
+
+    Only an index of where each line starts is kept in memory (8 bytes a
+    line), lines are decoded when asked for and a few recent ones are cached.
+    Text can be appended while the lines are being read, from another thread too.
+    """
+    def __init__(self, text="", cached_lines=64):
+        self._file = tempfile.TemporaryFile()
+        self._starts = array('q', [0])
+        self._size = 0
+        self._map = None
+        self._mapped = 0
+        self._cache = OrderedDict()
+        self._cached_lines = cached_lines
+        self._ascii = True
+        self._lock = threading.RLock()
+        self.append(text)
+
+    def append(self, text):
+        """adds text, which may contain newlines, to the end of the last line"""
+        if not text:
+            return
+        with self._lock:
+            self._append(text)
+
+    def _append(self, text):
+        for begin in range(0, len(text), APPEND_SLICE):
+            data = text[begin:begin + APPEND_SLICE].encode("utf-8")
+            self._ascii = self._ascii and data.isascii()
+            self._file.seek(self._size)
+            self._file.write(data)
+            # The old last line grows, every newline starts a new line one byte after it.
+            self._cache.pop(len(self._starts) - 1, None)
+            self._starts.extend(_line_starts(self._size, data.split(b"\n")))
+            self._size += len(data)
+
+    def _view(self, end):
+        """the memory map, remapped if it doesn't reach end yet"""
+        if self._mapped < end:
+            self._file.flush()
+            if self._map is not None:
+                self._map.close()
+            self._map = mmap.mmap(self._file.fileno(), self._size, access=mmap.ACCESS_READ)
+            self._mapped = self._size
+        return self._map
+
+    def __len__(self):
+        return len(self._starts)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self._slice(*index.indices(len(self._starts)))
+        with self._lock:
+            return self._line(index)
+
+    def _slice(self, start, stop, step):
+        """lines start to stop decoded in one go, bypassing the cache"""
+        if step != 1:
+            return [self[index] for index in range(start, stop, step)]
+        if start >= stop:
+            return []
+        with self._lock:
+            end = self._starts[stop] - 1 if stop < len(self._starts) else self._size
+            text = self._view(end)[self._starts[start]:end] if self._size else b""
+            return text.decode("utf-8", errors="replace").split("\n")
+
+    def _line(self, index):
+        if index < 0:
+            index += len(self._starts)
+        if not 0 <= index < len(self._starts):
+            raise IndexError(index)
+        line = self._cache.get(index)
+        if line is not None:
+            self._cache.move_to_end(index)
+            return line
+        if self._size == 0:
+            return ""
+        start = self._starts[index]
+        end = self._starts[index + 1] - 1 if index + 1 < len(self._starts) else self._size
+        line = self._view(end)[start:end].decode("utf-8", errors="replace")
+        self._cache[index] = line
+        while len(self._cache) > self._cached_lines:
+            self._cache.popitem(last=False)
+        return line
+
+    def byte_lengths(self, start, stop):
+        """encoded lengths of lines start to stop, without reading them"""
+        with self._lock:
+            return self._byte_lengths(start, stop)
+
+    def _byte_lengths(self, start, stop):
+        ends = self._starts[start + 1:stop + 1]
+        if stop >= len(self._starts):
+            ends.append(self._size + 1)
+        # Each line ends one byte before the next starts, at its newline.
+        return map((-1).__add__, map(sub, ends, self._starts[start:stop]))
+
+    def __iter__(self):
+        for index in range(len(self._starts)):
+            yield self[index]
+
+    @property
+    def ascii(self):
+        """whether all the text is ASCII, so lengths in bytes are lengths in characters"""
+        return self._ascii
+
+    @property
+    def size(self):
+        """bytes of text held"""
+        return self._size
+
+    def text(self):
+        """the whole value as one string, this reads everything into memory"""
+        if self._size == 0:
+            return ""
+        with self._lock:
+            return self._view(self._size)[:self._size].decode("utf-8", errors="replace")
+
+    def close(self):
+        """releases the map and deletes the temp file"""
+        with self._lock:
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+            self._file.close()
+
+
+def _line_starts(offset, pieces):
+    """byte offsets of the lines that follow each newline in pieces"""
+    return (offset + start for start in accumulate(len(piece) + 1 for piece in pieces[:-1]))
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""Indexed request history backed by SQLite"""
+from os import makedirs, path
+import json
+import sqlite3
+import threading
+from librespyte.store import CONFIG_DIRECTORY, HISTORY_FILE, HistoryStore, host_of, request_key
+
+DATABASE_FILE = path.join(CONFIG_DIRECTORY, "history.sqlite3")
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY,
+    timestamp REAL,
+    method TEXT,
+    url TEXT,
+    host TEXT,
+    status INTEGER,
+    elapsed REAL,
+    request_key TEXT
+);
+CREATE TABLE IF NOT EXISTS history_entry (
+    id INTEGER PRIMARY KEY REFERENCES history (id) ON DELETE CASCADE,
+    entry TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS history_url ON history (url);
+CREATE INDEX IF NOT EXISTS history_host ON history (host);
+CREATE INDEX IF NOT EXISTS history_method ON history (method);
+CREATE INDEX IF NOT EXISTS history_status ON history (status);
+CREATE INDEX IF NOT EXISTS history_timestamp ON history (timestamp);
+CREATE INDEX IF NOT EXISTS history_elapsed ON history (elapsed);
+CREATE INDEX IF NOT EXISTS history_request_key ON history (request_key);
+"""
+# Substring search over urls, only available when SQLite was built with FTS5.
+URL_SEARCH_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS history_url_search
+    USING fts5(url, content='history', content_rowid='id', tokenize='trigram');
+CREATE TRIGGER IF NOT EXISTS history_url_search_insert AFTER INSERT ON history BEGIN
+    INSERT INTO history_url_search (rowid, url) VALUES (new.id, new.url);
+END;
+CREATE TRIGGER IF NOT EXISTS history_url_search_delete AFTER DELETE ON history BEGIN
+    INSERT INTO history_url_search (history_url_search, rowid, url)
+        VALUES ('delete', old.id, old.url);
+END;
+"""
+
+
+class SqliteHistoryStore(object):
+    """
+    History kept in an SQLite database, indexed for the HistoryView filter bar.
+
+    Offers the same interface as HistoryStore, entries are identified by rowid.
+    The first time the database is created it imports the JSON Lines history.
+    """
+    def __init__(self, filename=DATABASE_FILE, import_filename=HISTORY_FILE):
+        self.filename = filename
+        makedirs(path.dirname(filename), exist_ok=True)
+        fresh = not path.isfile(filename)
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(filename, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+        try:
+            self._db.executescript(URL_SEARCH_SCHEMA)
+            self._url_search = True
+        except sqlite3.OperationalError:
+            self._url_search = False
+        if fresh and import_filename and path.isfile(import_filename):
+            with self._db:
+                for entry in HistoryStore(import_filename):
+                    self._insert(entry)
+            self._db.execute("ANALYZE")
+
+    def _insert(self, entry):
+        # The searchable columns live apart from the full entry so that scans
+        # the indexes can't answer only walk small rows.
+        cursor = self._db.execute(
+            "INSERT INTO history (timestamp, method, url, host, status, elapsed, request_key) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (entry.get("timestamp"), entry.get("method"), entry.get("url"),
+             host_of(entry.get("url")), entry.get("status"), entry.get("elapsed"),
+             request_key(entry)))
+        self._db.execute("INSERT INTO history_entry (id, entry) VALUES (?, ?)",
+                         (cursor.lastrowid, json.dumps(entry)))
+
+    def append(self, entry):
+        """adds one entry"""
+        with self._lock, self._db:
+            self._insert(entry)
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM history").fetchone()[0]
+
+    def __getitem__(self, entry_id):
+        with self._lock:
+            row = self._db.execute("SELECT entry FROM history_entry WHERE id = ?",
+                                   (entry_id,)).fetchone()
+        if row is None:
+            raise IndexError(entry_id)
+        return json.loads(row[0])
+
+    def __iter__(self):
+        """streams entries in batches so the table is never loaded at once"""
+        last_id = 0
+        while True:
+            with self._lock:
+                rows = self._db.execute("SELECT id, entry FROM history_entry WHERE id > ? "
+                                        "ORDER BY id LIMIT 1000", (last_id,)).fetchall()
+            if not rows:
+                return
+            for last_id, entry in rows:
+                yield json.loads(entry)
+
+    def _where(self, filters):
+        """translates parse_filter() arguments into an indexed WHERE clause"""
+        clauses = []
+        params = []
+        filters = filters or {}
+        if "method" in filters:
+            clauses.append("method = ?")
+            params.append(filters["method"])
+        if "status" in filters:
+            clauses.append("status BETWEEN ? AND ?")
+            params.extend(filters["status"])
+        if "host" in filters:
+            clauses.append("host = ?")
+            params.append(filters["host"])
+        if "url" in filters:
+            # A range on the url index rather than LIKE, which can't use it.
+            clauses.append("url >= ? AND url < ?")
+            params.extend([filters["url"], filters["url"] + "\U0010ffff"])
+        if "text" in filters:
+            if self._url_search and len(filters["text"]) >= 3:
+                clauses.append("id IN (SELECT rowid FROM history_url_search "
+                               "WHERE history_url_search MATCH ?)")
+                params.append('"{}"'.format(filters["text"].replace('"', '""')))
+            else:
+                clauses.append("instr(lower(url), lower(?)) > 0")
+                params.append(filters["text"])
+        if "since" in filters:
+            clauses.append("timestamp >= ?")
+            params.append(filters["since"])
+        if "until" in filters:
+            clauses.append("timestamp <= ?")
+            params.append(filters["until"])
+        if "latency" in filters:
+            clauses.append("elapsed >= ?")
+            params.append(filters["latency"])
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def query(self, filters=None, limit=None, offset=0):
+        """(entry id, entry) pairs matching parse_filter() arguments, oldest first"""
+        where, params = self._where(filters)
+        sql = ("SELECT history_entry.id, entry FROM history_entry JOIN "
+               "(SELECT id FROM history" + where + " ORDER BY id LIMIT ? OFFSET ?) AS page "
+               "USING (id) ORDER BY id")
+        with self._lock:
+            rows = self._db.execute(sql, params + [-1 if limit is None else limit,
+                                                   offset]).fetchall()
+        return [(entry_id, json.loads(entry)) for entry_id, entry in rows]
+
+    def summaries(self, filters=None, offset=0, limit=100):
+        """
+        (entry id, summary) for one window of the matching entries, oldest first.
+
+        Answered from the indexed columns alone, full entries are never loaded.
+        """
+        where, params = self._where(filters)
+        sql = ("SELECT id, method, url, timestamp, status FROM history" + where +
+               " ORDER BY id LIMIT ? OFFSET ?")
+        with self._lock:
+            rows = self._db.execute(sql, params + [limit, offset]).fetchall()
+        return [(row[0], dict(zip(("method", "url", "timestamp", "status"), row[1:])))
+                for row in rows]
+
+    def count(self, filters=None):
+        """number of entries matching parse_filter() arguments"""
+        where, params = self._where(filters)
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM history" + where,
+                                    params).fetchone()[0]
+
+    def compact(self):
+        """drops all but the most recent entry of identical requests"""
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM history WHERE id NOT IN "
+                             "(SELECT MAX(id) FROM history GROUP BY request_key)")
+            self._db.execute("DELETE FROM history_entry WHERE id NOT IN (SELECT id FROM history)")
+        # Keeps the planner statistics current so it picks the selective index.
+        self._db.execute("PRAGMA optimize")
@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+"""Append-only request history"""
+from array import array
+from collections import OrderedDict
+from hashlib import sha1
+from os import makedirs, path, replace, stat
+from urllib.parse import urlsplit
+import json
+import re
+import threading
+import time
+
+CONFIG_DIRECTORY = path.expanduser(path.join("~", ".config", "respyte"))
+HISTORY_FILE = path.join(CONFIG_DIRECTORY, "history.jsonl")
+LEGACY_HISTORY_FILE = path.join(CONFIG_DIRECTORY, "history.json")
+BACKENDS = ("jsonl", "sqlite")
+FILTER_KEYS = ("method", "status", "host", "url", "since", "until", "latency")
+DURATION = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+
+def request_key(entry):
+    """identifies duplicate requests regardless of when they were sent"""
+    key = json.dumps([entry.get(field) for field in ("method", "url", "data", "headers")],
+                     sort_keys=True)
+    return sha1(key.encode("utf-8")).hexdigest()
+
+
+def host_of(url):
+    """the lower cased host[:port] of url"""
+    return urlsplit(url or "").netloc.lower()
+
+
+def _parse_time(value):
+    """accepts relative durations (15m, 2h, 3d) or dates (2020-01-31, 2020-01-31T12:00)"""
+    relative = re.match(r'^(\d+(?:\.\d+)?)([smhdw])$', value)
+    if relative:
+        return time.time() - float(relative.group(1)) * DURATION[relative.group(2)]
+    for fmt in ("%Y-%m-%dT%H:%M:%S", "%Y-%m-%dT%H:%M", "%Y-%m-%d"):
+        try:
+            return time.mktime(time.strptime(value, fmt))
+        except ValueError:
+            pass
+    raise ValueError("can't parse time '{}'".format(value))
+
+
+def parse_filter(text):
+    """
+    Turns the filter bar text into query arguments.
+
+    Supports method:GET status:200 status:5xx host:api.example.com
+    url:https://prefix since:2h until:2020-01-31 latency:500 (at least 500ms),
+    anything else is matched as a substring of the url.
+    """
+    filters = {}
+    words = []
+    for token in (text or "").split():
+        key, sep, value = token.partition(":")
+        if not sep or key.lower() not in FILTER_KEYS or not value:
+            words.append(token)
+            continue
+        key = key.lower()
+        if key == "method":
+            filters["method"] = value.upper()
+        elif key == "status":
+            if value.lower().endswith("xx"):
+                base = int(value[0]) * 100
+                filters["status"] = (base, base + 99)
+            else:
+                filters["status"] = (int(value), int(value))
+        elif key == "host":
+            filters["host"] = value.lower()
+        elif key == "url":
+            filters["url"] = value
+        elif key == "latency":
+            filters["latency"] = float(value) / 1000
+        else:
+            filters[key] = _parse_time(value)
+    if words:
+        filters["text"] = " ".join(words)
+    return filters
+
+
+def matches(entry, filters):
+    """whether an entry satisfies parse_filter() arguments"""
+    url = entry.get("url") or ""
+    checks = (
+        ("method", lambda value: entry.get("method") == value),
+        ("status", lambda value: entry.get("status") is not None
+         and value[0] <= entry["status"] <= value[1]),
+        ("host", lambda value: host_of(url) == value),
+        ("url", url.startswith),
+        ("text", lambda value: value.lower() in url.lower()),
+        ("since", lambda value: (entry.get("timestamp") or 0) >= value),
+        ("until", lambda value: (entry.get("timestamp") or 0) <= value),
+        ("latency", lambda value: (entry.get("elapsed") or 0) >= value),
+    )
+    return all(check(filters[key]) for key, check in checks if key in filters)
+
+
+def summarize(entry):
+    """the few fields the history list shows for an entry"""
+    return {field: entry.get(field) for field in ("method", "url", "timestamp", "status")}
+
+
+def open_history(backend="jsonl"):
+    """opens the history store for the configured backend, wrapped in a shared HistoryModel"""
+    if backend == "sqlite":
+        from librespyte.sqlhistory import SqliteHistoryStore # pylint: disable=import-outside-toplevel
+        return HistoryModel(SqliteHistoryStore())
+    return HistoryModel(HistoryStore())
+
+
+class HistoryStore(object):
+    """
+    History kept as JSON Lines, one request per line.
+
+    Appends never rewrite the file. Line offsets are indexed incrementally so
+    entries can be fetched by position without parsing the rest of the log.
+    """
+    def __init__(self, filename=HISTORY_FILE, legacy_filename=LEGACY_HISTORY_FILE):
+        self.filename = filename
+        self._lock = threading.RLock()
+        self._offsets = array('q')
+        self._indexed = 0
+        self._inode = None
+        self._matched = (None, None, array('q'))
+        makedirs(path.dirname(filename), exist_ok=True)
+        if not path.isfile(filename):
+            if legacy_filename and path.isfile(legacy_filename):
+                self._migrate(legacy_filename)
+            else:
+                open(filename, 'a').close()
+
+    def _migrate(self, legacy_filename):
+        """one time conversion of the old {'history': [...]} file"""
+        with open(legacy_filename, 'r') as legacy_file:
+            entries = json.loads(legacy_file.read() or '{"history": []}')['history']
+        self._rewrite(entries)
+        replace(legacy_filename, legacy_filename + ".migrated")
+
+    def _rewrite(self, entries):
+        """atomically replaces the log with entries"""
+        temp_name = self.filename + ".tmp"
+        with open(temp_name, 'w') as temp_file:
+            for entry in entries:
+                temp_file.write(json.dumps(entry) + "\n")
+        replace(temp_name, self.filename)
+
+    def _refresh_index(self):
+        """indexes lines appended since the last call, starting over if the file was replaced"""
+        info = stat(self.filename)
+        if info.st_ino != self._inode or info.st_size < self._indexed:
+            self._inode = info.st_ino
+            self._offsets = array('q')
+            self._indexed = 0
+        if info.st_size == self._indexed:
+            return
+        with open(self.filename, 'rb') as history_file:
+            history_file.seek(self._indexed)
+            offset = self._indexed
+            for line in history_file:
+                if not line.endswith(b"\n"):
+                    # A partially written record, pick it up once it is complete.
+                    break
+                if line.strip():
+                    self._offsets.append(offset)
+                offset += len(line)
+            self._indexed = offset
+
+    def __len__(self):
+        with self._lock:
+            self._refresh_index()
+            return len(self._offsets)
+
+    def __getitem__(self, index):
+        """entries are identified by their position in the log"""
+        with self._lock:
+            self._refresh_index()
+            offset = self._offsets[index]
+            with open(self.filename, 'rb') as history_file:
+                history_file.seek(offset)
+                return json.loads(history_file.readline().decode("utf-8"))
+
+    def _read_lines(self, offsets):
+        """parses the lines starting at each offset, in one pass over the file"""
+        entries = []
+        with open(self.filename, 'rb') as history_file:
+            for offset in offsets:
+                if history_file.tell() != offset:
+                    history_file.seek(offset)
+                entries.append(json.loads(history_file.readline().decode("utf-8")))
+        return entries
+
+    def __iter__(self):
+        """streams entries from disk without loading the whole log"""
+        with open(self.filename, 'r') as history_file:
+            for line in history_file:
+                if line.endswith("\n") and line.strip():
+                    yield json.loads(line)
+
+    def append(self, entry):
+        """adds one entry in O(1)"""
+        with self._lock:
+            with open(self.filename, 'a') as history_file:
+                history_file.write(json.dumps(entry) + "\n")
+
+    def compact(self):
+        """
+        Rewrites the log without duplicate requests.
+
+        Identical method/url/data/headers combinations keep only their most
+        recent entry, in the position of that entry. Runs in two streaming
+        passes so the log is never held in memory.
+        """
+        with self._lock:
+            latest = {}
+            total = 0
+            for number, entry in enumerate(self):
+                latest[request_key(entry)] = number
+                total = number + 1
+            if len(latest) == total:
+                return
+            keep = set(latest.values())
+            temp_name = self.filename + ".tmp"
+            with open(self.filename, 'r') as history_file, open(temp_name, 'w') as temp_file:
+                number = 0
+                for line in history_file:
+                    if line.endswith("\n") and line.strip():
+                        if number in keep:
+                            temp_file.write(line)
+                        number += 1
+            replace(temp_name, self.filename)
+
+    def query(self, filters=None, limit=None, offset=0):
+        """
+        (entry id, entry) pairs matching parse_filter() arguments, oldest first.
+
+        The log has no index, so this is a linear scan.
+        """
+        found = []
+        skipped = 0
+        for number, entry in enumerate(self):
+            if filters and not matches(entry, filters):
+                continue
+            if skipped < offset:
+                skipped += 1
+                continue
+            found.append((number, entry))
+            if limit is not None and len(found) >= limit:
+                break
+        return found
+
+    def _matching_ids(self, filters):
+        """
+        Entry ids matching filters, remembered until the log changes or the filters do.
+
+        Only the ids are kept, so this is 8 bytes per match.
+        """
+        key = json.dumps(filters, sort_keys=True)
+        with self._lock:
+            self._refresh_index()
+            if self._matched[:2] != (key, self._indexed):
+                ids = array('q', (number for number, entry in enumerate(self)
+                                  if matches(entry, filters)))
+                self._matched = (key, self._indexed, ids)
+            return self._matched[2]
+
+    def count(self, filters=None):
+        """number of entries matching parse_filter() arguments"""
+        if not filters:
+            return len(self)
+        return len(self._matching_ids(filters))
+
+    def summaries(self, filters=None, offset=0, limit=100):
+        """
+        (entry id, summarize(entry)) for one window of the matching entries, oldest first.
+
+        Only the lines in the window are read and parsed.
+        """
+        with self._lock:
+            self._refresh_index()
+            if filters:
+                ids = self._matching_ids(filters)[offset:offset + limit]
+            else:
+                ids = range(offset, min(offset + limit, len(self._offsets)))
+            entries = self._read_lines([self._offsets[entry_id] for entry_id in ids])
+        return [(entry_id, summarize(entry)) for entry_id, entry in zip(ids, entries)]
+
+
+class HistoryModel(object):
+    """
+    In-memory view of a history store, shared by RestView and HistoryView.
+
+    Counts, summary pages and full entries are cached, so moving around the
+    history list only touches the disk for rows it has never shown. Caches are
+    dropped when append() is called or refresh() sees the file's mtime or size
+    change, e.g. because another respyte wrote to it.
+    """
+    def __init__(self, store, max_entries=256, max_pages=64):
+        self.store = store
+        self.version = 0
+        self.generation = 0
+        self._max_entries = max_entries
+        self._max_pages = max_pages
+        self._lock = threading.RLock()
+        self._entries = OrderedDict()
+        self._pages = OrderedDict()
+        self._counts = {}
+        self._signature = self._stat()
+
+    def _stat(self):
+        info = stat(self.store.filename)
+        return info.st_mtime_ns, info.st_size
+
+    @staticmethod
+    def _cache_get(cache, key):
+        if key in cache:
+            cache.move_to_end(key)
+            return True, cache[key]
+        return False, None
+
+    @staticmethod
+    def _cache_put(cache, key, value, limit):
+        cache[key] = value
+        while len(cache) > limit:
+            cache.popitem(last=False)
+
+    def invalidate(self, entries=True):
+        """
+        Forgets cached results.
+
+        Entries are only dropped when entries is True, appends never change an
+        existing entry so they can keep them. version moves on every call,
+        generation only when entry ids may have changed meaning.
+        """
+        with self._lock:
+            self._pages.clear()
+            self._counts.clear()
+            if entries:
+                self._entries.clear()
+                self.generation += 1
+            self._signature = self._stat()
+            self.version += 1
+
+    def refresh(self):
+        """drops the caches if the store changed on disk, returns whether it did"""
+        with self._lock:
+            if self._stat() == self._signature:
+                return False
+            self.invalidate()
+            return True
+
+    def append(self, entry):
+        """adds one entry and tells every view sharing the model"""
+        with self._lock:
+            self.store.append(entry)
+            self.invalidate(entries=False)
+
+    def compact(self):
+        """compacts the store, which renumbers entries"""
+        with self._lock:
+            self.store.compact()
+            self.invalidate()
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, entry_id):
+        with self._lock:
+            found, entry = self._cache_get(self._entries, entry_id)
+            if not found:
+                entry = self.store[entry_id]
+                self._cache_put(self._entries, entry_id, entry, self._max_entries)
+            return entry
+
+    def __iter__(self):
+        return iter(self.store)
+
+    def query(self, filters=None, limit=None, offset=0):
+        """see HistoryStore.query, not cached"""
+        return self.store.query(filters, limit, offset)
+
+    def count(self, filters=None):
+        """see HistoryStore.count"""
+        key = json.dumps(filters or {}, sort_keys=True)
+        with self._lock:
+            if key not in self._counts:
+                self._counts[key] = self.store.count(filters)
+            return self._counts[key]
+
+    def summaries(self, filters=None, offset=0, limit=100):
+        """see HistoryStore.summaries"""
+        key = (json.dumps(filters or {}, sort_keys=True), offset, limit)
+        with self._lock:
+            found, page = self._cache_get(self._pages, key)
+            if not found:
+                page = self.store.summaries(filters, offset, limit)
+                self._cache_put(self._pages, key, page, self._max_pages)
+            return page
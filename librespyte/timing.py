@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""Per phase timing of requests sent through the SessionManager"""
+import socket
+import threading
+import time
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import NewConnectionError
+
+# (phase, mark it starts at, mark it ends at), in the order they happen.
+PHASES = (
+    ("dns", "dns", "connect"),
+    ("connect", "connect", "connected"),
+    ("tls", "connected", "secured"),
+    ("send", "send", "sent"),
+    ("ttfb", "sent", "headers"),
+    ("download", "headers", "downloaded"),
+    ("format", "downloaded", "formatted"),
+)
+WATERFALL_WIDTH = 30
+_current = threading.local()
+
+
+def current():
+    """the PhaseTimer of the request being sent on this thread, or None"""
+    return getattr(_current, "timer", None)
+
+
+def _mark(name):
+    timer = current()
+    if timer is not None:
+        timer.mark(name)
+
+
+class PhaseTimer(object):
+    """
+    Collects the times a request reaches each phase.
+
+    Use it as a context manager around the send, the timed connections below mark
+    the phases they see on the timer of their thread.  With redirects the phases are
+    those of the last request.
+    """
+    def __init__(self):
+        self.started = time.monotonic()
+        self.marks = {}
+
+    def __enter__(self):
+        _current.timer = self
+        return self
+
+    def __exit__(self, *exc_info):
+        _current.timer = None
+
+    def mark(self, name):
+        """records that the request has reached name now"""
+        self.marks[name] = time.monotonic()
+
+    def phases(self):
+        """seconds spent in each phase that has finished, phases that didn't happen are left out"""
+        marks = dict(self.marks)
+        # A new plain connection is made while the request is being sent.
+        if "send" in marks:
+            marks["send"] = max(marks.get(mark, marks["send"])
+                                for mark in ("send", "connected", "secured"))
+        return {phase: round(marks[end] - marks[start], 6) for phase, start, end in PHASES
+                if start in marks and end in marks}
+
+
+def waterfall(phases, width=WATERFALL_WIDTH):
+    """
+    Lines of a text waterfall of phases, as returned by PhaseTimer.phases().
+
+    The phases are drawn one after another, each bar starting where the last one ended.
+    """
+    total = sum(phases.values())
+    scale = width / total if total > 0 else 0
+    lines = []
+    offset = 0
+    for phase, _, _ in PHASES:
+        if phase not in phases:
+            lines.append("{:<8} {:>10}".format(phase, "-"))
+            continue
+        duration = phases[phase]
+        lines.append("{:<8} {:>7.1f} ms |{}{}".format(
+            phase, duration * 1000, " " * int(offset * scale),
+            "#" * max(1, int(round(duration * scale)))))
+        offset += duration
+    lines.append("{:<8} {:>7.1f} ms".format("total", total * 1000))
+    return lines
+
+
+class TimedHTTPConnection(HTTPConnection):
+    """An HTTPConnection that marks when it resolves, connects, sends and gets a response"""
+    def _new_conn(self):
+        if current() is None:
+            return super(TimedHTTPConnection, self)._new_conn()
+        _mark("dns")
+        try:
+            addresses = [info[4][0] for info in
+                         socket.getaddrinfo(self._dns_host, self.port, 0, socket.SOCK_STREAM)]
+        except socket.gaierror:
+            # Let urllib3 look it up again and raise its own error.
+            return super(TimedHTTPConnection, self)._new_conn()
+        _mark("connect")
+        # Connect to the looked up addresses so the lookup isn't done, and timed, twice.
+        host = self._dns_host
+        try:
+            for address in addresses[:-1]:
+                self._dns_host = address
+                try:
+                    return super(TimedHTTPConnection, self)._new_conn()
+                except NewConnectionError:
+                    continue
+            self._dns_host = addresses[-1]
+            return super(TimedHTTPConnection, self)._new_conn()
+        finally:
+            self._dns_host = host
+            _mark("connected")
+
+    def request(self, *args, **kwargs): # pylint: disable=arguments-differ
+        _mark("send")
+        result = super(TimedHTTPConnection, self).request(*args, **kwargs)
+        _mark("sent")
+        return result
+
+    def getresponse(self, *args, **kwargs): # pylint: disable=arguments-differ
+        response = super(TimedHTTPConnection, self).getresponse(*args, **kwargs)
+        _mark("headers")
+        return response
+
+
+class TimedHTTPSConnection(TimedHTTPConnection, HTTPSConnection):
+    """A TimedHTTPConnection that also marks the end of the TLS handshake"""
+    def connect(self):
+        super(TimedHTTPSConnection, self).connect()
+        _mark("secured")
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimedAdapter(HTTPAdapter):
+    """An HTTPAdapter whose connections mark their phases on the current PhaseTimer"""
+    def init_poolmanager(self, *args, **kwargs):
+        super(TimedAdapter, self).init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": TimedHTTPConnectionPool,
+            "https": TimedHTTPSConnectionPool,
+        }
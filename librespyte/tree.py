@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""Tree view of the last JSON response"""
+from asciimatics.event import KeyboardEvent
+from asciimatics.exceptions import NextScene
+from asciimatics.screen import Screen
+from asciimatics.widgets import Button, Divider, Frame, Layout, Text
+from librespyte.jsontree import JsonTree
+
+
+class TreeView(Frame):
+    """Collapsible tree of the response the Main view got last"""
+    def __init__(self, screen, parsed_args, rest):
+        super(TreeView, self).__init__(screen,
+                                       screen.height,
+                                       screen.width,
+                                       on_load=self._reload,
+                                       hover_focus=True,
+                                       can_scroll=False,
+                                       title="Respyte JSON tree")
+
+        self._rest = rest
+        self._body = None
+        self.set_theme(parsed_args.color_scheme)
+        tree_layout = Layout([1], fill_frame=True)
+        self.add_layout(tree_layout)
+        self.path = Text(label="Path: ", name="path", readonly=True)
+        self.tree = JsonTree(screen.height - 6,
+                             label="Response",
+                             name="tree",
+                             on_change=self._show_path)
+        tree_layout.add_widget(self.path)
+        tree_layout.add_widget(Divider())
+        tree_layout.add_widget(self.tree)
+        button_layout = Layout([1, 1, 1])
+        self.add_layout(button_layout)
+        button_layout.add_widget(Divider())
+        button_layout.add_widget(Divider(), 1)
+        button_layout.add_widget(Divider(), 2)
+        button_layout.add_widget(Button("[Back <ESC>]", self._back, add_box=False), 1)
+        self.fix()
+
+    def _reload(self):
+        """Show the latest response, the tree is only rebuilt when it has changed"""
+        body = self._rest.body
+        if body is not self._body:
+            self._body = body
+            self.tree.document = body.parsed if body is not None else None
+            self.switch_focus(self._layouts[0], 0, 2)
+        self._show_path()
+
+    def _show_path(self):
+        self.path.value = self.tree.value
+
+    @staticmethod
+    def _back():
+        raise NextScene("Main")
+
+    def process_event(self, event):
+        if isinstance(event, KeyboardEvent) and event.key_code in [Screen.KEY_ESCAPE,
+                                                                   Screen.KEY_F7]:
+            self._back()
+        return super(TreeView, self).process_event(event)
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""The respyte TUI, its arguments and scenes"""
+from os import path
+import sys
+import configargparse
+from asciimatics.scene import Scene
+from asciimatics.screen import Screen
+from asciimatics.exceptions import ResizeScreenError
+from librespyte.rest import RestView
+from librespyte import auth
+from librespyte.collectionview import CollectionView
+from librespyte.history import HistoryView
+from librespyte.loadview import LoadTestView
+from librespyte.preview import DEFAULT_CACHE_MB
+from librespyte.render import DEFAULT_VIEW, VIEWS
+from librespyte.session import DEFAULT_POOL_SIZE, DEFAULT_IDLE_TIMEOUT
+from librespyte.store import BACKENDS, open_history
+from librespyte.tree import TreeView
+
+def parse(argv=None):
+    """adds and parses arguments"""
+    data = ".respyterc"
+    default = path.join(path.expanduser("~"), data + ".yml")
+    parser = configargparse.ArgParser(
+        config_file_parser_class=configargparse.YAMLConfigFileParser,
+        default_config_files=[default])
+    parser.add(
+        '-c', '--color-scheme',
+        default="bright",
+        help='color scheme to use [monochrome, green, bright, tlj256, blue] defaults to bright'
+    )
+    parser.add(
+        '--pool-size',
+        type=int,
+        default=DEFAULT_POOL_SIZE,
+        help='keep-alive connections kept per host, defaults to {}'.format(DEFAULT_POOL_SIZE)
+    )
+    parser.add(
+        '--pool-idle-timeout',
+        type=float,
+        default=DEFAULT_IDLE_TIMEOUT,
+        help='seconds a host may sit idle before its connections are closed, 0 keeps them '
+             'for the whole run, defaults to {}'.format(DEFAULT_IDLE_TIMEOUT)
+    )
+    parser.add(
+        '--history-backend',
+        choices=BACKENDS,
+        default="jsonl",
+        help='where history is kept, sqlite indexes it for fast filtering, defaults to jsonl'
+    )
+    parser.add(
+        '--preview-cache-mb',
+        type=float,
+        default=DEFAULT_CACHE_MB,
+        help='memory kept for rendered history previews, defaults to {}'.format(DEFAULT_CACHE_MB)
+    )
+    parser.add(
+        '--load-processes',
+        type=int,
+        default=1,
+        help='worker processes load tests are shared out between, each with its own '
+             'connections, defaults to 1'
+    )
+    parser.add(
+        '--load-workers',
+        default="",
+        help='comma separated [host:]ports of `respyte worker`s to share load tests out '
+             'between, instead of sending from this machine'
+    )
+    auth.add_arguments(parser)
+    parser.add(
+        '--response-view',
+        choices=VIEWS,
+        default=DEFAULT_VIEW,
+        help='how response bodies are shown at first, F6 switches, defaults to {}'.format(
+            DEFAULT_VIEW)
+    )
+    return parser.parse_args(argv)
+
+def respyte_tui(screen, scene, parsed_args, history):
+    """start playing tui scenes"""
+    rest = RestView(screen, parsed_args, history)
+    scenes = [
+        Scene([
+            rest
+        ], -1, name="Main"),
+        Scene([
+            HistoryView(screen, parsed_args, history)
+        ], -1, name="History"),
+        Scene([
+            TreeView(screen, parsed_args, rest)
+        ], -1, name="Tree"),
+        Scene([
+            LoadTestView(screen, parsed_args, rest)
+        ], -1, name="Load"),
+        Scene([
+            CollectionView(screen, parsed_args, rest)
+        ], -1, name="Collections"),
+    ]
+    screen.play(scenes, stop_on_resize=True, start_scene=scene, allow_int=True)
+
+def main(argv=None):
+    """runs the TUI until it is quit"""
+    parsed_args = parse(argv)
+    auth.configure(parsed_args)
+    history = open_history(parsed_args.history_backend)
+    last_scene = None
+    while True:
+        try:
+            Screen.wrapper(respyte_tui, catch_interrupt=True,
+                           arguments=[last_scene, parsed_args, history])
+            sys.exit(0)
+        except ResizeScreenError as err:
+            last_scene = err.scene
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""respyte worker, runs shares of load tests for a coordinator elsewhere"""
+import socket
+import sys
+import threading
+import configargparse
+from librespyte.auth import TokenCache
+from librespyte.load import REPORT_INTERVAL, LoadTest
+from librespyte.remote import DEFAULT_HOST, DEFAULT_PORT, Channel, parse_address
+from librespyte.spec import RequestSpec
+
+
+def parse(argv):
+    """adds and parses the worker's arguments"""
+    parser = configargparse.ArgParser(prog="respyte worker",
+                                      description="run load tests sent by a respyte coordinator")
+    parser.add(
+        '--listen',
+        default="{}:{}".format(DEFAULT_HOST, DEFAULT_PORT),
+        help='[host:]port to wait for coordinators on, anyone who can reach it can send load '
+             'from this machine, defaults to {}:{}'.format(DEFAULT_HOST, DEFAULT_PORT)
+    )
+    parser.add(
+        '--processes',
+        type=int,
+        default=1,
+        help='worker processes each share of a test is split between, defaults to 1'
+    )
+    return parser.parse_args(argv)
+
+
+def serve(listener, processes=1, log=None):
+    """runs the tests sent by each coordinator that connects to listener, until interrupted"""
+    while True:
+        sock, address = listener.accept()
+        threading.Thread(target=_run, args=(Channel(sock), address, processes, log),
+                         daemon=True).start()
+
+
+def _run(channel, address, processes, log):
+    """runs the share of a test one coordinator sends, then hangs up"""
+    try:
+        message = channel.receive()
+        if message is None or message["type"] != "run":
+            return
+        test = LoadTest(RequestSpec.from_dict(message["spec"]), message["requests"],
+                        message["concurrency"], [tuple(stage) for stage in message["profile"]],
+                        processes, message["share"], tokens=TokenCache(*message["auth"]))
+        channel.send({"type": "ready"})
+        message = channel.receive()
+        if message is None or message["type"] != "start":
+            return
+        if log is not None:
+            log("{}:{} started {!r}, share {} of {}".format(
+                address[0], address[1], test.spec, test.share[0] + 1, test.share[1]))
+        cancelled = threading.Event()
+        threading.Thread(target=_listen_for_stop, args=(channel, cancelled), daemon=True).start()
+        failures = []
+        sender = threading.Thread(target=_send, args=(test, cancelled, failures), daemon=True)
+        sender.start()
+        while sender.is_alive():
+            sender.join(REPORT_INTERVAL)
+            if sender.is_alive() and not channel.send(
+                    {"type": "stats", "stats": test.stats.snapshot().to_dict()}):
+                cancelled.set()
+        if failures:
+            raise failures[0]
+        channel.send({"type": "done", "stats": test.stats.snapshot().to_dict()})
+        if log is not None:
+            log("{}:{} done, {} requests".format(address[0], address[1],
+                                                  test.stats.snapshot().done))
+    except Exception as err: # pylint: disable=broad-except
+        channel.send({"type": "error", "message": "{}: {}".format(type(err).__name__, err)})
+    finally:
+        channel.close()
+
+
+def _send(test, cancelled, failures):
+    """sends the test's share, keeping what stopped it if it fails"""
+    try:
+        test.send(test.spec, cancelled)
+    except Exception as err: # pylint: disable=broad-except
+        failures.append(err)
+
+
+def _listen_for_stop(channel, cancelled):
+    """cancels the test when the coordinator says stop or hangs up"""
+    message = channel.receive()
+    if message is None or message["type"] == "stop":
+        cancelled.set()
+
+
+def main(argv):
+    """respyte worker [--listen [host:]port] [--processes n]"""
+    args = parse(argv)
+    listener = socket.create_server(parse_address(args.listen))
+    print("respyte worker listening on {}:{}".format(*listener.getsockname()[:2]), flush=True)
+    try:
+        serve(listener, args.processes, lambda line: print(line, flush=True))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        listener.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
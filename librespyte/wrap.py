@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""Line wrapping for the Pager that only walks each line once"""
+from bisect import bisect_right
+from functools import lru_cache
+from wcwidth import wcwidth
+
+# Display row starts for a line that doesn't wrap.
+SINGLE_ROW = (0,)
+
+
+@lru_cache(maxsize=4096)
+def glyph_width(char):
+    """screen cells taken by char, the same way asciimatics measures it when enforcing widths"""
+    return wcwidth(char) if ord(char) >= 256 else 1
+
+
+def narrow(text):
+    """whether every glyph in text takes one cell, as glyph_width() sees it"""
+    # isascii() is answered from the string's header, max() has to look at every glyph.
+    return text.isascii() or max(text) < "\u0100"
+
+
+def wrap_breaks(text, limit, unicode_aware):
+    """
+    The columns of text at which each display row starts when wrapped at limit cells.
+
+    A row that exactly fills the limit is followed by an empty one, like the Pager has always
+    done.  For ASCII text this is just arithmetic, otherwise the breaks are a LineWrap that is
+    only walked as far as it is read.
+    """
+    # Double width glyphs take at most two cells.
+    if (2 * len(text) if unicode_aware else len(text)) < limit:
+        return SINGLE_ROW
+    if not unicode_aware or text.isascii():
+        return range(0, len(text) + 1, limit)
+    return LineWrap(text, limit)
+
+
+def part_of(breaks, column):
+    """the display row of breaks that column is on"""
+    if isinstance(breaks, LineWrap):
+        return breaks.part_of(column)
+    return bisect_right(breaks, column) - 1
+
+
+class LineWrap(object):
+    """
+    The row starts of one line with double width glyphs, worked out as they are needed.
+
+    Each row is measured once: a row of narrow glyphs is skipped in one step, otherwise
+    its characters are summed using cached glyph widths.  Indexing past the rows found so
+    far wraps just far enough, only len() wraps the whole line.
+    """
+    def __init__(self, text, limit):
+        self._text = text
+        self._limit = limit
+        self._breaks = [0]
+        self._done = False
+
+    def _next_row(self):
+        """finds the start of the row after the last one found"""
+        text = self._text
+        start = self._breaks[-1]
+        row = text[start:start + self._limit]
+        if narrow(row):
+            if len(row) < self._limit:
+                self._done = True
+                return
+            stop = start + self._limit
+        else:
+            size = 0
+            stop = start
+            while stop < len(text):
+                width = glyph_width(text[stop])
+                if size + width > self._limit and stop > start:
+                    break
+                size += width
+                stop += 1
+            if stop == len(text) and size < self._limit:
+                self._done = True
+                return
+        self._breaks.append(stop)
+        self._done = stop == len(text)
+
+    def __getitem__(self, part):
+        if part < 0:
+            part += len(self)
+        while not self._done and len(self._breaks) <= part:
+            self._next_row()
+        return self._breaks[part]
+
+    def __len__(self):
+        while not self._done:
+            self._next_row()
+        return len(self._breaks)
+
+    def has_row(self, part):
+        """whether the line has a row part, wrapping no further than needed to tell"""
+        try:
+            self[part]
+        except IndexError:
+            return False
+        return True
+
+    def part_of(self, column):
+        """the row column is on, wrapping no further than needed to tell"""
+        while not self._done and self._breaks[-1] <= column:
+            self._next_row()
+        return bisect_right(self._breaks, column) - 1
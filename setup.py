@@ -11,10 +11,12 @@ setup(
         'asciimatics>=1.13.0',
         'PyYAML>=5.4',
         'requests>=2.22.0',
-        'ConfigArgParse>-1.0'
+        'ConfigArgParse>-1.0',
+        'wcwidth>=0.1.7'
     ],
     extras_require={
-        'testing': ["mock", "tox"]
+        'testing': ["mock", "tox"],
+        'fast': ["orjson"]
     },
     cmdclass=versioneer.get_cmdclass(),
 )
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""Tests for Authorization hooks and the cache of their values"""
+import sys
+import time
+import types
+import unittest
+from librespyte import auth
+from librespyte.auth import TokenCache, authorize
+
+HOOKS = "respyte_test_hooks"
+
+
+def hooks(**functions):
+    """a module of hooks named HOOKS, importable while the test runs"""
+    module = types.ModuleType(HOOKS)
+    for name, function in functions.items():
+        setattr(module, name, function)
+    sys.modules[HOOKS] = module
+    return module
+
+
+class AuthorizeTest(unittest.TestCase):
+    """authorize() runs hooks through a TokenCache"""
+    def setUp(self):
+        self.seen = []
+        self.addCleanup(sys.modules.pop, HOOKS, None)
+        # Hooks are imported once, the next test's are different functions.
+        self.addCleanup(auth._hooks.pop, HOOKS + ".token", None) # pylint: disable=protected-access
+
+    def token(self, url, data, headers):
+        # Slow enough that the send has carried on by the time a refresh reads headers.
+        time.sleep(0.05)
+        self.seen.append(headers.get("Authorization"))
+        return "token-{}".format(len(self.seen)), 0.4
+
+    def test_value_is_reused(self):
+        hooks(token=self.token)
+        cache = TokenCache()
+        for _ in range(3):
+            headers = authorize("http://x/", {}, {"Authorization": HOOKS + ".token"}, cache)
+            self.assertEqual(headers["Authorization"], "token-1")
+        self.assertEqual(len(self.seen), 1)
+
+    def test_expired_value_is_dropped(self):
+        cache = TokenCache()
+        cache.put("hook", "x", "token-1", 0.05)
+        time.sleep(0.1)
+        def failing():
+            raise OSError("the token endpoint is down")
+        with self.assertRaises(OSError):
+            cache.fetch("hook", "x", failing)
+        self.assertEqual(cache._tokens, {}) # pylint: disable=protected-access
+        self.assertEqual(cache.fetch("hook", "x", lambda: ("token-2", 60)), "token-2")
+        self.assertEqual(cache.reused, 0)
+
+    def test_refresh_sees_the_headers_as_sent(self):
+        hooks(token=self.token)
+        cache = TokenCache(refresh_window=30)
+        authorize("http://x/", {}, {"Authorization": HOOKS + ".token"}, cache)
+        # Half the 0.4 second lifetime later, the next send starts a refresh in the background.
+        time.sleep(0.25)
+        authorize("http://x/", {}, {"Authorization": HOOKS + ".token"}, cache)
+        deadline = time.monotonic() + 2
+        while not cache.refreshed and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(cache.refreshed, 1)
+        self.assertEqual(self.seen, [HOOKS + ".token"] * 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""Tests for load tests shared out between remote workers"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import socket
+import sys
+import threading
+import time
+import types
+import unittest
+from unittest import mock
+from librespyte import auth
+from librespyte.auth import TokenCache
+from librespyte.load import LoadStats, LoadTest, report
+from librespyte.signing import signs_digest
+from librespyte.spec import RequestSpec
+from librespyte.worker import serve
+
+
+class Handler(BaseHTTPRequestHandler):
+    """answers every request with an empty 200"""
+    protocol_version = "HTTP/1.1"
+    # The Authorization each request was sent with.
+    seen = []
+
+    def do_GET(self): # pylint: disable=invalid-name
+        self.seen.append(self.headers.get("Authorization"))
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args): # pylint: disable=arguments-differ
+        pass
+
+
+def local_server(test):
+    """a server of Handler on a free local port until test is done, its url"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    test.addCleanup(server.server_close)
+    test.addCleanup(server.shutdown)
+    Handler.seen = []
+    return "http://127.0.0.1:{}/".format(server.server_port)
+
+
+def listening(target=None):
+    """a socket listening on a free local port, accepting on a thread if target is given"""
+    listener = socket.create_server(("127.0.0.1", 0))
+    if target is not None:
+        threading.Thread(target=target, args=(listener,), daemon=True).start()
+    return listener
+
+
+def address(listener):
+    return "127.0.0.1:{}".format(listener.getsockname()[1])
+
+
+def silent(listener, hung_up):
+    """accepts one coordinator and never answers it, sets hung_up once it goes"""
+    sock, _ = listener.accept()
+    with sock:
+        while sock.recv(4096):
+            pass
+    hung_up.set()
+
+
+class LoadStatsTest(unittest.TestCase):
+    """Only responses are timed, failed sends are counted"""
+    def test_errors_are_not_timed(self):
+        stats = LoadStats()
+        now = time.monotonic()
+        stats.record(now - 0.5, now - 0.5, 200)
+        for _ in range(99):
+            stats.record(now, now, error="NewConnectionError")
+        self.assertEqual(stats.done, 100)
+        self.assertEqual(stats.latency.count, 1)
+        self.assertEqual(stats.service.count, 1)
+        self.assertGreaterEqual(stats.latency.percentile(50), 0.5)
+        self.assertIn("requests   100, 99 failed (99.0%)", report(stats))
+
+    def test_refused_connections(self):
+        unused = listening()
+        port = unused.getsockname()[1]
+        unused.close()
+        spec = RequestSpec("GET", "http://127.0.0.1:{}/".format(port))
+        stats = LoadTest(spec, 20, 2).send(spec).snapshot()
+        self.assertEqual(sum(stats.errors.values()), 20)
+        self.assertEqual(stats.latency.count, 0)
+        lines = report(stats)
+        self.assertIn("requests   20, 20 failed (100.0%)", lines)
+        self.assertFalse(any(line.startswith("latency") for line in lines))
+
+
+HOOKS = "respyte_test_load_hooks"
+
+
+def hooks(test):
+    """a module of Authorization hooks named HOOKS, importable until test is done"""
+    module = types.ModuleType(HOOKS)
+    calls = []
+
+    def token(url, data, headers):
+        calls.append(time.monotonic())
+        return "token-{}".format(len(calls)), 0.4
+    module.token = lambda url, data, headers: "token"
+    module.expiring = token
+
+    @signs_digest
+    def signer(method, url, headers, digest):
+        calls.append(time.monotonic())
+        return "signature-{}".format(len(calls))
+    module.signer = signer
+    sys.modules[HOOKS] = module
+    test.addCleanup(sys.modules.pop, HOOKS, None)
+    for name in ("token", "expiring", "signer"):
+        # Hooks are imported once, the next test's are different functions.
+        test.addCleanup(auth._hooks.pop, HOOKS + "." + name, None) # pylint: disable=protected-access
+    return calls
+
+
+class AuthorizationTest(unittest.TestCase):
+    """The Authorization hook is run for each send of a load test"""
+    def setUp(self):
+        self.spec = RequestSpec("GET", local_server(self))
+        self.calls = hooks(self)
+
+    def test_refreshed_during_the_test(self):
+        self.spec.headers["Authorization"] = HOOKS + ".expiring"
+        tokens = TokenCache(refresh_window=30)
+        # Two seconds of sends, the 0.4 second values are refreshed ahead every 0.2 seconds.
+        stats = LoadTest(self.spec, 100, 2, [(50, 50, None)], tokens=tokens).run()
+        self.assertEqual(stats.statuses[200], 100)
+        self.assertEqual(tokens.fetched, 1)
+        self.assertGreater(tokens.refreshed, 3)
+        self.assertGreater(len(set(Handler.seen)), 3)
+        self.assertNotIn(HOOKS + ".expiring", Handler.seen)
+
+    def test_every_send_is_signed(self):
+        self.spec.headers["Authorization"] = HOOKS + ".signer"
+        stats = LoadTest(self.spec, 20, 2).run()
+        self.assertEqual(stats.statuses[200], 20)
+        self.assertEqual(len(set(Handler.seen)), 20)
+
+
+class RemoteWorkersTest(unittest.TestCase):
+    """A LoadTest run by respyte workers in this process"""
+    def setUp(self):
+        self.spec = RequestSpec("GET", local_server(self))
+        self.workers = []
+        for _ in range(2):
+            listener = listening(serve)
+            self.addCleanup(listener.close)
+            self.workers.append(address(listener))
+
+    def run_test(self, requests, concurrency, tokens=None):
+        test = LoadTest(self.spec, requests, concurrency, workers=self.workers, tokens=tokens)
+        stats = test.send(self.spec).snapshot()
+        self.assertEqual(stats.statuses[200], requests)
+        self.assertEqual(stats.latency.count, requests)
+        return test
+
+    def test_every_request_is_counted(self):
+        self.run_test(10, 2)
+
+    def test_more_workers_than_connections(self):
+        test = self.run_test(10, 1)
+        self.assertEqual(test.workers, self.workers[:1])
+
+    def test_uneven_shares(self):
+        self.run_test(11, 3)
+
+    def test_hook_is_run_by_the_workers(self):
+        hooks(self)
+        self.spec.headers["Authorization"] = HOOKS + ".token"
+        tokens = TokenCache(default_ttl=60)
+        self.run_test(10, 2, tokens)
+        # Each worker fetched the value through a cache of its own, none came from tokens.
+        self.assertEqual(set(Handler.seen), {"token"})
+        self.assertEqual(tokens.fetched, 0)
+
+
+class HandshakeTest(unittest.TestCase):
+    """Workers that don't get as far as starting the test"""
+    def setUp(self):
+        self.spec = RequestSpec("GET", "http://127.0.0.1:9/")
+        self.hung_up = threading.Event()
+        listener = listening(lambda listener: silent(listener, self.hung_up))
+        self.addCleanup(listener.close)
+        self.silent = address(listener)
+
+    def test_cancelled_while_waiting_for_ready(self):
+        cancelled = threading.Event()
+        threading.Timer(0.2, cancelled.set).start()
+        started = time.monotonic()
+        stats = LoadTest(self.spec, 10, 2, workers=[self.silent]).send(self.spec, cancelled)
+        self.assertLess(time.monotonic() - started, 2)
+        self.assertEqual(stats.snapshot().latency.count, 0)
+        self.assertTrue(self.hung_up.wait(2))
+
+    def test_not_ready_in_time(self):
+        with mock.patch("librespyte.load.READY_TIMEOUT", 0.2):
+            with self.assertRaisesRegex(RuntimeError, "not ready"):
+                LoadTest(self.spec, 10, 2, workers=[self.silent]).send(self.spec)
+        self.assertTrue(self.hung_up.wait(2))
+
+    def test_unreachable_worker(self):
+        unused = listening()
+        unreachable = address(unused)
+        unused.close()
+        with self.assertRaisesRegex(OSError, "Can't reach"):
+            LoadTest(self.spec, 10, 2, workers=[self.silent, unreachable]).send(self.spec)
+        # The channel to the worker that was reached is closed.
+        self.assertTrue(self.hung_up.wait(2))
+
+
+if __name__ == "__main__":
+    unittest.main()
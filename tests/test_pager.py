@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""Tests for the Pager"""
+import time
+import unittest
+from unittest import mock
+from asciimatics.screen import Canvas, Screen
+from asciimatics.widgets import Frame, Layout
+from librespyte.pager import Pager
+
+
+def framed(pager, height=20, width=60):
+    """pager laid out alone in a Frame on a mock screen"""
+    screen = mock.MagicMock(spec=Screen, colours=8, unicode_aware=False)
+    frame = Frame(Canvas(screen, height, width, 0, 0), height, width)
+    layout = Layout([1])
+    frame.add_layout(layout)
+    layout.add_widget(pager)
+    frame.fix()
+    return pager
+
+
+def matches(pager):
+    """the count of the pager's search once it has searched every line"""
+    deadline = time.monotonic() + 5
+    # pylint: disable=protected-access
+    while pager._search.running:
+        if time.monotonic() > deadline:
+            raise AssertionError("the search didn't finish")
+        time.sleep(0.01)
+    return pager._search.count
+
+
+class AppendTest(unittest.TestCase):
+    """Text streamed into the Pager while it is being searched"""
+    def setUp(self):
+        self.pager = framed(Pager(15, as_string=True, line_wrap=True, spool_threshold=2000))
+        self.pager.value = ""
+        self.addCleanup(self.pager._stop_search) # pylint: disable=protected-access
+
+    def test_search_follows_appended_text(self):
+        self.pager.append("needle\n" + "x\n" * 10)
+        self.pager._start_search("needle", False) # pylint: disable=protected-access
+        self.assertEqual(matches(self.pager), 1)
+        self.pager.append("needle\n")
+        self.assertEqual(matches(self.pager), 2)
+
+    def test_search_follows_the_value_when_it_is_spooled(self):
+        self.pager.append("needle\n")
+        self.pager._start_search("needle", False) # pylint: disable=protected-access
+        self.assertEqual(matches(self.pager), 1)
+        self.pager.append("x\n" * 1000 + "needle\n")
+        self.assertTrue(self.pager.spooled)
+        self.assertEqual(matches(self.pager), 2)
+        self.pager.append("needle needle\n")
+        self.assertEqual(matches(self.pager), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
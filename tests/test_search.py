@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""Tests for the Pager's background search"""
+import time
+import unittest
+from librespyte.search import BLOCK_LINES, MatchIndex, compile_pattern
+
+
+def searched(lines, text, regex=False):
+    """a MatchIndex of text in lines, once every line has been searched"""
+    index = MatchIndex(lines, compile_pattern(text, regex), literal=not regex)
+    deadline = time.monotonic() + 5
+    while index.running:
+        if time.monotonic() > deadline:
+            raise AssertionError("the search didn't finish")
+        time.sleep(0.01)
+    return index
+
+
+class MatchIndexTest(unittest.TestCase):
+    """MatchIndex finds the same matches as searching each line on its own"""
+    lines = ['a: 1', 'id: 2', 'b: 3', 'id: 4']
+
+    def search(self, lines, text, regex=False):
+        index = searched(lines, text, regex)
+        self.addCleanup(index.stop)
+        return index
+
+    def test_literal(self):
+        index = self.search(self.lines, "id")
+        self.assertEqual(index.count, 2)
+        self.assertEqual(index.find(0, 0), (1, 0, 2))
+
+    def test_anchored_at_line_start(self):
+        index = self.search(self.lines, "^id", regex=True)
+        self.assertEqual(index.count, 2)
+        self.assertEqual(index.find(0, 0), (1, 0, 2))
+        self.assertEqual(index.find(1, 0), (3, 0, 2))
+
+    def test_anchored_at_line_end(self):
+        index = self.search(self.lines, r"\d$", regex=True)
+        self.assertEqual(index.visible(0, 3), [(0, 3, 1), (1, 4, 1), (2, 3, 1), (3, 4, 1)])
+
+    def test_anchors_in_every_block(self):
+        lines = ["x", "y"] * BLOCK_LINES
+        index = self.search(lines, r"\Ay\Z", regex=True)
+        self.assertEqual(index.count, BLOCK_LINES)
+
+    def test_lookbehind_at_line_start(self):
+        index = self.search(["foo", " foo"], r"(?<!\s)foo", regex=True)
+        self.assertEqual(index.visible(0, 1), [(0, 0, 3)])
+
+    def test_no_match(self):
+        index = self.search(self.lines, "^d", regex=True)
+        self.assertEqual(index.count, 0)
+        self.assertIsNone(index.find(0, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""Tests for signing requests from a digest of the body"""
+import hashlib
+import unittest
+import requests
+from librespyte.signing import CHUNK_SIZE, encode, sigv4_authorization
+
+# The credentials and date of the AWS Signature Version 4 test suite.
+ACCESS_KEY = "AKIDEXAMPLE"
+SECRET_KEY = "wJalrXUtnFEMI/K7MDENG+bPxRfiCYEXAMPLEKEY"
+AMZ_DATE = "20150830T123600Z"
+EMPTY = hashlib.sha256(b"").hexdigest()
+
+
+def signature(url):
+    """the signature sigv4_authorization makes for a GET of url in the test suite's terms"""
+    value = sigv4_authorization("GET", url, {"X-Amz-Date": AMZ_DATE}, EMPTY, ACCESS_KEY,
+                                SECRET_KEY, "us-east-1", "service")
+    return value.rsplit("Signature=", 1)[1]
+
+
+class SigV4Test(unittest.TestCase):
+    """sigv4_authorization against the AWS Signature Version 4 test suite"""
+    def test_get_vanilla(self):
+        value = sigv4_authorization("GET", "https://example.amazonaws.com/",
+                                    {"X-Amz-Date": AMZ_DATE}, EMPTY, ACCESS_KEY, SECRET_KEY,
+                                    "us-east-1", "service")
+        self.assertEqual(
+            value, "AWS4-HMAC-SHA256 Credential=AKIDEXAMPLE/20150830/us-east-1/service/"
+                   "aws4_request, SignedHeaders=host;x-amz-date, Signature="
+                   "5fa00fa31553b73ebf1942676e86291e8372ff2a2260956d9b8aae1d763fbf31")
+
+    def test_get_vanilla_query_order_key_case(self):
+        self.assertEqual(
+            signature("https://example.amazonaws.com/?Param2=value2&Param1=value1"),
+            "b97d918cfa904a5beff61c982a1b6f458b799221646efd99d3219ec94cdf2500")
+
+    def test_get_vanilla_query_order_value(self):
+        self.assertEqual(
+            signature("https://example.amazonaws.com/?Param1=value2&Param1=value1"),
+            "5772eed61e12b33fae39ee5e7012498b51d56abc0abb7c60486157bd471c4694")
+
+
+class EncodeTest(unittest.TestCase):
+    """encode() makes the body, content type and digest of what requests would send"""
+    def assert_as_requests(self, data):
+        prepared = requests.Request("POST", "http://example.com/", data=data).prepare()
+        body, content_type, digest = encode(data)
+        # http.client sends str bodies as latin-1.
+        wire = prepared.body.encode("latin-1") if isinstance(prepared.body, str) else \
+            prepared.body or b""
+        self.assertEqual(body, prepared.body)
+        self.assertEqual(content_type, prepared.headers.get("Content-Type"))
+        self.assertEqual(digest.hexdigest, hashlib.sha256(wire).hexdigest())
+        self.assertEqual(digest.length, len(wire))
+
+    def test_dict(self):
+        self.assert_as_requests({"a": "1", "b": "x y&z=", "c": 3})
+
+    def test_list(self):
+        self.assert_as_requests([("a", "1"), ("a", "2"), ("b", "")])
+
+    def test_list_values(self):
+        self.assert_as_requests({"a": ["1", "2"], "b": ("3",)})
+
+    def test_none_values(self):
+        self.assert_as_requests({"a": None, "b": ["1", None], "c": "2"})
+        self.assert_as_requests({"a": None})
+
+    def test_bytes(self):
+        self.assert_as_requests(b"\x00\xff raw")
+        self.assert_as_requests({b"k": b"v\xff"})
+
+    def test_non_ascii(self):
+        self.assert_as_requests({"name": "héllo 日本"})
+        self.assert_as_requests("héllo")
+
+    def test_no_body(self):
+        for data in (None, {}, [], "", b""):
+            self.assert_as_requests(data)
+
+    def test_longer_than_a_chunk(self):
+        self.assert_as_requests([("key{}".format(number), "é" * 100)
+                                 for number in range(CHUNK_SIZE // 100)])
+
+    def test_str_outside_latin_1(self):
+        # requests would fail the same way sending it.
+        with self.assertRaises(UnicodeEncodeError):
+            encode("日本")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""Tests for the JSON tree of a response too big to reformat"""
+import json
+import unittest
+from asciimatics.event import KeyboardEvent
+from librespyte.executor import Job
+from librespyte.jsontree import PAGE_SIZE, JsonTree
+from librespyte.render import SpooledBody
+from librespyte.rest import CHUNK_SIZE, _parse, _receive_body
+from librespyte.spool import SPOOL_THRESHOLD
+from librespyte.timing import PhaseTimer
+
+
+class Response(object):
+    """just enough of a requests.Response for _receive_body"""
+    status_code = 200
+    encoding = None
+
+    def __init__(self, body):
+        self.headers = {"Content-Type": "application/json"}
+        self._body = body
+
+    def iter_content(self, size):
+        for start in range(0, len(self._body), size):
+            yield self._body[start:start + size]
+
+    def close(self):
+        pass
+
+
+def items(size):
+    """a JSON array of ordinary API objects, a little over size bytes"""
+    item = {"id": 0, "name": "widget", "price": 9.99, "tags": ["a", "b"],
+            "description": "x" * 80}
+    count = size // len(json.dumps(item)) + 1
+    return [dict(item, id=number) for number in range(count)]
+
+
+class SpooledTreeTest(unittest.TestCase):
+    """A body past SPOOL_THRESHOLD can still be opened as a tree"""
+    def setUp(self):
+        self.document = items(SPOOL_THRESHOLD)
+        body = json.dumps(self.document).encode("utf-8")
+        self.assertGreater(len(body), SPOOL_THRESHOLD)
+        job = Job(_receive_body, ())
+        with PhaseTimer() as timer:
+            _, self.body, is_json = _receive_body(
+                job, timer, {}, (Response(body), False), "yaml")
+        self.assertTrue(is_json)
+        # Everything streamed into the Pager as it arrived.
+        self.assertEqual(job.received, len(body))
+        self.assertGreater(job.updates.qsize(), len(body) // CHUNK_SIZE)
+
+    def test_only_shown_raw(self):
+        self.assertIsInstance(self.body, SpooledBody)
+        self.assertEqual(self.body.views, ("raw",))
+
+    def test_parsed_on_a_job(self):
+        self.assertFalse(self.body.parsed_yet)
+        self.assertTrue(_parse(Job(_parse, ()), self.body))
+        self.assertTrue(self.body.parsed_yet)
+        self.assertEqual(len(self.body.parsed), len(self.document))
+
+    def test_tree(self):
+        _parse(Job(_parse, ()), self.body)
+        tree = JsonTree(10, document=self.body.parsed)
+        # The root starts expanded, its first page of items and a row for the rest.
+        self.assertEqual(tree.value, "$")
+        tree.process_event(KeyboardEvent(ord("j")))
+        self.assertEqual(tree.value, "$[0]")
+        tree.process_event(KeyboardEvent(ord("l")))
+        tree.process_event(KeyboardEvent(ord("j")))
+        self.assertEqual(tree.value, "$[0].id")
+        tree.process_event(KeyboardEvent(ord("G")))
+        self.assertEqual(tree.value, "$")
+        self.assertEqual(len(tree._rows), # pylint: disable=protected-access
+                         1 + PAGE_SIZE + len(self.document[0]) + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()